@@ -1,26 +1,140 @@
-from flask import Flask, render_template, request, g, redirect, url_for
+from flask import Flask, render_template, request, g, redirect, url_for, jsonify, Response, make_response
+import csv
+import hashlib
+import io
 import sqlite3
 import yaml  # 确保导入 yaml
 import json
+import os
+import threading
+import time
+from datetime import date
 from urllib.parse import urlencode
 
 # 导入我们重构的模块
-from utils import luogu_parser,finder_engine
+from utils import luogu_parser,finder_engine,columnar_engine,replica,text_search,admission,query_key,metrics,query_log,closest_match,similarity,query_plan
+from utils.db_meta import get_data_version, read_versions
 
 DATABASE = 'oier_data.db'
 MAPPING_FILE = 'name_mapping.yml'
+MAX_BATCH_SIZE = 500
+# /api/closest 一次最多返回的人数
+MAX_CLOSEST = 200
+# /api/similar 一次最多返回的人数
+MAX_SIMILAR = 100
+# 结果页默认只显示排序后的前 DEFAULT_RESULT_LIMIT 名
+DEFAULT_RESULT_LIMIT = 500
+# 导出接口每次从游标取出、编码并发送的行数
+EXPORT_BATCH_SIZE = 500
+ORDER_OPTIONS = [('oierdb_score', 'DB评分'), ('ccf_score', 'CCF评分'), ('enroll_middle', '入学年份'),
+                 ('record_count', '获奖记录数'), ('noi_best', 'NOI最好成绩'), ('noip_first', 'NOIP一等奖数'),
+                 ('last_year', '最近获奖年份')]
 
 app = Flask(__name__)
 app.config['JSON_AS_ASCII'] = False
+# 查询引擎: sqlite (默认) 或 columnar (需要 numpy，首次查询时把 Record 表载入内存)
+app.config['FINDER_BACKEND'] = os.environ.get('OIERFINDER_BACKEND', 'sqlite')
+ENGINES = {'sqlite': finder_engine, 'columnar': columnar_engine}
+# 数据库模式: file (默认，直接读磁盘文件) 或 memory (启动时加载到内存副本，后台检测数据版本变化后重新加载)
+app.config['DB_MODE'] = os.environ.get('OIERFINDER_DB_MODE', 'file')
+# 查询预算 (见 utils/admission.py)：估计耗时超过 MAX_COST_MS 的查询被拒绝，结果超过 MAX_ROWS 人时只显示前 MAX_ROWS 名，
+# 执行超过 TIMEOUT_MS 时中断；设为 0 表示不限制。
+# 默认值按现有数据上的估计选取: 一次全表扫描的记录条件估计约 490 ms (实测 80~170 ms)，上限允许两次，
+# 三次及以上的全表扫描被拒绝；结果人数上限与结果页默认显示人数相同，要求显示全部时降级为前 500 名
+def _env_limit(name, default):
+    value = int(os.environ.get(name, default))
+    return value if value > 0 else None
+
+app.config['QUERY_BUDGET'] = admission.Budget(
+    max_cost_ms=_env_limit('OIERFINDER_MAX_COST_MS', 1000),
+    max_rows=_env_limit('OIERFINDER_MAX_ROWS', DEFAULT_RESULT_LIMIT),
+    timeout_ms=_env_limit('OIERFINDER_TIMEOUT_MS', 3000))
+# 批量接口整批估计返回人数的上限 (约 150 字节/人的 JSON)；设为 0 表示不限制
+app.config['MAX_BATCH_ROWS'] = _env_limit('OIERFINDER_MAX_BATCH_ROWS', 20000)
+# 查询结果页的缓存时间 (秒)；数据每天最多更新一次，数据版本变化后 ETag 随之改变
+app.config['SEARCH_MAX_AGE'] = int(os.environ.get('OIERFINDER_SEARCH_MAX_AGE', 3600))
+# 运行指标 (/metrics) 与慢查询日志 (见 utils/metrics.py)；OIERFINDER_METRICS=0 关闭，OIERFINDER_SLOW_MS=0 不记录慢查询
+app.config['METRICS'] = os.environ.get('OIERFINDER_METRICS', '1') != '0'
+slow_query_log = metrics.SlowQueryLog(os.environ.get('OIERFINDER_SLOW_LOG', 'slow_queries.log'),
+                                      _env_limit('OIERFINDER_SLOW_MS', 1000))
+# 查询日志 (见 utils/query_log.py，供 bench/replay.py 回放)：设置 OIERFINDER_QUERY_LOG 为文件路径后开启，
+# OIERFINDER_QUERY_LOG_SAMPLE 为记录的比例 (默认全部记录)
+_query_log_path = os.environ.get('OIERFINDER_QUERY_LOG')
+query_logger = query_log.QueryLog(_query_log_path, float(os.environ.get('OIERFINDER_QUERY_LOG_SAMPLE', 1.0))) if _query_log_path else None
+_replica = None
+_replica_lock = threading.Lock()
+
+def get_engine():
+    return ENGINES.get(app.config['FINDER_BACKEND'], finder_engine)
 
 # --- 数据库连接管理 (保持不变) ---
+def get_replica():
+    global _replica
+    with _replica_lock:
+        if _replica is None:
+            _replica = replica.Replica(DATABASE).start_watching()
+        return _replica
+
+def open_db():
+    """按数据库模式打开一个新连接"""
+    if app.config['DB_MODE'] == 'memory':
+        return get_replica().connect()
+    db = sqlite3.connect(DATABASE)
+    db.row_factory = sqlite3.Row
+    return db
+
 def get_db():
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DATABASE)
-        db.row_factory = sqlite3.Row
+        db = g._database = open_db()
     return db
 
+# --- 运行指标 ---
+def track_query(endpoint, query_type, config=None, profile=None, **extra):
+    """标记当前请求为一次查询，请求结束时计入耗时直方图并检查是否为慢查询"""
+    g._metrics = {'endpoint': endpoint, 'query_type': query_type or 'unknown', 'config': config,
+                  'profile': profile, 'extra': extra}
+
+def track_admission(decision=None, error=None):
+    """记录准入控制的决定；error 为查询抛出的 ValueError 时按其类型记为 rejected / timeout"""
+    if error is not None:
+        decision = ('rejected' if isinstance(error, admission.QueryRejected)
+                    else 'timeout' if isinstance(error, admission.QueryTimeout) else None)
+    if decision is not None and app.config['METRICS']:
+        metrics.ADMISSION.inc(decision)
+
+def log_query(endpoint, **entry):
+    """开启查询日志时按采样率记录本次查询 (在执行之前记录，出错或超时的查询也会被回放)"""
+    if query_logger is not None:
+        query_logger.record(endpoint, **entry)
+
+@app.before_request
+def start_timer():
+    g._started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    tracked = getattr(g, '_metrics', None)
+    if tracked is None or not app.config['METRICS']:
+        return response
+    elapsed = time.perf_counter() - g._started
+    metrics.REQUEST_DURATION.observe(tracked['endpoint'], tracked['query_type'], value=elapsed)
+    metrics.observe_profile(tracked['profile'])
+    slow_query_log.record(tracked['endpoint'], elapsed * 1000, config=tracked['config'], profile=tracked['profile'],
+                          query_type=tracked['query_type'], status=response.status_code, **tracked['extra'])
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus 文本格式的运行指标 (每个进程各自计数)"""
+    if not app.config['METRICS']:
+        return Response("metrics disabled\n", status=404, content_type='text/plain; charset=utf-8')
+    metrics.DATA_VERSION.replace(get_data_version(get_db().cursor()), value=1)
+    plan_cache = query_plan.cache_info()
+    metrics.observe_cache('plan', plan_cache['plans'])
+    metrics.observe_cache('plan_step', plan_cache['steps'])
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.teardown_appcontext
 def close_connection(exception):
     db = getattr(g, '_database', None)
@@ -55,6 +169,12 @@ def index():
         'enroll_max': request.args.get('enroll_max', ''),
         'grade_min': request.args.get('grade_min', ''),
         'grade_max': request.args.get('grade_max', ''),
+        'name': request.args.get('name', ''),
+        'initials_prefix': request.args.get('initials_prefix', ''),
+        'school': request.args.get('school', ''),
+        'order_by': request.args.get('order_by', finder_engine.DEFAULT_ORDER_BY),
+        'limit': request.args.get('limit', DEFAULT_RESULT_LIMIT),
+        'profile': request.args.get('profile') in ('1', 'true'),
         'records': []
     }
     records_json = request.args.get('records_json', '[]')
@@ -62,54 +182,68 @@ def index():
         last_query['records'] = json.loads(records_json)
     except json.JSONDecodeError:
         last_query['records'] = []
-    return render_template('index.html', last_query=last_query)
+    return render_template('index.html', last_query=last_query, order_options=ORDER_OPTIONS)
 
-@app.route('/search', methods=['POST'])
-def search():
-    query_type = request.form.get('query_type')
+NOT_MAPPING_ERROR = "配置必须是键值形式 (YAML 映射)"
+
+def parse_query_form(form):
+    """
+    把查询表单 (YAML / 洛谷 / UI 三种方式) 解析为 config。
+    返回 (config, 用于回填表单的参数, 错误信息)，/search 与 /export 共用。
+    """
+    query_type = form.get('query_type')
     config = None
     error_msg = None
     form_data_for_redirect = {'query_type': query_type}
 
     try:
         if query_type == 'yaml':
-            yaml_content = request.form.get('yaml_content', '')
+            yaml_content = form.get('yaml_content', '')
             form_data_for_redirect['yaml_content'] = yaml_content
             config = yaml.safe_load(yaml_content) if yaml_content else {}
+            if config is not None and not isinstance(config, dict):
+                raise TypeError(NOT_MAPPING_ERROR)
         
         elif query_type == 'luogu':
-            luogu_content = request.form.get('luogu_content', '')
+            luogu_content = form.get('luogu_content', '')
             form_data_for_redirect['luogu_content'] = luogu_content
             config = luogu_parser.convert_luogu_to_config(luogu_content, MAPPING_FILE) if luogu_content else {}
 
         elif query_type == 'ui':
             config = {
                 'enroll_year_range': [
-                    to_int_or_none(request.form.get('enroll_min')),
-                    to_int_or_none(request.form.get('enroll_max'))
+                    to_int_or_none(form.get('enroll_min')),
+                    to_int_or_none(form.get('enroll_max'))
                 ],
                 'grade_range': [
-                    to_int_or_none(request.form.get('grade_min')),
-                    to_int_or_none(request.form.get('grade_max'))
+                    to_int_or_none(form.get('grade_min')),
+                    to_int_or_none(form.get('grade_max'))
                 ],
                 'records': []
             }
+            # 姓名 / 拼音首字母前缀 / 学校 (逗号分隔，任一匹配即可)
+            for key in text_search.SEARCH_KEYS:
+                terms = to_list_or_none(form.get(key))
+                if terms: config[key] = terms
             form_data_for_redirect.update({
-                'enroll_min': request.form.get('enroll_min', ''),
-                'enroll_max': request.form.get('enroll_max', ''),
-                'grade_min': request.form.get('grade_min', ''),
-                'grade_max': request.form.get('grade_max', ''),
+                'enroll_min': form.get('enroll_min', ''),
+                'enroll_max': form.get('enroll_max', ''),
+                'grade_min': form.get('grade_min', ''),
+                'grade_max': form.get('grade_max', ''),
             })
+            form_data_for_redirect.update({key: form.get(key, '') for key in text_search.SEARCH_KEYS})
             
-            record_years_min = request.form.getlist('record_year_min')
-            record_years_max = request.form.getlist('record_year_max')
-            record_ranks_min = request.form.getlist('record_rank_min')
-            record_ranks_max = request.form.getlist('record_rank_max')
-            record_scores_min = request.form.getlist('record_score_min')
-            record_scores_max = request.form.getlist('record_score_max')
-            record_provinces = request.form.getlist('record_province')
-            record_contests = request.form.getlist('record_contest_type')
-            record_levels = request.form.getlist('record_level_range')
+            record_years_min = form.getlist('record_year_min')
+            record_years_max = form.getlist('record_year_max')
+            record_ranks_min = form.getlist('record_rank_min')
+            record_ranks_max = form.getlist('record_rank_max')
+            record_scores_min = form.getlist('record_score_min')
+            record_scores_max = form.getlist('record_score_max')
+            record_provinces = form.getlist('record_province')
+            record_contests = form.getlist('record_contest_type')
+            record_levels = form.getlist('record_level_range')
+            record_schools = form.getlist('record_school')
+            record_cities = form.getlist('record_city')
 
             records_for_redirect = []
             for i in range(len(record_years_min)):
@@ -120,6 +254,8 @@ def search():
                     'province': to_list_or_none(record_provinces[i]),
                     'contest_type': to_list_or_none(record_contests[i]),
                     'level_range': to_list_or_none(record_levels[i]),
+                    'school': to_list_or_none(record_schools[i]) if i < len(record_schools) else None,
+                    'city': to_list_or_none(record_cities[i]) if i < len(record_cities) else None,
                 }
                 
                 record_for_redirect = {
@@ -128,6 +264,8 @@ def search():
                     'score_min': record_scores_min[i], 'score_max': record_scores_max[i],
                     'province': record_provinces[i], 'contest_type': record_contests[i],
                     'level_range': record_levels[i],
+                    'school': record_schools[i] if i < len(record_schools) else '',
+                    'city': record_cities[i] if i < len(record_cities) else '',
                 }
                 records_for_redirect.append(record_for_redirect)
 
@@ -145,34 +283,333 @@ def search():
     except Exception as e:
         error_msg = f"发生未知错误: {e}"
 
+    return config, form_data_for_redirect, error_msg
+
+def wants_profile(form):
+    """profile=1 时在结果页显示查询执行分析 (含每一步的 SQL 与 EXPLAIN QUERY PLAN)"""
+    return form.get('profile') in ('1', 'true', 'on')
+
+def parse_result_options(form, default_limit):
+    """排序字段与显示人数，返回 (order_by, limit)，limit 为 None 表示全部"""
+    order_by = form.get('order_by') or finder_engine.DEFAULT_ORDER_BY
+    limit = to_int_or_none(form.get('limit'))
+    if limit is None: limit = default_limit
+    if limit is not None and limit <= 0: limit = None
+    return order_by, limit
+
+def search_url(config, order_by, limit, profiled=False):
+    """查询的规范 GET 地址：语义相同的查询得到相同的 URL，便于浏览器与反向代理缓存"""
+    return url_for('search', q=query_key.encode_config(config), order_by=order_by, limit=limit or 0,
+                   profile=1 if profiled else None)
+
+def search_etag(versions, config, order_by, limit, profiled=False):
+    """
+    ETag 由规范化的查询、是否显示执行分析、数据版本与当前年份决定，数据更新后自动失效；
+    年级条件按当天的年份换算为入学年份 (见 utils/query_plan.py)，跨年后结果会变化
+    """
+    key = f"{query_key.config_hash(config)}:{order_by}:{limit or 0}:{int(profiled)}:{versions.data}:{date.today().year}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+@app.route('/search', methods=['GET', 'POST'])
+def search():
+    """POST 解析查询表单后重定向到规范 GET 地址；GET 执行查询，响应可被缓存并支持 304"""
+    if request.method == 'POST':
+        config, form_data_for_redirect, error_msg = parse_query_form(request.form)
+        order_by, limit = parse_result_options(request.form, DEFAULT_RESULT_LIMIT)
+        profiled = wants_profile(request.form)
+        form_data_for_redirect.update({'order_by': order_by, 'limit': limit or 0})
+        if profiled: form_data_for_redirect['profile'] = 1
+        # 表单提交只做解析与重定向；查询类型 (ui / yaml / luogu) 只在这一步可知
+        track_query('search_form', request.form.get('query_type'))
+        if error_msg:
+            return render_template('results.html', error=error_msg, redirect_params=urlencode(form_data_for_redirect))
+        if not config:
+            return redirect(url_for('index'))
+        return redirect(search_url(config, order_by, limit, profiled), code=303)
+
+    if 'q' not in request.args:
+        return redirect(url_for('index'))
+    order_by, limit = parse_result_options(request.args, DEFAULT_RESULT_LIMIT)
+    profiled = wants_profile(request.args)
+    track_query('search', 'url')
+    try:
+        config = query_key.canonical_config(query_key.decode_config(request.args['q']))
+        finder_engine.order_clause(order_by)
+    except (ValueError, TypeError) as e:
+        response = make_response(render_template('results.html', error=str(e), redirect_params=''), 400)
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    log_query('search', config=config, order_by=order_by, limit=limit)
+
+    # 规范 URL 只携带 config 本身，「返回并编辑查询」以 YAML 方式回填查询页
+    config_str = yaml.dump(config, allow_unicode=True, sort_keys=False, default_flow_style=False) if config else "无有效查询条件"
+    redirect_params = urlencode({'query_type': 'yaml', 'yaml_content': config_str if config else '',
+                                 'order_by': order_by, 'limit': limit or 0, **({'profile': 1} if profiled else {})})
+
+    cursor = get_db().cursor()
+    # 整个请求只读一次 Meta 表，ETag、准入估计与查询共用
+    versions = read_versions(cursor)
+    etag = search_etag(versions, config, order_by, limit, profiled)
+    hit = request.if_none_match.contains(etag)
+    if app.config['METRICS']:
+        metrics.CACHE_REQUESTS.inc('etag', 'hit' if hit else 'miss')
+    if hit:
+        response = Response(status=304)
+    else:
+        # 指标与慢查询日志总是需要各步骤的耗时；EXPLAIN QUERY PLAN 只在请求执行分析时才额外执行
+        profile = finder_engine.QueryProfile(explain=profiled)
+        track_query('search', 'url', config=config, profile=profile, order_by=order_by, limit=limit)
+        budget = app.config['QUERY_BUDGET']
+        try:
+            requested_limit = limit
+            results, limit, decision = admission.run(get_engine(), config, cursor, budget, profile=profile,
+                                                     limit=limit, order_by=order_by, versions=versions)
+            track_admission(decision)
+            if app.config['METRICS']:
+                metrics.RESULT_ROWS.observe('search', value=len(results))
+            # 本页所有 OIer 的匹配记录由一次查询取出 (每人最多 DEFAULT_RECORDS_PER_OIER 条)
+            records, record_totals = finder_engine.matching_records(
+                config, cursor, [row['uid'] for row in results], profile=profile, versions=versions)
+        except (ValueError, TypeError) as e:
+            # TypeError 为取值类型错误的条件 (例如 year_range: 2020)
+            track_admission(error=e)
+            # 超时等错误可能是暂时的，不缓存
+            response = make_response(render_template('results.html', error=str(e), redirect_params=redirect_params), 400)
+            response.headers['Cache-Control'] = 'no-store'
+            return response
+
+        response = make_response(render_template(
+            'results.html', oiers=results, config=config_str, profile=profile if profiled else None,
+            records=records, record_totals=record_totals,
+            limit=limit, order_label=dict(ORDER_OPTIONS).get(order_by, order_by),
+            downgraded=decision == 'top_k' and limit != requested_limit,
+            redirect_params=redirect_params))
+    response.set_etag(etag)
+    # 执行分析含 SQL、查询计划与本次耗时，只给请求者本人看，不进入共享缓存
+    response.headers['Cache-Control'] = 'no-store' if profiled else f"public, max-age={app.config['SEARCH_MAX_AGE']}"
+    return response
+
+@app.route('/api/estimate', methods=['GET', 'POST'])
+def estimate():
+    """
+    查询页编辑条件时的实时估计：参数与 /search 的表单相同，返回近似的结果人数与各条件的估计耗时。
+    只使用代价模型的统计信息，不读取 Record 表，也不执行查询本身。
+    """
+    config, _, error_msg = parse_query_form(request.values)
     if error_msg:
-         return render_template('results.html', error=error_msg, redirect_params=urlencode(form_data_for_redirect))
-
-    if config:
-        # 在这里过滤掉值为 None 或空列表的键，以获得更干净的 YAML 输出
-        clean_config = {}
-        if config.get('enroll_year_range') and any(v is not None for v in config['enroll_year_range']):
-            clean_config['enroll_year_range'] = config['enroll_year_range']
-        if config.get('grade_range') and any(v is not None for v in config['grade_range']):
-            clean_config['grade_range'] = config['grade_range']
-        
-        clean_records = []
-        for record in config.get('records', []):
-            clean_record = {k: v for k, v in record.items() if v and (v != [None, None])}
-            if clean_record:
-                clean_records.append(clean_record)
-        if clean_records:
-            clean_config['records'] = clean_records
-            
-        cursor = get_db().cursor()
-        results = finder_engine.find_oiers(config, cursor)
-        
-        # --- 核心修改：使用 yaml.dump 生成 YAML 字符串 ---
-        config_str = yaml.dump(clean_config, allow_unicode=True, sort_keys=False, default_flow_style=False) if clean_config else "无有效查询条件"
-        
-        return render_template('results.html', oiers=results, config=config_str, redirect_params=urlencode(form_data_for_redirect))
-    
-    return redirect(url_for('index'))
+        return jsonify({'error': error_msg}), 400
+    _, limit = parse_result_options(request.values, DEFAULT_RESULT_LIMIT)
+    track_query('estimate', request.values.get('query_type'))
+    cursor = get_db().cursor()
+    try:
+        estimated = admission.estimate(config or {}, cursor)
+    except (ValueError, TypeError) as e:
+        # 编辑中的条件常常还不完整 (例如区间只填了一半)，作为普通错误返回
+        return jsonify({'error': str(e)}), 400
+    payload = estimated.to_dict(limit)
+    try:
+        payload['limit'], payload['decision'] = admission.decide(estimated, app.config['QUERY_BUDGET'], limit)
+    except admission.QueryRejected as e:
+        payload['limit'], payload['decision'], payload['message'] = limit, 'rejected', str(e)
+    response = jsonify(payload)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/api/closest', methods=['GET', 'POST'])
+def closest():
+    """
+    最接近的匹配 (见 utils/closest_match.py)：参数与 /search 的表单相同，另有 k (人数) 与 weights
+    (uniform / rarity / 逗号分隔的数值)。返回满足条件最多的前 k 名及各自未满足的条件。
+    """
+    config, _, error_msg = parse_query_form(request.values)
+    if error_msg:
+        return jsonify({'error': error_msg}), 400
+    order_by, _ = parse_result_options(request.values, None)
+    k = to_int_or_none(request.values.get('k'))
+    k = closest_match.DEFAULT_K if k is None else max(0, min(k, MAX_CLOSEST))
+    weights = request.values.get('weights') or 'uniform'
+    track_query('closest', request.values.get('query_type'))
+    cursor = get_db().cursor()
+    try:
+        if weights not in closest_match.WEIGHTINGS:
+            weights = [float(w) for w in weights.split(',')]
+        with admission.deadline(cursor.connection, app.config['QUERY_BUDGET'].timeout_ms):
+            units, results = closest_match.find_closest(config or {}, cursor, k, weights, order_by=order_by)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    response = jsonify({
+        'units': units,
+        'results': [dict(result, oier=dict(result['oier'])) for result in results],
+    })
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/api/similar/<int:uid>', methods=['GET'])
+def similar(uid):
+    """获奖经历与 uid 最相似的 k 人 (见 utils/similarity.py)，按 Jaccard 系数从高到低"""
+    k = to_int_or_none(request.args.get('k'))
+    k = similarity.DEFAULT_K if k is None else max(0, min(k, MAX_SIMILAR))
+    track_query('similar', 'api')
+    try:
+        results = similarity.similar(get_db().cursor(), uid, k)
+    except ValueError as e:
+        # 索引缺失或与数据库版本不一致，需要重新构建
+        return jsonify({'error': str(e)}), 503
+    response = jsonify({'uid': uid, 'results': [dict(result, oier=dict(result['oier'])) for result in results]})
+    response.headers['Cache-Control'] = f"public, max-age={app.config['SEARCH_MAX_AGE']}"
+    return response
+
+def export_chunks(cursor, record_cursor, candidate_uids, output_format, with_records, limit, order_by):
+    """逐批从游标读取结果并编码为 NDJSON / CSV 文本块，内存占用与结果总数无关"""
+    oier_columns = None
+    for rows in finder_engine.iter_ranked(cursor, candidate_uids, limit, order_by, EXPORT_BATCH_SIZE):
+        records = finder_engine.records_for_oiers(record_cursor, [row['uid'] for row in rows]) if with_records else None
+        if output_format == 'ndjson':
+            lines = []
+            for row in rows:
+                item = dict(row)
+                if with_records: item['records'] = records[row['uid']]
+                lines.append(json.dumps(item, ensure_ascii=False) + '\n')
+            yield ''.join(lines)
+            continue
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if oier_columns is None:
+            oier_columns = list(rows[0].keys())
+            writer.writerow(oier_columns + (list(finder_engine.RECORD_COLUMNS) if with_records else []))
+        for row in rows:
+            values = [row[column] for column in oier_columns]
+            if not with_records:
+                writer.writerow(values)
+                continue
+            # 每条记录一行，OIer 的列在各行重复；没有记录的 OIer 输出一行，记录列留空
+            for record in records[row['uid']] or [dict.fromkeys(finder_engine.RECORD_COLUMNS)]:
+                writer.writerow(values + [record[column] for column in finder_engine.RECORD_COLUMNS])
+        yield buffer.getvalue()
+
+@app.route('/export', methods=['GET', 'POST'])
+def export():
+    """
+    以与 /search 相同的参数 (YAML / 洛谷 / UI 表单字段) 导出全部结果，逐批流式输出。
+    额外参数: format=ndjson|csv (默认 ndjson)，records=1 时附带每个 OIer 的记录；limit 默认不限。
+    """
+    config, _, error_msg = parse_query_form(request.values)
+    if error_msg:
+        return jsonify({'error': error_msg}), 400
+    output_format = request.values.get('format', 'ndjson')
+    if output_format not in ('ndjson', 'csv'):
+        return jsonify({'error': f"不支持的导出格式: {output_format} (可选: ndjson, csv)"}), 400
+    with_records = request.values.get('records') in ('1', 'true')
+    order_by, limit = parse_result_options(request.values, None)
+
+    # 响应体在请求上下文结束后才逐块发送，不能使用随上下文关闭的 get_db()，
+    # 因此单独打开一个连接，响应结束 (或客户端断开) 时关闭
+    # 导出本来就是全部结果，只做拒绝与超时检查，不按 max_rows 降级；超时只限制求候选集，不限制流式输出
+    # 耗时只统计求候选集，不含流式输出
+    db = open_db()
+    streaming = False
+    try:
+        budget = app.config['QUERY_BUDGET']
+        profile = finder_engine.QueryProfile(explain=False)
+        canonical = query_key.canonical_config(config) if isinstance(config, dict) else config
+        track_query('export', request.values.get('query_type'), config=canonical, profile=profile, order_by=order_by, limit=limit)
+        log_query('export', config=canonical, order_by=order_by, limit=limit)
+        try:
+            finder_engine.order_clause(order_by)
+            cursor = db.cursor()
+            versions = read_versions(cursor)
+            admission.admit(config or {}, cursor, budget, limit, versions)
+            with admission.deadline(db, budget.timeout_ms):
+                candidate_uids = get_engine().find_candidates(config or {}, cursor, profile, versions)
+        except (ValueError, TypeError) as e:
+            # TypeError 为取值类型错误的条件 (例如 year_range: 2020)
+            track_admission(error=e)
+            return jsonify({'error': str(e)}), 400
+        track_admission('run')
+        if app.config['METRICS'] and candidate_uids is not None:
+            metrics.RESULT_ROWS.observe('export', value=len(candidate_uids))
+        # 结果行与记录分别使用独立的游标，记录查询不会打断正在迭代的结果游标
+        chunks = export_chunks(db.cursor(), db.cursor(), candidate_uids, output_format, with_records, limit, order_by)
+
+        mimetype = 'application/x-ndjson' if output_format == 'ndjson' else 'text/csv'
+        response = Response(chunks, content_type=f'{mimetype}; charset=utf-8',
+                            headers={'Content-Disposition': f'attachment; filename=oierfinder.{output_format}'})
+        response.call_on_close(db.close)
+        streaming = True
+        return response
+    finally:
+        # 开始流式输出后由响应关闭连接，此前的任何错误 (包括未预料的异常) 都在这里关闭
+        if not streaming:
+            db.close()
+
+def config_from_batch_item(item):
+    """批量接口中的单个条目：直接给出 config，或 {"yaml": ...} / {"luogu": ...}"""
+    if not isinstance(item, dict):
+        raise TypeError("每个条目必须是 JSON 对象")
+    if 'yaml' in item:
+        config = yaml.safe_load(item['yaml']) if item['yaml'] else {}
+        if config is not None and not isinstance(config, dict):
+            raise TypeError(NOT_MAPPING_ERROR)
+        return config
+    if 'luogu' in item:
+        return luogu_parser.convert_luogu_to_config(item['luogu'], MAPPING_FILE) if item['luogu'] else {}
+    return item
+
+@app.route('/api/search/batch', methods=['POST'])
+def search_batch():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get('configs'), list):
+        return jsonify({'error': "请求体必须是形如 {\"configs\": [...]} 的 JSON"}), 400
+    if len(payload['configs']) > MAX_BATCH_SIZE:
+        return jsonify({'error': f"单次最多提交 {MAX_BATCH_SIZE} 个查询"}), 400
+
+    try:
+        configs = [config_from_batch_item(item) for item in payload['configs']]
+    except (yaml.YAMLError, TypeError) as e:
+        return jsonify({'error': f"配置解析失败: {e}"}), 400
+
+    budget = app.config['QUERY_BUDGET']
+    db = get_db()
+    profile = finder_engine.QueryProfile(explain=False)
+    canonical = [query_key.canonical_config(c) if isinstance(c, dict) else c for c in configs]
+    track_query('batch', 'api', config=canonical, profile=profile, size=len(configs))
+    log_query('batch', configs=canonical)
+    try:
+        # 任一条目估计代价超出预算时拒绝整批；每个条目至多返回 max_rows 人 (按 DB 评分的前 max_rows 名)，
+        # 整批估计的结果人数超过 MAX_BATCH_ROWS 时也拒绝，使序列化的响应大小有上限；整批共享同一个时间上限
+        limits, decisions, total_rows = [], [], 0
+        versions = read_versions(db.cursor())
+        for i, config in enumerate(configs):
+            try:
+                limit, decision, estimated = admission.admit(config or {}, db.cursor(), budget, versions=versions)
+            except (admission.QueryRejected, TypeError) as e:
+                # TypeError 为取值类型错误的条件 (例如 year_range: 2020)
+                raise type(e)(f"第 {i + 1} 个查询: {e}") from e
+            # 估计偏低时实际人数也不超过 max_rows
+            if limit is None: limit = budget.max_rows
+            limits.append(limit)
+            decisions.append(decision)
+            total_rows += estimated.rows if limit is None else min(estimated.rows, limit)
+        max_batch_rows = app.config['MAX_BATCH_ROWS']
+        if max_batch_rows is not None and total_rows > max_batch_rows:
+            raise admission.QueryRejected(f"整批估计返回 {total_rows:.0f} 人，超过上限 {max_batch_rows} 人，"
+                                          f"请拆分批次或增加限制条件")
+        with admission.deadline(db, budget.timeout_ms):
+            results, stats = finder_engine.find_oiers_batch(configs, db.cursor(), profile, limits, versions)
+    except (ValueError, TypeError) as e:
+        track_admission(error=e)
+        return jsonify({'error': str(e)}), 400
+    if app.config['METRICS']:
+        for rows, decision in zip(results, decisions):
+            metrics.ADMISSION.inc(decision)
+            metrics.RESULT_ROWS.observe('batch', value=len(rows))
+    return jsonify({
+        'results': [{'count': len(rows), 'limit': limit, 'decision': decision, 'oiers': [dict(row) for row in rows]}
+                    for rows, limit, decision in zip(results, limits, decisions)],
+        'stats': stats,
+    })
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
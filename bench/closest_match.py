@@ -0,0 +1,97 @@
+# closest_match.py
+"""
+测量最接近的匹配 (utils/closest_match.py) 在条件很多的洛谷式查询上的耗时与效果。
+
+取获奖记录不少于 --min-records 条的若干名选手，把其全部记录转换为洛谷式条件，再把其中 --broken 条改为
+不存在的比赛 (模拟比赛更名或映射缺失)，使严格查询没有结果。对每个查询比较：
+    closest:   find_closest，每个条件只求值一次后计数
+    drop_one:  逐一去掉一条条件后执行严格查询 (N 次 find_oiers)，只能找回恰好缺一条的人
+并统计原选手在 closest 结果中是否排在第一。
+    postings:  原样的条件，由奖项倒排索引回答
+    sql:       每条条件加上 score_range，走 SQL 扫描
+
+用法 (在仓库根目录):
+    python -m bench.closest_match --db oier_data.db --queries 20 --broken 2
+"""
+import argparse
+import sqlite3
+import statistics
+import time
+
+from utils import closest_match, finder_engine
+
+
+def broken_configs(cursor, count, min_records, broken):
+    """返回 [(原选手 uid, 改坏 broken 条条件后的 config)]，条件与 bench.query_catalog.luogu_style_config 相同"""
+    uids = [row[0] for row in cursor.execute(
+        "SELECT r.oier_uid FROM Record r JOIN Contest c ON r.contest_id = c.id GROUP BY r.oier_uid "
+        "HAVING COUNT(DISTINCT c.year || c.type || r.level) >= ? ORDER BY r.oier_uid LIMIT ?", (min_records, count))]
+    configs = []
+    for uid in uids:
+        rows = cursor.execute("SELECT DISTINCT c.year, c.type, r.level FROM Record r JOIN Contest c ON r.contest_id = c.id "
+                              "WHERE r.oier_uid = ? ORDER BY c.year, c.type", (uid,)).fetchall()
+        records = [{'year_range': [year, year], 'contest_type': [contest_type], 'level_range': [level]}
+                   for year, contest_type, level in rows]
+        for constraint in records[1::len(records) // broken][:broken]:
+            constraint['contest_type'] = [constraint['contest_type'][0] + '(更名)']
+        configs.append((uid, {'records': records}))
+    return configs
+
+
+def with_score(config):
+    """同样的条件加上分数下限，使其不能由倒排索引回答"""
+    return {**config, 'records': [{**c, 'score_range': [0, None]} for c in config['records']]}
+
+
+def drop_one(config, cursor):
+    """逐一去掉一条条件后执行严格查询，返回找到的 uid 集合"""
+    found = set()
+    for i in range(len(config['records'])):
+        records = config['records'][:i] + config['records'][i + 1:]
+        found.update(row['uid'] for row in finder_engine.find_oiers({**config, 'records': records}, cursor))
+    return found
+
+
+def timed(function, repeat):
+    samples, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量最接近的匹配在多条件洛谷式查询上的耗时与效果。")
+    parser.add_argument('--db', default='oier_data.db', help="SQLite 数据库文件路径 (默认为: oier_data.db)")
+    parser.add_argument('--queries', type=int, default=20, help="查询个数 (默认为: 20)")
+    parser.add_argument('--min-records', type=int, default=20, help="每个查询至少的条件数 (默认为: 20)")
+    parser.add_argument('--broken', type=int, default=2, help="每个查询中改为不存在的比赛的条件数 (默认为: 2)")
+    parser.add_argument('-k', type=int, default=closest_match.DEFAULT_K, help=f"返回人数 (默认为: {closest_match.DEFAULT_K})")
+    parser.add_argument('--repeat', type=int, default=3, help="每个查询的重复次数 (默认为: 3)")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    configs = broken_configs(cursor, args.queries, args.min_records, args.broken)
+    sizes = [len(config['records']) for _, config in configs]
+    print(f"{len(configs)} 个查询，{min(sizes)}~{max(sizes)} 条条件，每个改坏 {args.broken} 条")
+    print(f"{'':<10} {'closest (ms)':>13} {'drop_one (ms)':>14} {'原选手第一':>10} {'drop_one 找回':>12}")
+    for name, transform in (('postings', lambda c: c), ('sql', with_score)):
+        closest_ms, drop_ms, first, recovered = [], [], 0, 0
+        for uid, config in configs:
+            config = transform(config)
+            elapsed, (_, results) = timed(lambda: closest_match.find_closest(config, cursor, args.k), args.repeat)
+            closest_ms.append(elapsed)
+            first += bool(results) and results[0]['oier']['uid'] == uid
+            elapsed, found = timed(lambda: drop_one(config, cursor), 1)
+            drop_ms.append(elapsed)
+            recovered += uid in found
+        print(f"{name:<10} {statistics.median(closest_ms):>13.1f} {statistics.median(drop_ms):>14.1f} "
+              f"{first:>7}/{len(configs)} {recovered:>9}/{len(configs)}")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# db_mode.py
+"""
+对比磁盘文件模式与内存副本模式 (utils/replica.py)：启动耗时与查询目录中各查询的延迟。
+
+用法 (在仓库根目录):
+    python -m bench.db_mode --db oier_data.db --repeat 5
+"""
+import argparse
+import sqlite3
+import statistics
+import time
+
+from bench.query_catalog import build_catalog
+from utils import finder_engine, replica
+
+
+def time_catalog(conn, repeat):
+    """返回 {查询名: 中位耗时毫秒}"""
+    cursor = conn.cursor()
+    timings = {}
+    for name, config in build_catalog(cursor):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            finder_engine.find_oiers(config, cursor)
+            samples.append((time.perf_counter() - started) * 1000)
+        timings[name] = statistics.median(samples)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比磁盘文件模式与内存副本模式的启动耗时和查询延迟。")
+    parser.add_argument('--db', default='oier_data.db', help="SQLite 数据库文件路径 (默认为: oier_data.db)")
+    parser.add_argument('--repeat', type=int, default=5, help="每个查询的重复次数，取中位数 (默认为: 5)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    file_conn = sqlite3.connect(args.db)
+    file_conn.row_factory = sqlite3.Row
+    file_startup = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    memory = replica.Replica(args.db)
+    memory_conn = memory.connect()
+    memory_startup = (time.perf_counter() - started) * 1000
+
+    try:
+        file_timings = time_catalog(file_conn, args.repeat)
+        memory_timings = time_catalog(memory_conn, args.repeat)
+    finally:
+        file_conn.close()
+        memory_conn.close()
+        memory.close()
+
+    print(f"{'':<24} {'file':>10} {'memory':>10}")
+    print(f"{'startup':<24} {file_startup:>10.2f} {memory_startup:>10.2f}")
+    for name in file_timings:
+        print(f"{name:<24} {file_timings[name]:>10.2f} {memory_timings[name]:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
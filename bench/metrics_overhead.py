@@ -0,0 +1,80 @@
+# metrics_overhead.py
+"""
+测量运行指标与慢查询日志 (utils/metrics.py) 的开销：对查询目录中的每个查询，分别在开启与关闭指标时
+请求 /search 的规范 GET 地址，比较中位耗时；另外单独计时一次请求的指标记录本身。
+
+用法 (在仓库根目录):
+    python -m bench.metrics_overhead --repeat 20
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from bench.query_catalog import build_catalog
+from utils import finder_engine, metrics
+
+
+def time_requests(web, client, urls, repeat):
+    """返回 ({查询名: 关闭时中位耗时毫秒}, {查询名: 开启时中位耗时毫秒})；两种设置交替执行，避免先后顺序带来的偏差"""
+    disabled, enabled = {}, {}
+    for name, url in urls:
+        samples = {False: [], True: []}
+        for i in range(repeat * 2):
+            web.app.config['METRICS'] = bool(i % 2)
+            started = time.perf_counter()
+            client.get(url).get_data()
+            samples[web.app.config['METRICS']].append((time.perf_counter() - started) * 1000)
+        disabled[name], enabled[name] = statistics.median(samples[False]), statistics.median(samples[True])
+    web.app.config['METRICS'] = True
+    return disabled, enabled
+
+
+def time_recording(count, profile):
+    """一次请求在 after_request 中的指标记录 (直方图、步骤耗时、低于阈值的慢查询检查) 的平均耗时 (微秒)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        slow_log = metrics.SlowQueryLog(os.path.join(tmp, 'slow.log'), 1000)
+        started = time.perf_counter()
+        for _ in range(count):
+            metrics.REQUEST_DURATION.observe('search', 'url', value=0.01)
+            metrics.observe_profile(profile)
+            metrics.RESULT_ROWS.observe('search', value=100)
+            slow_log.record('search', 10.0, config={}, profile=profile)
+        return (time.perf_counter() - started) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量运行指标与慢查询日志的开销。")
+    parser.add_argument('--db', default='oier_data.db', help="SQLite 数据库文件路径 (默认为: oier_data.db)")
+    parser.add_argument('--repeat', type=int, default=20, help="每个查询的重复次数，取中位数 (默认为: 20)")
+    args = parser.parse_args()
+
+    import app as web
+    web.DATABASE = args.db
+    client = web.app.test_client()
+    with web.app.test_request_context():
+        conn = sqlite3.connect(args.db)
+        catalog = build_catalog(conn.cursor())
+        urls = [(name, web.search_url(config, finder_engine.DEFAULT_ORDER_BY, web.DEFAULT_RESULT_LIMIT))
+                for name, config in catalog]
+        # 用一个典型查询的执行记录计时指标记录本身
+        profile = finder_engine.QueryProfile(explain=False)
+        finder_engine.find_oiers(dict(catalog)['single_province_year'], conn.cursor(), profile=profile)
+        conn.close()
+
+    time_requests(web, client, urls, 1)  # 预热各模块的缓存
+    disabled, enabled = time_requests(web, client, urls, args.repeat)
+
+    print(f"{'':<28} {'关闭 (ms)':>10} {'开启 (ms)':>10} {'差值 (ms)':>10}")
+    for name in disabled:
+        print(f"{name:<28} {disabled[name]:>10.3f} {enabled[name]:>10.3f} {enabled[name] - disabled[name]:>+10.3f}")
+    total_disabled, total_enabled = sum(disabled.values()), sum(enabled.values())
+    print(f"{'合计':<28} {total_disabled:>10.3f} {total_enabled:>10.3f} "
+          f"{(total_enabled - total_disabled) / total_disabled * 100:>+9.2f}%")
+    print(f"每次请求的指标记录: {time_recording(10000, profile):.2f} µs ({len(profile.steps)} 个查询步骤)")
+
+
+if __name__ == '__main__':
+    main()
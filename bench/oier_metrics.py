@@ -0,0 +1,96 @@
+# oier_metrics.py
+"""
+测量派生指标表 (utils/oier_metrics.py)：生成耗时、表与索引的大小，以及常见问题在指标表上的查询延迟
+与不使用指标表时的写法 (记录条件，或对 Record 表临时 GROUP BY 聚合) 的对比。
+
+指标表在数据库的内存副本上重新生成，不修改数据库文件。筛选只计求出候选 uid 的耗时，排序取前 K 名计入取出完整行。
+
+用法 (在仓库根目录):
+    python -m bench.oier_metrics --db oier_data.db --repeat 5
+"""
+import argparse
+import sqlite3
+import statistics
+import time
+
+from utils import finder_engine, oier_metrics
+
+# (说明, 使用指标表的 (config, order_by, limit), 不使用指标表的做法)
+CASES = (
+    ("至少一块 NOI 银牌",
+     ({'metrics': {'noi_best': [2, None]}}, finder_engine.DEFAULT_ORDER_BY, None),
+     ('config', {'records': [{'contest_type': ['NOI'], 'level_range': ['金牌', '银牌']}]})),
+    ("至少两次 NOIP 一等奖",
+     ({'metrics': {'noip_first': [2, None]}}, finder_engine.DEFAULT_ORDER_BY, None),
+     ('sql', "SELECT r.oier_uid FROM Record r JOIN Contest c ON r.contest_id = c.id "
+             "WHERE c.type IN ('NOIP', 'NOIP提高') AND r.level = '一等奖' GROUP BY r.oier_uid HAVING COUNT(*) >= 2")),
+    ("2018 年首次获奖",
+     ({'metrics': {'first_year': [2018, 2018]}}, finder_engine.DEFAULT_ORDER_BY, None),
+     ('sql', "SELECT r.oier_uid FROM Record r JOIN Contest c ON r.contest_id = c.id "
+             "GROUP BY r.oier_uid HAVING MIN(c.year) = 2018")),
+    ("NOIP 一等奖最多的前 20 名",
+     ({}, 'noip_first', 20),
+     ('sql', "SELECT r.oier_uid FROM Record r JOIN Contest c ON r.contest_id = c.id "
+             "WHERE c.type IN ('NOIP', 'NOIP提高') AND r.level = '一等奖' "
+             "GROUP BY r.oier_uid ORDER BY COUNT(*) DESC, r.oier_uid LIMIT 20")),
+)
+
+
+def timed(function, repeat):
+    samples, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def table_size(conn):
+    """指标表及其索引占用的字节数；SQLite 未编译 dbstat 时返回 None"""
+    try:
+        return conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = ? OR name LIKE 'idx_metrics_%'",
+                            (oier_metrics.TABLE,)).fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量派生指标表的生成耗时、大小与查询延迟。")
+    parser.add_argument('--db', default='oier_data.db', help="SQLite 数据库文件路径 (默认为: oier_data.db)")
+    parser.add_argument('--repeat', type=int, default=5, help="每个查询的重复次数 (默认为: 5)")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(':memory:')
+    source = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    source.backup(conn)
+    source.close()
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+
+    started = time.perf_counter()
+    rows = oier_metrics.build(cursor, verbose=False)
+    build_ms = (time.perf_counter() - started) * 1000
+    cursor.execute(f"ANALYZE {oier_metrics.TABLE}")
+    size = table_size(conn)
+    print(f"{rows} 名 OIer，{len(oier_metrics.COLUMNS)} 列指标；生成 (含索引) {build_ms:.0f} ms"
+          + (f"，表与索引共 {size / 2**20:.1f} MB" if size is not None else ""))
+
+    print(f"{'':<24} {'人数':>6} {'指标表 (ms)':>12} {'不使用 (ms)':>12}")
+    for label, (config, order_by, limit), (kind, baseline) in CASES:
+        if limit is None:
+            # 筛选只比较求出候选 uid 的耗时，不含取出完整行
+            metrics_ms, uids = timed(lambda: finder_engine.find_candidates(config, cursor), args.repeat)
+        else:
+            metrics_ms, found = timed(lambda: finder_engine.find_oiers(config, cursor, None, limit, order_by), args.repeat)
+            uids = [row['uid'] for row in found]
+        if kind == 'config':
+            baseline_ms, expected = timed(lambda: finder_engine.find_candidates(baseline, cursor), args.repeat)
+        else:
+            baseline_ms, expected = timed(lambda: [row[0] for row in cursor.execute(baseline)], args.repeat)
+        same = list(uids) == expected if limit is not None else set(uids) == set(expected)
+        print(f"{label:<24} {len(uids):>6} {metrics_ms:>12.1f} {baseline_ms:>12.1f}" + ("" if same else "  结果不一致!"))
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# parity.py
+"""
+检查 columnar_engine 与 finder_engine 对同一批 config 返回相同的结果。
+config 来自基准查询目录，外加从数据库中随机抽样生成的条件组合。
+
+用法 (在仓库根目录):
+    python -m bench.parity --db oier_data.db --random 300
+"""
+import argparse
+import random
+import sqlite3
+import sys
+
+from bench.query_catalog import build_catalog, luogu_style_config
+from utils import columnar_engine, finder_engine
+
+
+def random_configs(cursor, count, seed):
+    """从数据中抽样，生成覆盖各类字段 (含边界与空结果) 的随机 config"""
+    rng = random.Random(seed)
+    years = [row[0] for row in cursor.execute("SELECT DISTINCT year FROM Contest WHERE year IS NOT NULL ORDER BY year")]
+    types = [row[0] for row in cursor.execute("SELECT DISTINCT type FROM Contest")]
+    provinces = [row[0] for row in cursor.execute("SELECT DISTINCT province FROM Record")]
+    levels = [row[0] for row in cursor.execute("SELECT DISTINCT level FROM Record")]
+
+    def maybe_range(values):
+        low, high = sorted(rng.sample(values, 2)) if len(values) > 1 else (values[0], values[0])
+        return [rng.choice([low, None]), rng.choice([high, None])]
+
+    def random_constraint():
+        constraint = {}
+        if rng.random() < 0.7: constraint['year_range'] = maybe_range(years)
+        if rng.random() < 0.5: constraint['contest_type'] = rng.sample(types, rng.randint(1, 3))
+        if rng.random() < 0.3: constraint['province'] = rng.sample(provinces, rng.randint(1, 3)) + (['不存在'] if rng.random() < 0.1 else [])
+        if rng.random() < 0.4: constraint['level_range'] = rng.sample(levels, rng.randint(1, 2))
+        if rng.random() < 0.2: constraint['score_range'] = maybe_range(list(range(0, 1200, 50)))
+        if rng.random() < 0.2: constraint['rank_range'] = maybe_range(list(range(1, 2000, 25)))
+        return constraint
+
+    configs = []
+    for n in range(count):
+        if n % 10 == 0:
+            configs.append(luogu_style_config(cursor, rng.randrange(200)))
+            continue
+        config = {'records': [random_constraint() for _ in range(rng.randint(0, 4))]}
+        if n % 10 == 5:
+            # 条件组: any_of / none_of，偶尔嵌套
+            config['any_of'] = [random_constraint() for _ in range(rng.randint(1, 3))]
+            config['none_of'] = [random_constraint() for _ in range(rng.randint(0, 2))]
+            if rng.random() < 0.5:
+                config['records'].append({'any_of': [random_constraint(), {'none_of': [random_constraint()]}]})
+        if rng.random() < 0.3: config['enroll_year_range'] = maybe_range(years)
+        if rng.random() < 0.1: config['grade_range'] = maybe_range(list(range(1, 13)))
+        configs.append(config)
+    return configs
+
+
+def result_key(rows):
+    """结果的比较键：uid 集合与分数序列 (同分者的先后顺序由查询计划决定，不参与比较)"""
+    return sorted(row['uid'] for row in rows), [row['oierdb_score'] for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较 columnar_engine 与 finder_engine 的查询结果。")
+    parser.add_argument('--db', default='oier_data.db', help="SQLite 数据库文件路径 (默认为: oier_data.db)")
+    parser.add_argument('--random', type=int, default=200, help="随机生成的 config 个数 (默认为: 200)")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    if not columnar_engine.available():
+        print("numpy 未安装，无法检查列式引擎。")
+        return 2
+
+    conn = sqlite3.connect(args.db)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    try:
+        configs = [(name, config) for name, config in build_catalog(cursor)]
+        configs += [(f"random_{n}", config) for n, config in enumerate(random_configs(cursor, args.random, args.seed))]
+        failures = 0
+        for name, config in configs:
+            expected = finder_engine.find_oiers(config, cursor)
+            actual = columnar_engine.find_oiers(config, cursor)
+            if result_key(expected) != result_key(actual):
+                failures += 1
+                print(f"MISMATCH {name}: sqlite={len(expected)} columnar={len(actual)} config={config}")
+        print(f"{len(configs) - failures}/{len(configs)} configs match.")
+        return 1 if failures else 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+# plan_cache.py
+"""
+测量查询计划缓存 (utils/query_plan.py) 对小型洛谷式查询的效果：这类查询只有几条精确的记录条件，
+执行本身很快，编译 SQL 与解析比赛目录等准备工作占比较大。
+
+对每组查询分别在「每次查询前清空计划缓存与比赛解析缓存」(冷) 与「缓存已预热」(热) 两种设置下交替计时，
+比较中位耗时；另外给出单独编译一个计划与命中缓存的耗时。
+    postings: 原样的洛谷式条件，由奖项倒排索引回答
+    sql:      每条条件加上 score_range，走 SQL (扫描/枚举)，SQL 文本稳定时命中连接上的预编译语句缓存
+
+用法 (在仓库根目录):
+    python -m bench.plan_cache --db oier_data.db --queries 50 --repeat 20
+"""
+import argparse
+import sqlite3
+import statistics
+import time
+
+from bench.query_catalog import luogu_style_config
+from utils import constraint_tree, cost_model, finder_engine, query_plan
+
+
+def small_luogu_configs(cursor, count, max_records):
+    """从记录数居中的选手中确定性地选取记录条件不超过 max_records 条的洛谷式查询"""
+    oier_count = cursor.execute("SELECT COUNT(*) FROM OIer").fetchone()[0]
+    configs, nth = [], oier_count // 20
+    while len(configs) < count and nth < oier_count:
+        config = luogu_style_config(cursor, nth)
+        if 2 <= len(config['records']) <= max_records:
+            configs.append(config)
+        nth += 37
+    return configs
+
+
+def with_score(config):
+    """同样的条件加上分数下限，使其不能由倒排索引回答"""
+    return {**config, 'records': [{**c, 'score_range': [0, None]} for c in config['records']]}
+
+
+def clear_caches(cursor):
+    query_plan._PLANS.clear()
+    query_plan._STEPS.clear()
+    cost_model.for_cursor(cursor)._contest_matches.clear()
+
+
+def time_queries(cursor, configs, repeat):
+    """返回 (冷的中位耗时微秒, 热的中位耗时微秒)，两种设置交替执行"""
+    cold, warm = [], []
+    for config in configs:
+        finder_engine.find_oiers(config, cursor, limit=500)
+        samples = {True: [], False: []}
+        for i in range(repeat * 2):
+            is_cold = bool(i % 2)
+            if is_cold:
+                clear_caches(cursor)
+            started = time.perf_counter()
+            finder_engine.find_oiers(config, cursor, limit=500)
+            samples[is_cold].append((time.perf_counter() - started) * 1e6)
+        cold.append(statistics.median(samples[True]))
+        warm.append(statistics.median(samples[False]))
+    return statistics.median(cold), statistics.median(warm)
+
+
+def time_planning(configs, count):
+    """单独计时编译计划 (冷) 与命中缓存后绑定取值 (热) 的平均耗时 (微秒)"""
+    started = time.perf_counter()
+    for i in range(count):
+        config = configs[i % len(configs)]
+        query_plan._PLANS.clear(); query_plan._STEPS.clear()
+        query_plan.plan_for(config).bind(config)
+    cold = (time.perf_counter() - started) / count * 1e6
+    started = time.perf_counter()
+    for i in range(count):
+        config = configs[i % len(configs)]
+        tree = constraint_tree.build_tree(config)
+        query_plan.plan_for(config, tree).bind(config, tree)
+    return cold, (time.perf_counter() - started) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量查询计划缓存对小型洛谷式查询的效果。")
+    parser.add_argument('--db', default='oier_data.db', help="SQLite 数据库文件路径 (默认为: oier_data.db)")
+    parser.add_argument('--queries', type=int, default=50, help="每组的查询个数 (默认为: 50)")
+    parser.add_argument('--max-records', type=int, default=8, help="每个查询最多的记录条件数 (默认为: 8)")
+    parser.add_argument('--repeat', type=int, default=20, help="每个查询在每种设置下的重复次数 (默认为: 20)")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    cursor = conn.cursor()
+    configs = small_luogu_configs(cursor, args.queries, args.max_records)
+    groups = [('postings', configs), ('sql', [with_score(config) for config in configs])]
+
+    print(f"{len(configs)} 个查询，每个 2~{args.max_records} 条记录条件")
+    print(f"{'':<10} {'冷 (µs)':>10} {'热 (µs)':>10} {'变化':>8}")
+    for name, group in groups:
+        cold, warm = time_queries(cursor, group, args.repeat)
+        print(f"{name:<10} {cold:>10.1f} {warm:>10.1f} {(warm / cold - 1) * 100:>+7.1f}%")
+    cold, warm = time_planning(configs, 2000)
+    print(f"编译计划 {cold:.1f} µs，命中缓存并绑定取值 {warm:.1f} µs")
+    print(f"缓存状态: {query_plan.cache_info()}")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+# query_catalog.py
+"""
+基准测试使用的查询形状目录。每个条目是 (名称, config)，config 与 YAML 配置格式一致。
+依赖数据内容的查询 (例如洛谷式多条件查询) 从数据库中确定性地选取。
+"""
+
+
+def luogu_style_config(cursor, nth=0):
+    """取记录数第 nth 多的选手，把其全部记录逐条转换为洛谷式的精确条件"""
+    cursor.execute(
+        "SELECT oier_uid FROM Record GROUP BY oier_uid ORDER BY COUNT(*) DESC, oier_uid LIMIT 1 OFFSET ?", (nth,))
+    row = cursor.fetchone()
+    if row is None:
+        return {'records': []}
+    cursor.execute(
+        "SELECT DISTINCT c.year, c.type, r.level FROM Record r JOIN Contest c ON r.contest_id = c.id "
+        "WHERE r.oier_uid = ? ORDER BY c.year, c.type", (row[0],))
+    return {
+        'enroll_year_range': [None, None],
+        'grade_range': [None, None],
+        'records': [
+            {'year_range': [year, year], 'contest_type': [contest_type], 'level_range': [level]}
+            for year, contest_type, level in cursor.fetchall()
+        ],
+    }
+
+
+def build_catalog(cursor):
+    """返回 [(name, config), ...]"""
+    return [
+        ('empty', {}),
+        ('enroll_only', {'enroll_year_range': [2016, 2018]}),
+        ('single_noi_gold', {'records': [
+            {'year_range': [2023, 2023], 'contest_type': ['NOI'], 'level_range': ['金牌']},
+        ]}),
+        ('single_province_year', {'records': [
+            {'province': ['浙江'], 'year_range': [2022, 2022]},
+        ]}),
+        ('enroll_then_enumerate', {'enroll_year_range': [2017, 2017], 'records': [
+            {'contest_type': ['NOI', 'NOID类']},
+            {'contest_type': ['CSP提高', 'NOIP提高'], 'level_range': ['一等奖']},
+        ]}),
+        ('luogu_many', luogu_style_config(cursor, 0)),
+        ('luogu_many_2', luogu_style_config(cursor, 1)),
+        ('broad_multi', {'records': [
+            {'province': ['浙江', '江苏', '广东'], 'year_range': [2018, 2023]},
+            {'level_range': ['一等奖', '二等奖'], 'year_range': [2015, 2023]},
+            {'contest_type': ['NOIP提高', 'CSP提高', 'NOIP'], 'score_range': [200, None]},
+        ]}),
+    ]
@@ -0,0 +1,216 @@
+# replay.py
+"""
+回放查询日志 (utils/query_log.py，app.py 设置 OIERFINDER_QUERY_LOG 后记录)，用于评估引擎或数据库结构的改动对真实流量的影响。
+
+目标可以是本地数据库 (直接调用查询引擎，每个线程一个连接) 或正在运行的 app.py：
+    search 条目回放为 GET /search?q=... (与记录时相同的规范地址，经过准入控制与结果页渲染，从页面中取出 uid)
+    export 条目回放为 /export?format=ndjson
+    batch 条目回放为 POST /api/search/batch
+对 app.py 回放时结果会按 web 的查询预算降级 (见 utils/admission.py)，与直接调用引擎的结果不一定相同。
+
+报告吞吐量、延迟分位数与错误率；指定 --baseline 时逐条对比结果 (uid 列表的摘要)，有差异时返回非零。
+
+用法 (在仓库根目录):
+    python -m bench.replay queries.jsonl --save run.json                      # 直接调用引擎
+    python -m bench.replay queries.jsonl --target http://127.0.0.1:5000 -c 8 --rate 50
+    python -m bench.replay queries.jsonl --backend columnar --baseline run.json
+"""
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import columnar_engine, finder_engine, query_key, query_log
+
+ENGINES = {'sqlite': finder_engine, 'columnar': columnar_engine}
+# 结果页表格中每行的第一列为 uid (见 templates/results.html)
+RESULT_UID = re.compile(r'<tr>\s*<td>(\d+)</td>')
+
+
+def digest(uids):
+    """结果的摘要：按返回顺序的 uid 列表 (排序结果的顺序也需要一致)"""
+    return hashlib.sha1(json.dumps(uids).encode('ascii')).hexdigest()[:16]
+
+
+class EngineTarget:
+    """在本进程中直接调用查询引擎，每个线程使用各自的只读连接"""
+
+    def __init__(self, db_file, backend):
+        self.db_file = db_file
+        self.engine = ENGINES[backend]
+        self.local = threading.local()
+
+    def cursor(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = sqlite3.connect(f"file:{self.db_file}?mode=ro", uri=True, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+        return conn.cursor()
+
+    def run(self, entry):
+        """返回 [uid 列表, ...] (batch 条目每个 config 一个列表)"""
+        cursor = self.cursor()
+        if entry['endpoint'] == 'batch':
+            results, _ = finder_engine.find_oiers_batch(entry['configs'], cursor)
+            return [[row['uid'] for row in rows] for rows in results]
+        rows = self.engine.find_oiers(entry.get('config') or {}, cursor, limit=entry.get('limit'),
+                                      order_by=entry.get('order_by') or finder_engine.DEFAULT_ORDER_BY)
+        return [[row['uid'] for row in rows]]
+
+
+class HttpTarget:
+    """通过 HTTP 请求正在运行的 app.py"""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, path, data=None, headers=None):
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers or {})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                return response.read().decode('utf-8')
+        except urllib.error.HTTPError as e:
+            body = e.read().decode('utf-8', 'replace')
+            try:
+                message = json.loads(body).get('error', body)
+            except (ValueError, AttributeError):
+                message = body[:200]
+            raise RuntimeError(f"HTTP {e.code}: {message}") from e
+
+    def run(self, entry):
+        if entry['endpoint'] == 'batch':
+            body = json.dumps({'configs': entry['configs']}, ensure_ascii=False).encode('utf-8')
+            payload = json.loads(self.request('/api/search/batch', body, {'Content-Type': 'application/json'}))
+            return [[oier['uid'] for oier in result['oiers']] for result in payload['results']]
+        order_by = entry.get('order_by') or finder_engine.DEFAULT_ORDER_BY
+        if entry['endpoint'] == 'search':
+            # 与结果页相同的规范 GET 地址；不带 If-None-Match，每次都完整执行并渲染
+            params = {'q': query_key.encode_config(entry.get('config') or {}), 'order_by': order_by, 'limit': entry.get('limit') or 0}
+            page = self.request('/search?' + urllib.parse.urlencode(params))
+            return [[int(uid) for uid in RESULT_UID.findall(page)]]
+        # JSON 也是合法的 YAML，config 原样作为 yaml_content 提交
+        params = {'query_type': 'yaml', 'yaml_content': json.dumps(entry.get('config') or {}, ensure_ascii=False),
+                  'format': 'ndjson', 'order_by': order_by,
+                  'limit': entry.get('limit') or 0}
+        body = self.request('/export', urllib.parse.urlencode(params).encode('utf-8'))
+        return [[json.loads(line)['uid'] for line in body.splitlines() if line]]
+
+
+def replay(target, entries, concurrency, rate):
+    """按 rate (每秒请求数，0 表示不限) 依次发出请求，最多 concurrency 个同时执行；返回 (每条的结果, 总耗时秒)"""
+    results = [None] * len(entries)
+
+    def run_one(index, entry):
+        started = time.perf_counter()
+        try:
+            uids = target.run(entry)
+            result = {'ok': True, 'count': sum(len(u) for u in uids), 'digest': digest(uids)}
+        except Exception as e:  # 回放需要统计所有失败，包括超时与连接错误
+            result = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+        result['latency_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        results[index] = result
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for index, entry in enumerate(entries):
+            if rate > 0:
+                delay = started + index / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            pool.submit(run_one, index, entry)
+    return results, time.perf_counter() - started
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def summarize(results, elapsed):
+    latencies = [r['latency_ms'] for r in results]
+    errors = sum(1 for r in results if not r['ok'])
+    return {
+        'requests': len(results), 'errors': errors, 'error_rate': round(errors / max(len(results), 1), 4),
+        'elapsed_s': round(elapsed, 3), 'throughput_rps': round(len(results) / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': {'mean': round(statistics.fmean(latencies), 3) if latencies else 0.0,
+                       'p50': percentile(latencies, 50), 'p90': percentile(latencies, 90),
+                       'p99': percentile(latencies, 99), 'max': max(latencies, default=0.0)},
+    }
+
+
+def compare(results, baseline):
+    """逐条对比结果摘要，返回结果不同 (含一方出错) 的条目下标"""
+    base_results = baseline['results']
+    if len(base_results) != len(results):
+        print(f"警告: 基线有 {len(base_results)} 条结果，本次为 {len(results)} 条，只对比前 {min(len(base_results), len(results))} 条",
+              file=sys.stderr)
+    return [i for i, (current, base) in enumerate(zip(results, base_results))
+            if current['ok'] != base['ok'] or current.get('digest') != base.get('digest')]
+
+
+def print_summary(summary, label):
+    latency = summary['latency_ms']
+    print(f"[{label}] {summary['requests']} 个请求，{summary['errors']} 个错误 ({summary['error_rate']:.2%})，"
+          f"耗时 {summary['elapsed_s']:.2f} s，吞吐量 {summary['throughput_rps']:.2f} 请求/秒")
+    print(f"[{label}] 延迟 (ms): 平均 {latency['mean']:.2f}  p50 {latency['p50']:.2f}  p90 {latency['p90']:.2f}  "
+          f"p99 {latency['p99']:.2f}  最大 {latency['max']:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放查询日志，报告吞吐量、延迟与错误率，并与基线对比结果。")
+    parser.add_argument('log', help="查询日志文件 (JSONL)")
+    parser.add_argument('--target', default='engine', help="engine 直接调用查询引擎，或 app.py 的地址如 http://127.0.0.1:5000 (默认为: engine)")
+    parser.add_argument('--db', default='oier_data.db', help="engine 目标使用的数据库文件 (默认为: oier_data.db)")
+    parser.add_argument('--backend', choices=sorted(ENGINES), default='sqlite', help="engine 目标使用的查询引擎 (默认为: sqlite)")
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help="同时执行的请求数 (默认为: 4)")
+    parser.add_argument('--rate', type=float, default=0, help="每秒发出的请求数，0 表示不限 (默认为: 0)")
+    parser.add_argument('--limit', type=int, help="只回放日志中的前 N 条")
+    parser.add_argument('--timeout', type=float, default=60, help="HTTP 请求超时秒数 (默认为: 60)")
+    parser.add_argument('--save', help="把本次结果 (汇总与逐条结果) 保存为 JSON，可作为之后的基线")
+    parser.add_argument('--baseline', help="与之前 --save 保存的结果对比")
+    args = parser.parse_args()
+
+    entries = list(query_log.read(args.log))[:args.limit]
+    if not entries:
+        print(f"查询日志 '{args.log}' 中没有可回放的查询。", file=sys.stderr)
+        return 1
+    target = EngineTarget(args.db, args.backend) if args.target == 'engine' else HttpTarget(args.target, args.timeout)
+
+    results, elapsed = replay(target, entries, max(args.concurrency, 1), args.rate)
+    summary = summarize(results, elapsed)
+    print_summary(summary, '本次')
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'target': args.target, 'summary': summary, 'results': results}, f, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print_summary(baseline['summary'], '基线')
+        base_p50, base_p99 = baseline['summary']['latency_ms']['p50'], baseline['summary']['latency_ms']['p99']
+        if base_p50 and base_p99:
+            print(f"p50 变化 {(summary['latency_ms']['p50'] / base_p50 - 1) * 100:+.1f}%，"
+                  f"p99 变化 {(summary['latency_ms']['p99'] / base_p99 - 1) * 100:+.1f}%")
+        diffs = compare(results, baseline)
+        if diffs:
+            print(f"{len(diffs)} 条查询的结果与基线不同，例如第 {', '.join(str(i + 1) for i in diffs[:10])} 条")
+            return 1
+        print("全部结果与基线一致")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
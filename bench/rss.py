@@ -0,0 +1,94 @@
+# rss.py
+"""
+测量多个 worker 进程同时查询时的内存占用，对比使用快照 (mmap 共享) 与不使用快照 (各进程私有副本)。
+
+每个 worker 与 gunicorn 的 worker 一样独立导入并打开数据库，执行一遍基准查询目录后，
+在所有 worker 都存活时读取 /proc/self/smaps_rollup 中的 RSS 与 PSS (按共享进程数分摊后的内存)。
+
+用法 (在仓库根目录，仅限 Linux):
+    python -m bench.rss --db oier_data.db --workers 8
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+
+def read_memory():
+    """返回 {'rss': KB, 'pss': KB, 'shared': KB, 'private': KB}"""
+    fields = {'Rss': 'rss', 'Pss': 'pss', 'Shared_Clean': 'shared', 'Shared_Dirty': 'shared',
+              'Private_Clean': 'private', 'Private_Dirty': 'private'}
+    memory = dict.fromkeys(fields.values(), 0)
+    with open('/proc/self/smaps_rollup', 'r') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if name in fields:
+                memory[fields[name]] += int(rest.split()[0])
+    return memory
+
+
+def worker(db_file, backend, barrier, queue):
+    # 与 web worker 相同：导入后打开数据库，按需加载引擎数据
+    from bench.query_catalog import build_catalog
+    from utils import columnar_engine, finder_engine
+    engine = columnar_engine if backend == 'columnar' else finder_engine
+
+    started = time.perf_counter()
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    catalog = build_catalog(cursor)
+    engine.find_oiers(catalog[2][1], cursor)
+    ready_ms = (time.perf_counter() - started) * 1000
+    for _, config in catalog:
+        engine.find_oiers(config, cursor)
+
+    barrier.wait()
+    queue.put(dict(read_memory(), ready_ms=ready_ms))
+    barrier.wait()
+    conn.close()
+
+
+def measure(db_file, backend, workers):
+    """启动 workers 个进程 (spawn，不共享父进程内存)，返回各进程的测量结果"""
+    context = multiprocessing.get_context('spawn')
+    barrier, queue = context.Barrier(workers), context.Queue()
+    processes = [context.Process(target=worker, args=(db_file, backend, barrier, queue)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量多 worker 查询时的内存占用 (快照 vs 无快照)。")
+    parser.add_argument('--db', default='oier_data.db', help="SQLite 数据库文件路径 (默认为: oier_data.db)")
+    parser.add_argument('--workers', type=int, default=8, help="worker 进程数 (默认为: 8)")
+    parser.add_argument('--backend', choices=['sqlite', 'columnar'], default='columnar', help="查询引擎 (默认为: columnar)")
+    parser.add_argument('--snapshot', choices=['on', 'off', 'both'], default='both', help="是否使用快照 (默认为: both)")
+    args = parser.parse_args()
+
+    if args.snapshot == 'both':
+        # 快照开关在导入时读取，两种模式分别在子进程中测量
+        for mode in ('off', 'on'):
+            subprocess.run([sys.executable, '-m', 'bench.rss', '--db', args.db, '--workers', str(args.workers),
+                            '--backend', args.backend, '--snapshot', mode], check=True)
+        return
+
+    os.environ['OIERFINDER_SNAPSHOT'] = '1' if args.snapshot == 'on' else '0'
+    results = measure(args.db, args.backend, args.workers)
+    total = {key: sum(r[key] for r in results) for key in ('rss', 'pss', 'private')}
+    print(f"backend={args.backend} snapshot={args.snapshot} workers={args.workers}")
+    print(f"  RSS total {total['rss'] / 1024:8.1f} MB   per worker {total['rss'] / 1024 / len(results):7.1f} MB")
+    print(f"  PSS total {total['pss'] / 1024:8.1f} MB   per worker {total['pss'] / 1024 / len(results):7.1f} MB")
+    print(f"  private   {total['private'] / 1024:8.1f} MB   "
+          f"first query after start {sum(r['ready_ms'] for r in results) / len(results):.0f} ms (mean)")
+
+
+if __name__ == '__main__':
+    main()
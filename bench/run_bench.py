@@ -0,0 +1,203 @@
+# run_bench.py
+"""
+离线基准测试: 生成合成数据 -> create_db 导入 -> calculate_stats -> finder_engine 查询目录。
+结果写入 JSON，并与已保存的基线比较，任何指标退化超过阈值时以非零状态退出。
+
+用法 (在仓库根目录):
+    python -m bench.run_bench --scale 1
+    python -m bench.run_bench --scale 1 --save-baseline
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import time
+
+import calculate_stats
+import create_db
+from bench import synth_data
+from bench.query_catalog import build_catalog
+from utils import columnar_engine, finder_engine
+
+DEFAULT_WORKDIR = 'bench/data'
+DEFAULT_OUTPUT = 'bench/results.json'
+DEFAULT_BASELINE = 'bench/baseline.json'
+
+
+def timed(func, *args, quiet=True, **kwargs):
+    """执行 func 并返回 (结果, 耗时毫秒)，quiet 时屏蔽其打印输出"""
+    sink = io.StringIO() if quiet else sys.stdout
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(sink):
+        result = func(*args, **kwargs)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def prepare_data(workdir, scale, seed):
+    """确保对应规模的合成数据存在，返回数据目录"""
+    data_dir = os.path.join(workdir, f"scale_{scale:g}_seed_{seed}")
+    if not (os.path.exists(os.path.join(data_dir, 'static.json')) and os.path.exists(os.path.join(data_dir, 'result.txt'))):
+        print(f"Generating synthetic data (scale={scale:g}, seed={seed})...")
+        synth_data.generate(data_dir, scale, seed)
+    return data_dir
+
+
+def bench_queries(db_file, repeat, engine=finder_engine):
+    """用 engine 对查询目录中的每个配置执行 repeat 次，返回 {name: {...}}"""
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    results = {}
+    try:
+        if engine is columnar_engine:
+            _, load_ms = timed(columnar_engine.load, cursor)
+            results['columnar_load'] = {'median_ms': load_ms, 'min_ms': load_ms, 'max_ms': load_ms, 'rows': 0, 'constraints': 0}
+            print(f"  {'columnar_load':<24} {load_ms:>10.2f} ms")
+        for name, config in build_catalog(cursor):
+            samples, rows = [], None
+            for _ in range(repeat):
+                found, elapsed = timed(engine.find_oiers, config, cursor)
+                samples.append(elapsed)
+                rows = len(found)
+            results[name] = {
+                'median_ms': statistics.median(samples), 'min_ms': min(samples),
+                'max_ms': max(samples), 'rows': rows, 'constraints': len(config.get('records', [])),
+            }
+            print(f"  {name:<24} {results[name]['median_ms']:>10.2f} ms  rows={rows}")
+
+        if engine is not finder_engine:
+            return results
+
+        # 批量接口: 整个目录重复 3 遍作为一批，衡量条件共享的效果
+        batch = [config for _, config in build_catalog(cursor)] * 3
+        samples = []
+        for _ in range(repeat):
+            (found, stats), elapsed = timed(finder_engine.find_oiers_batch, batch, cursor)
+            samples.append(elapsed)
+        results['batch_catalog_x3'] = {
+            'median_ms': statistics.median(samples), 'min_ms': min(samples), 'max_ms': max(samples),
+            'rows': sum(len(rows) for rows in found), 'constraints': stats['constraints_total'],
+            'evaluations': stats['evaluations'],
+        }
+        print(f"  {'batch_catalog_x3':<24} {results['batch_catalog_x3']['median_ms']:>10.2f} ms  "
+              f"evaluations={stats['evaluations']}/{stats['constraints_total']}")
+    finally:
+        conn.close()
+    return results
+
+
+def flatten_metrics(report):
+    """把报告展开为 {指标名: 毫秒}，用于与基线比较"""
+    metrics = {'ingest_ms': report['ingest_ms'], 'calculate_stats_ms': report['calculate_stats_ms']}
+    for name, item in report['queries'].items():
+        metrics[f'query.{name}.median_ms'] = item['median_ms']
+    for name, item in report.get('columnar_queries', {}).items():
+        metrics[f'columnar.{name}.median_ms'] = item['median_ms']
+    return metrics
+
+
+def compare_with_baseline(report, baseline, threshold, min_delta_ms):
+    """返回退化列表 [(指标, 基线, 当前)]，以及结果行数不一致的查询"""
+    regressions, mismatches = [], []
+    current, base = flatten_metrics(report), flatten_metrics(baseline)
+    for key, value in current.items():
+        if key not in base:
+            continue
+        if value > base[key] * (1 + threshold) and value - base[key] > min_delta_ms:
+            regressions.append((key, base[key], value))
+    for name, item in report['queries'].items():
+        base_item = baseline['queries'].get(name)
+        if base_item and base_item['rows'] != item['rows']:
+            mismatches.append((name, base_item['rows'], item['rows']))
+    # 列式引擎必须与 SQL 引擎返回相同的行数
+    for name, item in report.get('columnar_queries', {}).items():
+        sql_item = report['queries'].get(name)
+        if sql_item and sql_item['rows'] != item['rows']:
+            mismatches.append((f'columnar.{name}', sql_item['rows'], item['rows']))
+    return regressions, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OIerFinder 离线基准测试。")
+    parser.add_argument('--scale', type=float, default=1.0, help="数据规模，1/10/100 分别对应真实 OIerDb 的 1×/10×/100× (默认为: 1)")
+    parser.add_argument('--seed', type=int, default=synth_data.DEFAULT_SEED, help="合成数据的随机种子")
+    parser.add_argument('--workdir', default=DEFAULT_WORKDIR, help=f"合成数据与数据库的存放目录 (默认为: {DEFAULT_WORKDIR})")
+    parser.add_argument('--repeat', type=int, default=5, help="每个查询的重复次数，取中位数 (默认为: 5)")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help=f"结果 JSON 路径 (默认为: {DEFAULT_OUTPUT})")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help=f"基线 JSON 路径 (默认为: {DEFAULT_BASELINE})")
+    parser.add_argument('--threshold', type=float, default=0.25, help="允许的相对退化比例 (默认为: 0.25)")
+    parser.add_argument('--min-delta-ms', type=float, default=5.0, help="忽略小于该绝对值的退化，避免噪声 (默认为: 5)")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果保存为新的基线")
+    args = parser.parse_args()
+
+    data_dir = prepare_data(args.workdir, args.scale, args.seed)
+    db_file = os.path.join(data_dir, 'oier_data.db')
+    stats_file = os.path.join(data_dir, 'contest_stats.json')
+
+    print("Timing create_db ingest...")
+    _, ingest_ms = timed(create_db.build_database,
+                         os.path.join(data_dir, 'static.json'), os.path.join(data_dir, 'result.txt'), db_file)
+    print(f"  ingest {ingest_ms:.0f} ms")
+
+    print("Timing calculate_stats...")
+    _, stats_ms = timed(calculate_stats.generate_stats_json, db_file, stats_file)
+    print(f"  calculate_stats {stats_ms:.0f} ms")
+
+    print("Timing finder_engine.find_oiers...")
+    queries = bench_queries(db_file, args.repeat)
+    columnar_queries = {}
+    if columnar_engine.available():
+        print("Timing columnar_engine.find_oiers...")
+        columnar_queries = bench_queries(db_file, args.repeat, columnar_engine)
+
+    report = {
+        'meta': {
+            'scale': args.scale, 'seed': args.seed, 'repeat': args.repeat,
+            'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(), 'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'ingest_ms': ingest_ms,
+        'calculate_stats_ms': stats_ms,
+        'queries': queries,
+        'columnar_queries': columnar_queries,
+    }
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if (baseline['meta']['scale'], baseline['meta']['seed']) != (args.scale, args.seed):
+        print(f"Baseline was recorded at scale={baseline['meta']['scale']:g} seed={baseline['meta']['seed']}, "
+              f"not comparable with scale={args.scale:g} seed={args.seed}.")
+        return 2
+
+    regressions, mismatches = compare_with_baseline(report, baseline, args.threshold, args.min_delta_ms)
+    for name, expected, actual in mismatches:
+        print(f"RESULT MISMATCH {name}: baseline rows={expected}, current rows={actual}")
+    for key, base_value, value in regressions:
+        print(f"REGRESSION {key}: {base_value:.2f} ms -> {value:.2f} ms ({value / base_value - 1:+.0%})")
+    if regressions or mismatches:
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
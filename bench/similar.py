@@ -0,0 +1,123 @@
+# similar.py
+"""
+测量相似 OIer 索引 (utils/similarity.py)：构建耗时与峰值内存、文件大小、查询延迟，以及与暴力精确计算相比的召回率。
+
+构建在子进程中进行 (峰值 RSS 只计构建本身)，索引写入临时文件，不覆盖数据库旁的正式索引。
+召回率: 对抽样的 uid 用 numpy 对全部 OIer 精确计算 Jaccard 系数，取第 k 名的系数为线，
+LSH 结果中系数不低于该线的比例 (同分者可以互换，不按 uid 比较)。
+
+用法 (在仓库根目录):
+    python -m bench.similar --db oier_data.db --queries 500 -k 10
+    python -m bench.similar --num-perm 128 --bands 32      # 比较其他参数
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import sqlite3
+import statistics
+import time
+
+import numpy as np
+
+from utils import similarity
+from utils.db_meta import get_data_version
+
+
+def _build(db, path, num_perm, bands, queue):
+    conn = sqlite3.connect(db)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    size = similarity.build(conn.cursor(), path, get_data_version(conn.cursor()), num_perm, bands)
+    queue.put((time.perf_counter() - started, size, (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024))
+    conn.close()
+
+
+def build_in_subprocess(db, path, num_perm, bands):
+    """返回 (构建秒数, 文件字节数, 构建期间峰值 RSS 增量 MB)"""
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_build, args=(db, path, num_perm, bands, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+class ExactJaccard:
+    """用倒排表对全部 OIer 精确计算 Jaccard 系数 (暴力基准)"""
+
+    def __init__(self, index):
+        self.offsets = np.frombuffer(index.token_offsets, dtype=np.uint32).astype(np.int64)
+        tokens = np.frombuffer(index.tokens, dtype=np.uint32)
+        self.sizes = np.diff(self.offsets)
+        owners = np.repeat(np.arange(len(self.sizes)), self.sizes)
+        order = np.argsort(tokens, kind='stable')
+        self.owners = owners[order]
+        self.token_starts = np.searchsorted(tokens[order], np.arange(tokens.max() + 2 if len(tokens) else 1))
+
+    def top_k(self, index, uid, k):
+        query = np.asarray(index.token_ids(uid), dtype=np.int64)
+        hits = np.concatenate([self.owners[self.token_starts[t]:self.token_starts[t + 1]] for t in query])
+        inter = np.bincount(hits, minlength=len(self.sizes))
+        jaccard = inter / np.maximum(len(query) + self.sizes - inter, 1)
+        jaccard[uid] = -1
+        return np.sort(jaccard)[::-1][:k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量相似 OIer 索引的构建、内存、延迟与召回率。")
+    parser.add_argument('--db', default='oier_data.db', help="SQLite 数据库文件路径 (默认为: oier_data.db)")
+    parser.add_argument('--queries', type=int, default=500, help="查询的 uid 个数 (默认为: 500)")
+    parser.add_argument('--recall-queries', type=int, default=200, help="计算召回率的 uid 个数 (默认为: 200)")
+    parser.add_argument('-k', type=int, default=similarity.DEFAULT_K, help=f"返回人数 (默认为: {similarity.DEFAULT_K})")
+    parser.add_argument('--num-perm', type=int, default=similarity.NUM_PERM, help=f"签名长度 (默认为: {similarity.NUM_PERM})")
+    parser.add_argument('--bands', type=int, default=similarity.BANDS, help=f"分段数 (默认为: {similarity.BANDS})")
+    parser.add_argument('--seed', type=int, default=0, help="抽样 uid 的随机种子 (默认为: 0)")
+    args = parser.parse_args()
+
+    path = similarity.index_path(args.db) + '.bench'
+    seconds, size, build_mb = build_in_subprocess(args.db, path, args.num_perm, args.bands)
+    try:
+        conn = sqlite3.connect(args.db)
+        oiers = conn.execute("SELECT COUNT(*) FROM OIer").fetchone()[0]
+        records = conn.execute("SELECT COUNT(*) FROM Record").fetchone()[0]
+        conn.close()
+        print(f"{oiers} 名 OIer, {records} 条记录; num_perm={args.num_perm}, bands={args.bands}")
+        print(f"构建 {seconds:.1f} s，峰值 RSS 增量 {build_mb:.0f} MB，索引文件 {size / 2**20:.1f} MB")
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        index = similarity.SimilarityIndex(path)
+        open_ms = (time.perf_counter() - started) * 1000
+        members = [uid for uid in range(index.uid_size) if index.token_ids(uid)]
+        rng = random.Random(args.seed)
+        sample = rng.sample(members, min(args.queries, len(members)))
+
+        latencies, candidates = [], []
+        for uid in sample:
+            started = time.perf_counter()
+            index.similar(uid, args.k)
+            latencies.append((time.perf_counter() - started) * 1000)
+            candidates.append(len(index.candidates(uid)))
+        rss_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+        latencies.sort()
+        print(f"打开 {open_ms:.2f} ms；{len(sample)} 次查询后 RSS 增量 {rss_mb:.0f} MB (含 mmap 映射的共享页)")
+        print(f"查询延迟 p50 {statistics.median(latencies):.2f} ms, p95 {latencies[int(len(latencies) * 0.95)]:.2f} ms, "
+              f"max {latencies[-1]:.2f} ms; 候选人数中位数 {statistics.median(candidates):.0f}")
+
+        exact, recalls = ExactJaccard(index), []
+        for uid in sample[:args.recall_queries]:
+            expected = exact.top_k(index, uid, args.k)
+            threshold = expected[-1] if len(expected) else 0
+            found = [jaccard for _, jaccard, _ in index.similar(uid, args.k)]
+            if threshold > 0:
+                recalls.append(sum(jaccard >= threshold - 1e-12 for jaccard in found) / min(args.k, len(expected)))
+        print(f"召回率@{args.k} (对比暴力精确计算，{len(recalls)} 个 uid): 平均 {statistics.mean(recalls):.3f}, "
+              f"最低 {min(recalls):.3f}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+# synth_data.py
+"""
+生成与 OIerDb-data-generator 输出格式一致的合成数据 (static.json + result.txt)，
+用于离线基准测试。相同的 scale 与 seed 总是生成完全相同的文件。
+
+scale=1 大致对应真实 OIerDb 的规模 (约 11 万名选手、30 余万条记录)。
+"""
+import argparse
+import array
+import bisect
+import json
+import os
+import random
+import time
+
+from create_db import PROVINCES, AWARD_LEVELS
+
+BASE_OIERS = 110_000
+BASE_SCHOOLS = 12_000
+FIRST_YEAR, LAST_YEAR = 2000, 2025
+DEFAULT_SEED = 20240101
+
+# 省份权重，数值越大选手越多
+PROVINCE_WEIGHTS = {
+    "浙江": 12, "江苏": 10, "广东": 9, "北京": 7, "上海": 7, "湖南": 7, "四川": 6,
+    "山东": 6, "重庆": 5, "福建": 5, "河南": 4, "安徽": 4, "湖北": 4, "河北": 3,
+    "陕西": 3, "江西": 3, "辽宁": 3, "天津": 2, "广西": 2, "吉林": 2, "山西": 2,
+    "黑龙江": 2, "云南": 1, "贵州": 1, "新疆": 1, "甘肃": 1, "内蒙古": 1, "海南": 1,
+}
+
+# (比赛类型, 首年, 末年, 满分, 是否秋季学期)
+CONTEST_TYPES = [
+    ("NOIP普及", FIRST_YEAR, 2018, 400, True),
+    ("NOIP提高", FIRST_YEAR, 2018, 600, True),
+    ("CSP入门", 2019, LAST_YEAR, 400, True),
+    ("CSP提高", 2019, LAST_YEAR, 400, True),
+    ("NOIP", 2020, LAST_YEAR, 400, True),
+    ("NOI", FIRST_YEAR, LAST_YEAR, 1200, False),
+    ("NOID类", 2015, LAST_YEAR, 1200, False),
+    ("WC", FIRST_YEAR, LAST_YEAR, 300, False),
+    ("CTSC", FIRST_YEAR, LAST_YEAR, 300, False),
+    ("APIO", 2008, LAST_YEAR, 300, False),
+]
+
+MEDAL_TYPES = {"NOI", "NOID类", "WC", "CTSC", "APIO"}
+# 各类比赛的难度: (能力中位点, 区分度)，用于把选手能力映射为得分率
+CONTEST_DIFFICULTY = {
+    "NOIP普及": (0.4, 1.0), "CSP入门": (0.4, 1.0),
+    "NOIP提高": (0.6, 1.2), "CSP提高": (0.6, 1.2), "NOIP": (0.7, 1.5),
+    "NOI": (0.985, 15), "NOID类": (0.95, 12), "WC": (0.985, 15), "CTSC": (0.99, 20), "APIO": (0.99, 20),
+}
+LEVEL_INDEX = {level: i for i, level in enumerate(AWARD_LEVELS)}
+
+SURNAMES = [("王", "w"), ("李", "l"), ("张", "z"), ("刘", "l"), ("陈", "c"), ("杨", "y"), ("黄", "h"),
+            ("赵", "z"), ("吴", "w"), ("周", "z"), ("徐", "x"), ("孙", "s"), ("马", "m"), ("朱", "z"),
+            ("胡", "h"), ("郭", "g"), ("何", "h"), ("林", "l"), ("罗", "l"), ("高", "g")]
+GIVEN_CHARS = [("子", "z"), ("浩", "h"), ("宇", "y"), ("轩", "x"), ("思", "s"), ("涵", "h"), ("博", "b"),
+               ("文", "w"), ("晨", "c"), ("一", "y"), ("睿", "r"), ("泽", "z"), ("欣", "x"), ("雨", "y"),
+               ("天", "t"), ("佳", "j"), ("俊", "j"), ("嘉", "j"), ("明", "m"), ("乐", "l")]
+
+
+def build_contests():
+    """生成固定的比赛列表，不随 scale 变化"""
+    contests = []
+    for year in range(FIRST_YEAR, LAST_YEAR + 1):
+        for contest_type, first, last, full_score, fall in CONTEST_TYPES:
+            if first <= year <= last:
+                contests.append({
+                    "name": f"{contest_type}{year}", "type": contest_type, "year": year,
+                    "fall_semester": fall, "full_score": full_score,
+                })
+    return contests
+
+
+def build_schools(rng, n_schools):
+    """生成学校列表: [name, province, city, score]"""
+    provinces = list(PROVINCE_WEIGHTS)
+    weights = [PROVINCE_WEIGHTS[p] for p in provinces]
+    schools = []
+    for i in range(n_schools):
+        province = rng.choices(provinces, weights)[0]
+        city = f"{province}{rng.randint(1, 12)}市"
+        kind = "中学" if i % 3 else "外国语学校"
+        schools.append([f"{city}第{i}{kind}", province, city, round(rng.expovariate(1 / 20), 2)])
+    return schools
+
+
+class _World:
+    """生成过程中共享的只读上下文"""
+
+    def __init__(self, scale, seed):
+        rng = random.Random(seed)
+        self.seed = seed
+        self.n_oiers = max(1, int(BASE_OIERS * scale))
+        self.contests = build_contests()
+        self.schools = build_schools(rng, max(50, int(BASE_SCHOOLS * scale ** 0.5)))
+        self.contest_index = {(c["type"], c["year"]): i for i, c in enumerate(self.contests)}
+        self.schools_by_province = {}
+        for i, school in enumerate(self.schools):
+            self.schools_by_province.setdefault(school[1], []).append(i)
+        self.provinces = [p for p in PROVINCE_WEIGHTS if p in self.schools_by_province]
+        self.province_weights = [PROVINCE_WEIGHTS[p] for p in self.provinces]
+        # 近年选手更多: 入学年份权重线性增长
+        self.enroll_years = list(range(FIRST_YEAR - 6, LAST_YEAR))
+        self.enroll_weights = [1 + 3 * i for i in range(len(self.enroll_years))]
+
+    def career(self, uid):
+        """按 uid 确定性地生成一名选手的基本信息和参赛经历 (不含排名/奖项)"""
+        rng = random.Random(self.seed * 1_000_003 + uid)
+        skill = rng.random()
+        enroll = rng.choices(self.enroll_years, self.enroll_weights)[0]
+        province = rng.choices(self.provinces, self.province_weights)[0]
+        pool = self.schools_by_province[province]
+        middle_school, high_school = rng.choice(pool), rng.choice(pool)
+
+        entries = []
+        for year in range(max(FIRST_YEAR, enroll - 2), min(LAST_YEAR, enroll + 5) + 1):
+            grade = year - enroll + 7
+            school = middle_school if grade <= 9 else high_school
+            chosen = []
+            if 5 <= grade <= 9 and rng.random() < 0.3:
+                chosen.append("NOIP普及" if year <= 2018 else "CSP入门")
+            if 8 <= grade <= 12 and rng.random() < 0.1 + 0.5 * skill:
+                chosen.append("NOIP提高" if year <= 2018 else "CSP提高")
+            if year >= 2020 and 9 <= grade <= 12 and rng.random() < 0.6 * skill:
+                chosen.append("NOIP")
+            if 9 <= grade <= 12:
+                if skill > 0.97 and rng.random() < 0.6:
+                    chosen.append("NOI")
+                elif 0.93 < skill <= 0.97 and rng.random() < 0.3:
+                    chosen.append("NOID类")
+                if skill > 0.975 and rng.random() < 0.5:
+                    chosen.append("WC")
+                if skill > 0.985 and rng.random() < 0.5:
+                    chosen.append(rng.choice(("CTSC", "APIO")))
+            for contest_type in chosen:
+                contest_id = self.contest_index.get((contest_type, year))
+                if contest_id is None:
+                    continue
+                full = self.contests[contest_id]["full_score"]
+                center, spread = CONTEST_DIFFICULTY[contest_type]
+                ratio = min(1.0, max(0.0, 0.5 + (skill - center) * spread + rng.gauss(0, 0.1) + 0.02 * (grade - 9)))
+                score = round(full * ratio, 1)
+                entries.append((contest_id, school, score, province))
+
+        if not entries:
+            year = min(LAST_YEAR, max(FIRST_YEAR, enroll + 1))
+            contest_type = "NOIP普及" if year <= 2018 else "CSP入门"
+            contest_id = self.contest_index[(contest_type, year)]
+            entries.append((contest_id, middle_school, round(400 * rng.random() * 0.6, 1), province))
+
+        surname, s_initial = rng.choice(SURNAMES)
+        given = [rng.choice(GIVEN_CHARS) for _ in range(rng.choice((1, 2, 2)))]
+        name = surname + "".join(c for c, _ in given)
+        initials = s_initial + "".join(i for _, i in given)
+        gender = rng.choice((1, 1, 1, -1, 0))
+        # 早年的部分比赛没有分数
+        entries = [(c, s, None if self.contests[c]["year"] < 2005 and rng.random() < 0.5 else score, p)
+                   for c, s, score, p in entries]
+        return initials, name, gender, enroll, entries
+
+
+def _level_for(contest_type, rank, total):
+    """按名次百分位确定奖项"""
+    pct = rank / total
+    if contest_type in MEDAL_TYPES:
+        return "金牌" if pct <= 0.12 else "银牌" if pct <= 0.4 else "铜牌"
+    return "一等奖" if pct <= 0.25 else "二等奖" if pct <= 0.6 else "三等奖"
+
+
+LEVEL_POINTS = {"金牌": 100, "银牌": 60, "铜牌": 35, "一等奖": 12, "二等奖": 5, "三等奖": 2}
+
+
+def generate(out_dir, scale=1.0, seed=DEFAULT_SEED, verbose=True):
+    """生成 static.json 与 result.txt，返回两者路径"""
+    world = _World(scale, seed)
+    os.makedirs(out_dir, exist_ok=True)
+    static_path = os.path.join(out_dir, "static.json")
+    result_path = os.path.join(out_dir, "result.txt")
+    started = time.perf_counter()
+
+    with open(static_path, "w", encoding="utf-8") as f:
+        json.dump({"schools": world.schools, "contests": world.contests}, f, ensure_ascii=False)
+
+    # 第一遍: 只收集每场比赛的分数，用于之后计算名次 (缺分数的记录按 0 分计)
+    scores = [array.array("d") for _ in world.contests]
+    for uid in range(1, world.n_oiers + 1):
+        for contest_id, _, score, _ in world.career(uid)[4]:
+            scores[contest_id].append(-(score or 0.0))
+    scores = [sorted(s) for s in scores]
+
+    # 第二遍: 重新生成相同的经历，计算名次与奖项后写出
+    n_records = 0
+    with open(result_path, "w", encoding="utf-8") as f:
+        for uid in range(1, world.n_oiers + 1):
+            initials, name, gender, enroll, entries = world.career(uid)
+            parts, points = [], 0.0
+            for contest_id, school, score, province in entries:
+                contest_scores = scores[contest_id]
+                rank = bisect.bisect_left(contest_scores, -(score or 0.0)) + 1
+                level = _level_for(world.contests[contest_id]["type"], rank, len(contest_scores))
+                points += LEVEL_POINTS[level]
+                score_str = "" if score is None else f"{score:g}"
+                parts.append(f"{contest_id}:{school}:{score_str}:{rank}:{PROVINCES.index(province)}:{LEVEL_INDEX[level]}")
+            n_records += len(parts)
+            ccf_score = round(points * 0.8, 2)
+            ccf_level = min(10, int(points // 40))
+            f.write(f"{uid},{initials},{name},{gender},{enroll},{points:.2f},{ccf_score},{ccf_level},{'/'.join(parts)}\n")
+
+    if verbose:
+        print(f"Generated {world.n_oiers} OIers, {n_records} records, {len(world.schools)} schools, "
+              f"{len(world.contests)} contests in {time.perf_counter() - started:.1f}s -> {out_dir}")
+    return static_path, result_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成 OIerDb 格式的合成数据用于基准测试。")
+    parser.add_argument("-o", "--output", default="bench/data", help="输出目录 (默认为: bench/data)")
+    parser.add_argument("--scale", type=float, default=1.0, help="数据规模，1 约等于真实 OIerDb (默认为: 1)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help=f"随机种子 (默认为: {DEFAULT_SEED})")
+    args = parser.parse_args()
+    generate(args.output, args.scale, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Cloudflare D1 HTTP API 的本地替身：在本地 SQLite 文件上提供与 D1 相同的 /query 与 /raw 接口，
+并像 D1 一样在每个结果的 meta 中给出 rows_read / rows_written / duration，用于离线测量 worker 查询计划的 D1 用量。
+
+接口 (与 https://api.cloudflare.com/client/v4/accounts/{account_id}/d1/database/{database_id}/{query,raw} 相同)：
+    POST .../query   {"sql": "...", "params": [...]}   results 为行对象列表
+    POST .../raw     {"sql": "...", "params": [...]}   results 为 {"columns": [...], "rows": [[...], ...]}
+    也接受 {"batch": [{"sql": ..., "params": [...]}, ...]}；没有 params 时 sql 可以包含多条以分号分隔的语句。
+路径中的 account_id / database_id 不做校验，也可以直接请求 /query、/raw。
+
+rows_read 模拟 D1 按 B 树游标访问的行计数，按语句的查询计划分三部分相加：
+    全表/全索引扫描 (计划中的 SCAN)     SQLite 语句计数器 (sqlite_stmt 虚拟表的 nscan) 给出的实际步数
+    COUNT(*) 优化 (字节码中的 Count)    直接数 B 树而不逐行步进，计入该表的行数
+    索引查找 (计划中的 SEARCH)          标准 SQLite 不提供按索引访问的行数，以返回的行数近似 (每条结果至少访问一行)
+返回的行不会在扫描步数之外重复计入。索引查找的近似在聚合查询 (例如走索引的 COUNT/GROUP BY，返回行远少于访问行)
+上偏低，DISTINCT/ORDER BY 使用的临时 B 树也不计入；同一个替身上比较不同查询计划时口径一致。
+rows_written 为 SQLite 的 total_changes 增量 (D1 还会计入索引的写入)。
+
+用法:
+    python d1_local.py --db ../../oier_data.db --port 8787
+    然后把 config.yml 中的 cloudflare.api_base 设为 http://127.0.0.1:8787 (见 worker_plan.py)
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROUTE = re.compile(r'^(?:/client/v4/accounts/[^/]+/d1/database/[^/]+)?/(query|raw)/?$')
+# D1 对一条语句绑定参数个数的上限
+MAX_BOUND_PARAMETERS = 100
+
+
+class D1Error(Exception):
+    pass
+
+
+def split_statements(sql):
+    """把以分号分隔的多条语句拆开 (按 SQLite 的语法判断语句是否完整，字符串中的分号不会被拆开)"""
+    statements, current = [], ''
+    for part in sql.split(';'):
+        current += part + ';'
+        if sqlite3.complete_statement(current):
+            if current.strip(' \t\r\n;'):
+                statements.append(current.strip())
+            current = ''
+    if current.strip(' \t\r\n;'):
+        statements.append(current.strip())
+    return statements
+
+
+class LocalD1:
+    """在本地 SQLite 文件上执行 D1 请求；同一时刻只执行一条语句 (D1 数据库本身也是单线程的)"""
+
+    def __init__(self, path, max_params=MAX_BOUND_PARAMETERS):
+        self.path = path
+        self.max_params = max_params
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.Lock()
+        self.plans, self.table_rows = {}, {}
+        try:
+            self.conn.execute("SELECT nscan FROM sqlite_stmt LIMIT 0")
+            self.has_stmt_vtab = True
+        except sqlite3.OperationalError:
+            self.has_stmt_vtab = False
+
+    def _plan(self, sql, params):
+        """(计划中是否有索引查找, Count 指令读取的表名列表)，按 SQL 文本缓存"""
+        plan = self.plans.get(sql)
+        if plan is None:
+            try:
+                details = [row[3] for row in self.conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+                program = self.conn.execute(f"EXPLAIN {sql}", params).fetchall()
+            except sqlite3.Error:
+                return False, []
+            # 字节码各列: addr, opcode, p1 (游标), p2 (根页号), ...
+            roots = {row[2]: row[3] for row in program if row[1] in ('OpenRead', 'ReopenIdx')}
+            counted = [roots[row[2]] for row in program if row[1] == 'Count' and row[2] in roots]
+            tables = [self.conn.execute("SELECT tbl_name FROM sqlite_schema WHERE rootpage = ?", (root,)).fetchone()
+                      for root in counted]
+            plan = self.plans[sql] = (any(detail.startswith('SEARCH') for detail in details),
+                                      [table[0] for table in tables if table is not None])
+        return plan
+
+    def _table_rows(self, table):
+        if table not in self.table_rows:
+            self.table_rows[table] = self.conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        return self.table_rows[table]
+
+    def _full_scan_steps(self, sql):
+        if not self.has_stmt_vtab:
+            return 0
+        row = self.conn.execute("SELECT SUM(nscan) FROM sqlite_stmt WHERE sql = ?", (sql,)).fetchone()
+        return row[0] or 0
+
+    def execute(self, sql, params=None):
+        """执行一条语句，返回 (columns, rows, meta)"""
+        params = list(params or [])
+        if len(params) > self.max_params:
+            raise D1Error(f"too many SQL variables: {len(params)} > {self.max_params}")
+        with self.lock:
+            searches, counted = self._plan(sql, params)
+            scans_before = self._full_scan_steps(sql)
+            changes_before = self.conn.total_changes
+            started = time.perf_counter()
+            try:
+                cursor = self.conn.execute(sql, params)
+                rows = cursor.fetchall()
+            except sqlite3.Error as e:
+                raise D1Error(f"{e}: SQLITE_ERROR") from e
+            duration = (time.perf_counter() - started) * 1000
+            columns = [d[0] for d in cursor.description] if cursor.description else []
+            full_scan = self._full_scan_steps(sql) - scans_before
+            changes = self.conn.total_changes - changes_before
+            if changes:
+                self.plans.clear()
+                self.table_rows.clear()
+            rows_read = full_scan + sum(self._table_rows(table) for table in counted)
+            if searches or not rows_read:
+                rows_read += len(rows)
+            meta = {
+                'served_by': 'd1-local', 'duration': round(duration, 4),
+                'changes': changes, 'last_row_id': cursor.lastrowid or 0, 'changed_db': changes > 0,
+                'size_after': os.path.getsize(self.path),
+                'rows_read': rows_read, 'rows_written': changes,
+            }
+        return columns, rows, meta
+
+    def run(self, statements, raw=False):
+        """执行 [(sql, params), ...]，返回 D1 格式的 result 列表"""
+        results = []
+        for sql, params in statements:
+            columns, rows, meta = self.execute(sql, params)
+            if raw:
+                payload = {'columns': columns, 'rows': [list(row) for row in rows]}
+            else:
+                payload = [dict(zip(columns, row)) for row in rows]
+            results.append({'results': payload, 'success': True, 'meta': meta})
+        return results
+
+
+def parse_body(body):
+    """请求体解析为 [(sql, params), ...]"""
+    items = body.get('batch') if isinstance(body, dict) and 'batch' in body else [body]
+    if not isinstance(items, list) or not items:
+        raise D1Error("request body must be {\"sql\": ..., \"params\": [...]} or {\"batch\": [...]}")
+    statements = []
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get('sql'), str):
+            raise D1Error("each query must have a string 'sql'")
+        params = item.get('params')
+        if params:
+            statements.append((item['sql'], params))
+        else:
+            statements.extend((sql, None) for sql in split_statements(item['sql']))
+    return statements
+
+
+def make_handler(database, verbose=False):
+    class Handler(BaseHTTPRequestHandler):
+        def send_json(self, status, payload):
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            match = ROUTE.match(self.path.split('?')[0])
+            if match is None:
+                self.send_json(404, {'success': False, 'errors': [{'code': 7003, 'message': 'Could not route'}],
+                                     'messages': [], 'result': None})
+                return
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                statements = parse_body(json.loads(self.rfile.read(length) or b'{}'))
+                result = database.run(statements, raw=match.group(1) == 'raw')
+            except (D1Error, ValueError) as e:
+                self.send_json(400, {'success': False, 'errors': [{'code': 7500, 'message': str(e)}],
+                                     'messages': [], 'result': []})
+                return
+            self.send_json(200, {'success': True, 'errors': [], 'messages': [], 'result': result})
+
+        def log_message(self, format, *args):
+            if verbose:
+                super().log_message(format, *args)
+
+    return Handler
+
+
+def serve(db_path, host='127.0.0.1', port=8787, verbose=False):
+    server = ThreadingHTTPServer((host, port), make_handler(LocalD1(db_path), verbose))
+    print(f"本地 D1 替身: http://{host}:{port} (数据库 {db_path})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在本地 SQLite 文件上提供 Cloudflare D1 的 /query 与 /raw HTTP 接口。")
+    parser.add_argument('--db', default='oier.db', help="SQLite 数据库文件 (默认为: oier.db)")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址 (默认为: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8787, help="监听端口 (默认为: 8787)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="输出每个请求")
+    args = parser.parse_args()
+    serve(args.db, args.host, args.port, args.verbose)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,24 @@
+import os
+import sqlite3
+import sys
 import requests
 import yaml
 import json
 from datetime import date
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from utils import cost_model
+
 # 配置文件路径
 CONFIG_FILE = "config.yml"
 
-# 阈值（保持与原代码一致）
-ENUMERATE_THRESHOLD = 20
+# 与 D1 数据相同的本地数据库，用于加载代价模型的统计信息（与 finder_engine 保持一致）
+LOCAL_DB_PATH = "oier.db"
 
 # 统计变量
 query_count = 0
 total_rows_returned = 0
+total_rows_read = 0
 DEBUG_SQL = True  # 设置 False 可关闭 SQL 输出
 
 def load_config():
@@ -22,30 +29,21 @@ def execute_d1_sql(cfg, sql, params=None):
     """
     调用 Cloudflare D1 raw SQL API 执行查询，并统计用量，返回行字典列表
     """
-    global query_count, total_rows_returned
+    global query_count, total_rows_returned, total_rows_read
     if params is None:
         params = []
 
-    # 替换 ? 占位符（仅测试用途）
-    safe_sql = sql
-    for p in params:
-        if p is None:
-            val_str = "NULL"
-        elif isinstance(p, str):
-            val_str = "'" + p.replace("'", "''") + "'"
-        else:
-            val_str = str(p)
-        safe_sql = safe_sql.replace("?", val_str, 1)
-
     if DEBUG_SQL:
-        print(f"\n[Query #{query_count+1}] {safe_sql}")
+        print(f"\n[Query #{query_count+1}] {sql} {params}")
 
-    url = f"https://api.cloudflare.com/client/v4/accounts/{cfg['cloudflare']['account_id']}/d1/database/{cfg['cloudflare']['database_id']}/raw"
+    # api_base 可以指向 d1_local.py 启动的本地替身，默认为 Cloudflare 的 API
+    api_base = cfg['cloudflare'].get('api_base', 'https://api.cloudflare.com').rstrip('/')
+    url = f"{api_base}/client/v4/accounts/{cfg['cloudflare']['account_id']}/d1/database/{cfg['cloudflare']['database_id']}/raw"
     headers = {
         "Authorization": f"Bearer {cfg['cloudflare']['api_token']}",
         "Content-Type": "application/json",
     }
-    payload = {"sql": safe_sql}
+    payload = {"sql": sql, "params": list(params)}
 
     resp = requests.post(url, headers=headers, data=json.dumps(payload))
     query_count += 1
@@ -56,15 +54,17 @@ def execute_d1_sql(cfg, sql, params=None):
         return []
 
     data = resp.json()
-    if not isinstance(data, list):
-        print(f"⚠️ API 返回不是数组格式: {data}")
+    if not data.get("success", False) or not data.get("result"):
+        print(f"❌ API 返回错误: {data.get('errors')}")
         return []
 
-    # 新版 D1 返回是一个数组，每个元素对应一次 SQL 结果
-    first_result = data[0]
+    # result 为数组，每个元素对应一条 SQL 的结果
+    first_result = data["result"][0]
     if not first_result.get("success", False):
         print(f"❌ SQL 执行错误: {first_result}")
         return []
+    meta = first_result.get("meta", {})
+    total_rows_read += meta.get("rows_read", 0)
 
     results_data = first_result.get("results", {})
     columns = results_data.get("columns", [])
@@ -106,10 +106,23 @@ def build_where_clause_and_values(params):
             values.extend(params[field])
     return " AND ".join(conditions) if conditions else "1=1", values
 
-def find_oiers(cfg, config):
-    global query_count, total_rows_returned
+def load_cost_model(path=LOCAL_DB_PATH):
+    """从本地数据库加载代价模型；本地库不可用时使用默认统计信息"""
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        conn = sqlite3.connect(path)
+        try:
+            return cost_model.CostModel.load(conn.cursor())
+        finally:
+            conn.close()
+    return cost_model.CostModel([], {}, {}, cost_model.DEFAULT_RECORD_COUNT, has_oier_index=True, has_contest_index=True)
+
+def find_oiers(cfg, config, model=None):
+    global query_count, total_rows_returned, total_rows_read
     query_count = 0
     total_rows_returned = 0
+    total_rows_read = 0
+    if model is None:
+        model = load_cost_model()
 
     if not config:
         config = {}
@@ -144,12 +157,15 @@ def find_oiers(cfg, config):
 
     candidate_uids = initial_candidates
     record_constraints = config.get("records", [])
-    enumeration_mode = bool(candidate_uids and len(candidate_uids) < ENUMERATE_THRESHOLD)
 
     # 遍历每个 Record 条件
     for constraint in record_constraints:
+        if candidate_uids is not None and not candidate_uids:
+            break
         where_clause, values = build_where_clause_and_values(constraint)
-        if enumeration_mode and candidate_uids:
+        # 与 finder_engine 相同：由代价模型决定是否按候选 uid 枚举
+        mode = "scan" if candidate_uids is None else model.choose(constraint, len(candidate_uids))[0]
+        if mode == "enumerate":
             placeholders = ", ".join(["?"] * len(candidate_uids))
             where_clause += f" AND r.oier_uid IN ({placeholders})"
             values.extend(list(candidate_uids))
@@ -165,8 +181,6 @@ def find_oiers(cfg, config):
             candidate_uids = uids_for_this_constraint
         else:
             candidate_uids.intersection_update(uids_for_this_constraint)
-        if not enumeration_mode and candidate_uids and len(candidate_uids) < ENUMERATE_THRESHOLD:
-            enumeration_mode = True
         if not candidate_uids:
             break
 
@@ -186,6 +200,7 @@ def find_oiers(cfg, config):
     print("\n📊 云端测试结果")
     print(f"🔢 SQL 查询次数（D1 Request 次数）: {query_count}")
     print(f"📦 总返回行数: {total_rows_returned}")
+    print(f"📖 总读取行数（D1 rows_read）: {total_rows_read}")
     return []
 
 if __name__ == "__main__":
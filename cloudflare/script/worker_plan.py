@@ -0,0 +1,492 @@
+"""
+worker 查询计划 (cloudflare/worker/api/query_oier.js) 的 Python 移植，用于离线测量 D1 用量并调整参数。
+
+与 worker 相同的步骤：
+    过滤器预处理 (年份裁剪、去掉过宽的条件、去掉被包含的条件) 后按 contest_stats.json 估计的命中数排序；
+    第一个条件先查 Contest 表得到比赛 id (initial_contest_prefilter)，再查记录；
+    候选人数少于 VERIFICATION_THRESHOLD 时一次取出候选的全部记录，之后的条件在内存中验证；
+    否则按 D1_MAX_VARS 减去条件本身的参数个数把候选 uid 分块查询；
+    最后按 D1_MAX_VARS 分块取 OIer。
+每个 SQL 请求的 meta (rows_read / rows_written / duration) 与 worker 的 usage.steps 格式相同。
+
+SQL 通过参数绑定发送 (不做字符串替换)。目标可以是真实的 D1 (config.yml 中的 cloudflare 配置)、
+d1_local.py 启动的本地替身 (cloudflare.api_base 或 --endpoint)，或直接在进程内使用本地替身 (--db，默认)。
+
+用法:
+    python worker_plan.py --db ../../oier_data.db                                  # 基准查询目录，默认参数
+    python worker_plan.py --db ../../oier_data.db --max-vars 50,100 --threshold 25,50,100
+    python worker_plan.py --endpoint http://127.0.0.1:8787 -c ../../sample_config.yml
+"""
+import argparse
+import json
+import os
+import sys
+
+import requests
+import yaml
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from d1_local import LocalD1, D1Error  # noqa: E402
+
+CONTEST_STATS_FILE = os.path.join(ROOT, "cloudflare", "worker", "api", "contest_stats.json")
+CLOUDFLARE_API = "https://api.cloudflare.com"
+
+# 与 query_oier.js 中的常量一致
+D1_MAX_VARS = 100
+VERIFICATION_THRESHOLD = 50
+MAX_LIMIT = 100
+STRENGTH_SCORES = {
+    'CONTEST_ID': 10, 'SCHOOL_ID': 8, 'OIER_INITIALS': 10, 'YEAR': 3, 'PROVINCE': 2,
+    'HIGH_PRIORITY_CONTEST': 5, 'MID_PRIORITY_CONTEST': 3, 'LOW_PRIORITY_CONTEST': 1,
+    'LEVEL': 1, 'SCORE': 1, 'RANK': 1,
+}
+CONTEST_PRIORITY = {
+    'NOI': 1, 'CTSC': 1, 'APIO': 1, 'WC': 1, 'NOID类': 1,
+    'NOIP提高': 2, 'NOIP': 2, 'CSP提高': 3, 'NOIP普及': 4, 'CSP入门': 4,
+}
+# D1 (Workers 付费版) 超出包含额度后的单价，美元 / 百万行
+ROWS_READ_USD_PER_MILLION = 0.001
+ROWS_WRITTEN_USD_PER_MILLION = 1.0
+
+RECORD_COLUMNS = "r.oier_uid, r.contest_id, r.level, r.score, r.rank, r.province, r.school_id, c.year, c.fall_semester, c.type"
+
+
+class HttpD1:
+    """通过 D1 HTTP API (/query) 执行 SQL，可以指向真实的 D1 或 d1_local.py"""
+
+    def __init__(self, api_base, account_id='local', database_id='local', api_token=None):
+        self.url = f"{api_base.rstrip('/')}/client/v4/accounts/{account_id}/d1/database/{database_id}/query"
+        self.headers = {"Content-Type": "application/json"}
+        if api_token:
+            self.headers["Authorization"] = f"Bearer {api_token}"
+
+    def query(self, sql, params):
+        resp = requests.post(self.url, headers=self.headers, data=json.dumps({"sql": sql, "params": list(params)}))
+        data = resp.json()
+        if resp.status_code != 200 or not data.get("success"):
+            raise D1Error(f"D1 请求失败 (HTTP {resp.status_code}): {data.get('errors')}")
+        result = data["result"][0]
+        return result["results"], result["meta"]
+
+
+class InProcessD1:
+    """直接在进程内使用本地替身，省去 HTTP 开销"""
+
+    def __init__(self, db_path, max_params=D1_MAX_VARS):
+        self.database = LocalD1(db_path, max_params)
+
+    def query(self, sql, params):
+        result = self.database.run([(sql, list(params))])[0]
+        return result["results"], result["meta"]
+
+
+def to_list(value):
+    if value is None:
+        return []
+    return [v for v in value if v is not None] if isinstance(value, list) else [value]
+
+
+def push_in_clause(where, params, column, values):
+    if not values:
+        return
+    if len(values) == 1:
+        where.append(f"{column} = ?"); params.append(values[0])
+    else:
+        where.append(f"{column} IN ({','.join('?' * len(values))})"); params.extend(values)
+
+
+def usage_step(name, meta):
+    meta = meta or {}
+    return {'name': name, 'rows_read': meta.get('rows_read', 0), 'rows_written': meta.get('rows_written', 0),
+            'duration_ms': meta.get('duration', 0)}
+
+
+# --- 过滤器预处理与排序 (对应 isSubset / getFilterSelectivity / getFilterStrength) ---
+def is_subset(a, b):
+    def check(key_a, key_b):
+        values_a = to_list(a.get(key_a, a.get(key_b)))
+        values_b = to_list(b.get(key_a, b.get(key_b)))
+        if not values_a:
+            return True
+        if not values_b:
+            return False
+        return all(v in values_b for v in values_a)
+
+    def check_range(min_key, max_key):
+        if a.get(min_key) is not None and (b.get(min_key) is None or a[min_key] < b[min_key]):
+            return False
+        if a.get(max_key) is not None and (b.get(max_key) is None or a[max_key] > b[max_key]):
+            return False
+        return True
+
+    def check_years():
+        years_a, years_b = to_list(a.get('years')), to_list(b.get('years'))
+        if years_a:
+            if years_b:
+                return all(y in years_b for y in years_a)
+            return all(b.get('year_start', -1) <= y <= b.get('year_end', -1) for y in years_a)
+        return True
+
+    return (check('level', 'levels') and check('province', 'provinces') and check('school_id', 'school_ids')
+            and check('contest_id', 'contest_ids') and check('contest_type', 'contest_types') and check_years()
+            and (True if to_list(a.get('years')) else check_range('year_start', 'year_end'))
+            and check_range('min_score', 'max_score') and check_range('min_rank', 'max_rank'))
+
+
+def filter_selectivity(stats, f):
+    if f.get('contest_id') or f.get('school_id'):
+        return 1
+    years = to_list(f.get('years')) or list(range(f['year_start'], f['year_end'] + 1))
+    types = to_list(f.get('contest_type', f.get('contest_types')))
+    provinces = to_list(f.get('province', f.get('provinces')))
+    levels = to_list(f.get('level', f.get('levels')))
+    if not years or not types:
+        return 100000
+    count = 0
+    for year in years:
+        for contest_type in types:
+            by_province = stats.get(str(year), {}).get(contest_type)
+            if not by_province:
+                continue
+            for province in provinces or list(by_province):
+                by_level = by_province.get(province)
+                if not by_level:
+                    continue
+                count += sum(by_level.get(level, 0) for level in (levels or list(by_level)))
+    return count if count > 0 else 1
+
+
+def filter_strength(f, is_oier_filter=False):
+    if is_oier_filter:
+        return (STRENGTH_SCORES['OIER_INITIALS'] if f.get('initials') else 0) + (1 if f.get('enroll_min') or f.get('enroll_max') else 0)
+    score = 0
+    if f.get('contest_id') or f.get('contest_ids'): score += STRENGTH_SCORES['CONTEST_ID']
+    if f.get('school_id') or f.get('school_ids'): score += STRENGTH_SCORES['SCHOOL_ID']
+    if f.get('years') or f.get('year_start') or f.get('year_end'): score += STRENGTH_SCORES['YEAR']
+    if f.get('province') or f.get('provinces'): score += STRENGTH_SCORES['PROVINCE']
+    if f.get('level') or f.get('levels'): score += STRENGTH_SCORES['LEVEL']
+    if f.get('min_score') or f.get('max_score'): score += STRENGTH_SCORES['SCORE']
+    if f.get('min_rank') or f.get('max_rank'): score += STRENGTH_SCORES['RANK']
+    for contest_type in to_list(f.get('contest_type', f.get('contest_types'))):
+        priority = CONTEST_PRIORITY.get(contest_type)
+        score += STRENGTH_SCORES['HIGH_PRIORITY_CONTEST' if priority == 1 else 'MID_PRIORITY_CONTEST' if priority == 2
+                                 else 'LOW_PRIORITY_CONTEST']
+    return score
+
+
+def preprocess_filters(filters, min_year, max_year):
+    processed = []
+    for original in filters:
+        f = dict(original)
+        if to_list(f.get('years')):
+            for key in ('year', 'year_start', 'year_end'):
+                f.pop(key, None)
+        elif f.get('year') is not None:
+            f['year_start'] = f['year_end'] = f.pop('year')
+        f['year_start'] = max(f['year_start'] if f.get('year_start') is not None else min_year, min_year)
+        f['year_end'] = min(f['year_end'] if f.get('year_end') is not None else max_year, max_year)
+        too_broad = not to_list(f.get('years')) and f['year_start'] <= min_year and f['year_end'] >= max_year
+        has_other = any(k not in ('year', 'years', 'year_start', 'year_end') for k in f)
+        if not (too_broad and not has_other):
+            processed.append(f)
+
+    kept = []
+    for current in processed:
+        should_add, next_kept = True, []
+        for existing in kept:
+            if is_subset(current, existing):
+                continue
+            if is_subset(existing, current):
+                should_add = False
+            next_kept.append(existing)
+        if should_add:
+            next_kept.append(current)
+        kept = next_kept
+    return kept
+
+
+# --- 内存验证与记录子查询 (对应 recordMatchesFilter / buildRecordSubquery) ---
+def record_matches(record, f):
+    levels = to_list(f.get('level', f.get('levels')))
+    if levels and record['level'] not in levels: return False
+    if f.get('min_score') is not None and (record['score'] is None or record['score'] < f['min_score']): return False
+    if f.get('max_score') is not None and (record['score'] is None or record['score'] > f['max_score']): return False
+    if f.get('min_rank') is not None and (record['rank'] is None or record['rank'] < f['min_rank']): return False
+    if f.get('max_rank') is not None and (record['rank'] is None or record['rank'] > f['max_rank']): return False
+    provinces = to_list(f.get('province', f.get('provinces')))
+    if provinces and record['province'] not in provinces: return False
+    school_ids = to_list(f.get('school_id', f.get('school_ids')))
+    if school_ids and record['school_id'] not in school_ids: return False
+    contest_ids = to_list(f.get('contest_id', f.get('contest_ids')))
+    if contest_ids and record['contest_id'] not in contest_ids: return False
+    years = to_list(f.get('years'))
+    if years and record['year'] not in years: return False
+    if f.get('year_start') is not None and record['year'] < f['year_start']: return False
+    if f.get('year_end') is not None and record['year'] > f['year_end']: return False
+    if f.get('fall_semester') is not None and record['fall_semester'] != (1 if f['fall_semester'] else 0): return False
+    contest_types = to_list(f.get('contest_type', f.get('contest_types')))
+    if contest_types and record['type'] not in contest_types: return False
+    return True
+
+
+def contest_conditions(f, alias='c'):
+    where, params = [], []
+    push_in_clause(where, params, f'{alias}.year', to_list(f.get('years')))
+    if f.get('year_start'): where.append(f'{alias}.year >= ?'); params.append(f['year_start'])
+    if f.get('year_end'): where.append(f'{alias}.year <= ?'); params.append(f['year_end'])
+    if f.get('fall_semester') is not None: where.append(f'{alias}.fall_semester = ?'); params.append(1 if f['fall_semester'] else 0)
+    push_in_clause(where, params, f'{alias}.type', to_list(f.get('contest_type', f.get('contest_types'))))
+    return where, params
+
+
+def record_conditions(f, alias):
+    where, params = [], []
+    push_in_clause(where, params, f'{alias}.level', to_list(f.get('level', f.get('levels'))))
+    for key, op, column in (('min_score', '>=', 'score'), ('max_score', '<=', 'score'),
+                            ('min_rank', '>=', 'rank'), ('max_rank', '<=', 'rank')):
+        if f.get(key) is not None: where.append(f'{alias}.{column} {op} ?'); params.append(f[key])
+    push_in_clause(where, params, f'{alias}.province', to_list(f.get('province', f.get('provinces'))))
+    push_in_clause(where, params, f'{alias}.school_id', to_list(f.get('school_id', f.get('school_ids'))))
+    push_in_clause(where, params, f'{alias}.contest_id', to_list(f.get('contest_id', f.get('contest_ids'))))
+    return where, params
+
+
+def oier_conditions(oier_filter):
+    where, params = [], []
+    push_in_clause(where, params, 'o.gender', to_list(oier_filter.get('gender', oier_filter.get('genders'))))
+    if oier_filter.get('enroll_min') is not None: where.append('o.enroll_middle >= ?'); params.append(oier_filter['enroll_min'])
+    if oier_filter.get('enroll_max') is not None: where.append('o.enroll_middle <= ?'); params.append(oier_filter['enroll_max'])
+    push_in_clause(where, params, 'o.initials', to_list(oier_filter.get('initials')))
+    return where, params
+
+
+def build_record_subquery(f, candidate_uids=None, oier_filter=None):
+    """返回 (sql, params, 条件本身的参数个数)"""
+    contest_where, contest_params = contest_conditions(f)
+    filter_param_count = len(record_conditions(f, 'cr')[1]) + len(contest_params)
+    if candidate_uids is None:
+        from_clause = 'Record r'
+        o_where, o_params = oier_conditions(oier_filter or {})
+        if o_where:
+            from_clause += ' JOIN OIer o ON r.oier_uid = o.uid'
+        if contest_where:
+            from_clause += ' JOIN Contest c ON r.contest_id = c.id'
+        r_where, r_params = record_conditions(f, 'r')
+        where = o_where + r_where + contest_where
+        sql = f"SELECT DISTINCT r.oier_uid FROM {from_clause} {'WHERE ' + ' AND '.join(where) if where else ''}"
+        return sql, o_params + r_params + contest_params, filter_param_count
+    r_where, r_params = record_conditions(f, 'cr')
+    cte = f"WITH CandidateRecords AS (SELECT * FROM Record WHERE oier_uid IN ({','.join('?' * len(candidate_uids))}) LIMIT -1)"
+    from_clause = 'CandidateRecords cr' + (' JOIN Contest c ON cr.contest_id = c.id' if contest_where else '')
+    where = r_where + contest_where
+    sql = f"{cte} SELECT DISTINCT cr.oier_uid FROM {from_clause} {'WHERE ' + ' AND '.join(where) if where else ''}"
+    return sql, list(candidate_uids) + r_params + contest_params, filter_param_count
+
+
+def chunked(values, size):
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+def load_contest_stats(path=CONTEST_STATS_FILE):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return data['min_year'], data['max_year'], data['stats']
+
+
+def run_plan(db, payload, contest_stats, max_vars=D1_MAX_VARS, verification_threshold=VERIFICATION_THRESHOLD):
+    """
+    按 worker 的计划执行一个查询 (管理员模式，不做强度检查)，返回 (OIer 列表, usage)。
+    usage 与 worker 的返回格式相同，另外给出 SQL 请求数与查询强度。
+    """
+    min_year, max_year, stats = contest_stats
+    record_filters = preprocess_filters(payload.get('record_filters') or [], min_year, max_year)
+    oier_filter = payload.get('oier_filters') or {}
+    limit = min(int(payload.get('limit') or MAX_LIMIT), MAX_LIMIT)
+    if not record_filters and not oier_filter:
+        raise ValueError("Query is too broad. Please provide at least one filter.")
+    strength = sum(filter_strength(f) for f in record_filters) + filter_strength(oier_filter, True)
+    record_filters.sort(key=lambda f: filter_selectivity(stats, f))
+
+    steps = []
+
+    def query(name, sql, params):
+        rows, meta = db.query(sql, params)
+        steps.append(usage_step(name, meta))
+        return rows
+
+    candidate_uids = None
+    has_oier_filter = bool(oier_conditions(oier_filter)[0])
+    oier_filter_applied_early = bool(record_filters) and has_oier_filter
+    if record_filters and filter_selectivity(stats, record_filters[0]) < 1:
+        candidate_uids = []
+    else:
+        verification_mode, oier_records = False, {}
+        for i, f in enumerate(record_filters):
+            if candidate_uids is not None and not candidate_uids:
+                break
+            if i == 0 and candidate_uids is None:
+                effective = dict(f)
+                contest_where, contest_params = contest_conditions(f)
+                if contest_where:
+                    rows = query("initial_contest_prefilter", f"SELECT id FROM Contest c WHERE {' AND '.join(contest_where)}", contest_params)
+                    contest_ids = [row['id'] for row in rows]
+                    if not contest_ids:
+                        candidate_uids = []
+                        break
+                    existing = to_list(effective.get('contest_id', effective.get('contest_ids')))
+                    effective['contest_ids'] = list(dict.fromkeys(existing + contest_ids))
+                sql, params, _ = build_record_subquery(effective, None, oier_filter)
+                rows = query("initial_record_query", sql, params)
+                candidate_uids = list(dict.fromkeys(row['oier_uid'] for row in rows))
+                continue
+            if not verification_mode and candidate_uids and len(candidate_uids) < verification_threshold:
+                verification_mode = True
+                for index, chunk in enumerate(chunked(candidate_uids, max_vars)):
+                    sql = (f"SELECT {RECORD_COLUMNS} FROM Record r JOIN Contest c ON r.contest_id = c.id "
+                           f"WHERE r.oier_uid IN ({','.join('?' * len(chunk))})")
+                    for record in query(f"fetch_records_for_verification_chunk_{index}", sql, chunk):
+                        oier_records.setdefault(record['oier_uid'], []).append(record)
+            if verification_mode:
+                candidate_uids = [uid for uid in candidate_uids
+                                  if any(record_matches(record, f) for record in oier_records.get(uid, []))]
+                steps.append(usage_step(f"in_memory_verification_{i}", {}))
+            else:
+                _, _, filter_param_count = build_record_subquery(f)
+                if filter_param_count >= max_vars:
+                    raise ValueError(f"Filter at index {i} is too complex...")
+                chunks = chunked(candidate_uids, max_vars - filter_param_count) if candidate_uids is not None else [None]
+                new_uids = {}
+                for index, chunk in enumerate(chunks):
+                    sql, params, _ = build_record_subquery(f, chunk)
+                    for row in query(f"record_filter_{i}_chunk_{index}", sql, params):
+                        new_uids[row['oier_uid']] = True
+                candidate_uids = list(new_uids)
+
+    oiers = []
+    if candidate_uids is not None:
+        candidate_uids = sorted(candidate_uids)[:limit]
+    if candidate_uids is None or candidate_uids:
+        o_where, o_params = ([], []) if oier_filter_applied_early else oier_conditions(oier_filter)
+        if len(o_params) >= max_vars:
+            raise ValueError("Oier filter is too complex...")
+        if candidate_uids is not None:
+            for index, chunk in enumerate(chunked(candidate_uids, max_vars - len(o_params))):
+                where, params = list(o_where), list(o_params)
+                push_in_clause(where, params, 'o.uid', chunk)
+                oiers.extend(query(f"final_oier_query_chunk_{index}", f"SELECT * FROM OIer o WHERE {' AND '.join(where)};", params))
+        else:
+            where_sql = f"WHERE {' AND '.join(o_where)}" if o_where else ''
+            oiers = query("final_oier_query_no_uids", f"SELECT * FROM OIer o {where_sql} ORDER BY o.uid ASC LIMIT ?;", o_params + [limit])
+    oiers.sort(key=lambda o: o['uid'])
+
+    usage = {
+        'steps': steps, 'queries': sum(1 for s in steps if not s['name'].startswith('in_memory')),
+        'total_rows_read': sum(s['rows_read'] for s in steps), 'total_rows_written': sum(s['rows_written'] for s in steps),
+        'strength': strength,
+    }
+    return oiers, usage
+
+
+def payload_from_config(config, limit=MAX_LIMIT):
+    """把 YAML 配置 (oierfinder 格式) 转换为 worker 的请求格式；worker 不支持的键抛出 ValueError"""
+    supported = {'year_range', 'contest_type', 'level_range', 'province', 'score_range', 'rank_range'}
+    record_filters = []
+    for constraint in (config or {}).get('records') or []:
+        unsupported = set(constraint) - supported
+        if unsupported or not isinstance(constraint, dict):
+            raise ValueError(f"worker 不支持的记录条件: {sorted(unsupported) if isinstance(constraint, dict) else constraint}")
+        f = {}
+        year_min, year_max = constraint.get('year_range') or [None, None]
+        score_min, score_max = constraint.get('score_range') or [None, None]
+        rank_min, rank_max = constraint.get('rank_range') or [None, None]
+        for key, value in (('year_start', year_min), ('year_end', year_max), ('min_score', score_min),
+                           ('max_score', score_max), ('min_rank', rank_min), ('max_rank', rank_max)):
+            if value is not None:
+                f[key] = value
+        for key, target in (('contest_type', 'contest_types'), ('level_range', 'levels'), ('province', 'provinces')):
+            if to_list(constraint.get(key)):
+                f[target] = to_list(constraint[key])
+        record_filters.append(f)
+    unsupported = set(config or {}) - {'records', 'enroll_year_range'}
+    if unsupported:
+        raise ValueError(f"worker 不支持的条件: {sorted(unsupported)}")
+    oier_filters = {}
+    enroll_min, enroll_max = (config or {}).get('enroll_year_range') or [None, None]
+    if enroll_min is not None: oier_filters['enroll_min'] = enroll_min
+    if enroll_max is not None: oier_filters['enroll_max'] = enroll_max
+    return {'record_filters': record_filters, 'oier_filters': oier_filters, 'limit': limit}
+
+
+def parse_int_list(text):
+    return [int(v) for v in text.split(',') if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在 D1 (或本地替身) 上执行 worker 的查询计划，统计 D1 用量并比较参数。")
+    parser.add_argument('--db', default=os.path.join(ROOT, 'oier_data.db'), help="进程内本地替身使用的数据库 (默认为仓库根目录的 oier_data.db)")
+    parser.add_argument('--endpoint', help="通过 HTTP 访问 d1_local.py 启动的替身，例如 http://127.0.0.1:8787")
+    parser.add_argument('--cloudflare', metavar='CONFIG_YML', help="使用 config.yml 中的 cloudflare 配置访问真实的 D1 (会产生费用)")
+    parser.add_argument('-c', '--config', help="单个 YAML 查询配置；默认使用 bench/query_catalog.py 中 worker 支持的查询")
+    parser.add_argument('--max-vars', default=str(D1_MAX_VARS), help=f"每条语句的参数上限，逗号分隔多个值比较 (默认为: {D1_MAX_VARS})")
+    parser.add_argument('--threshold', default=str(VERIFICATION_THRESHOLD), help=f"进入内存验证的候选人数阈值，逗号分隔多个值比较 (默认为: {VERIFICATION_THRESHOLD})")
+    parser.add_argument('-v', '--verbose', action='store_true', help="输出每个查询的各步骤用量")
+    args = parser.parse_args()
+
+    import sqlite3
+    from bench.query_catalog import build_catalog
+
+    if args.config:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            queries = [(os.path.basename(args.config), yaml.safe_load(f))]
+    else:
+        conn = sqlite3.connect(args.db)
+        queries = build_catalog(conn.cursor())
+        conn.close()
+    payloads = []
+    for name, config in queries:
+        try:
+            payloads.append((name, payload_from_config(config)))
+        except ValueError as e:
+            print(f"跳过 {name}: {e}")
+
+    max_vars_values, thresholds = parse_int_list(args.max_vars), parse_int_list(args.threshold)
+    if args.cloudflare:
+        with open(args.cloudflare, 'r', encoding='utf-8') as f:
+            cf = yaml.safe_load(f)['cloudflare']
+        db = HttpD1(cf.get('api_base', CLOUDFLARE_API), cf['account_id'], cf['database_id'], cf['api_token'])
+    elif args.endpoint:
+        db = HttpD1(args.endpoint)
+    else:
+        db = InProcessD1(args.db, max([D1_MAX_VARS] + max_vars_values))
+    contest_stats = load_contest_stats()
+
+    print(f"{'max_vars':>8} {'阈值':>6} {'请求数':>8} {'rows_read':>12} {'rows_written':>12} {'读取费用 $/百万次':>18}")
+    reference = {}
+    for max_vars in max_vars_values:
+        for threshold in thresholds:
+            total_queries = total_read = total_written = 0
+            for name, payload in payloads:
+                try:
+                    oiers, usage = run_plan(db, payload, contest_stats, max_vars, threshold)
+                except (ValueError, D1Error) as e:
+                    print(f"  {name}: 失败 {e}")
+                    continue
+                uids = [o['uid'] for o in oiers]
+                if reference.setdefault(name, uids) != uids:
+                    print(f"  警告: {name} 在 max_vars={max_vars}, 阈值={threshold} 时结果与第一组参数不同")
+                total_queries += usage['queries']
+                total_read += usage['total_rows_read']
+                total_written += usage['total_rows_written']
+                if args.verbose:
+                    print(f"  {name}: {usage['queries']} 个请求, rows_read {usage['total_rows_read']}, 强度 {usage['strength']}")
+                    for step in usage['steps']:
+                        print(f"      {step['name']:<44} {step['rows_read']:>10} {step['duration_ms']:>10.3f} ms")
+            # 整个查询目录执行一百万次的读取费用
+            cost = total_read * ROWS_READ_USD_PER_MILLION + total_written * ROWS_WRITTEN_USD_PER_MILLION
+            print(f"{max_vars:>8} {threshold:>6} {total_queries:>8} {total_read:>12} {total_written:>12} {cost:>18.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,11 @@
 import sqlite3
 import json
 import os
+import argparse
+import time
+
+from utils import oier_metrics, similarity, snapshot
+from utils.db_meta import compute_data_version, write_meta
 
 # --- 数据源文件 ---
 DIST_DIR = 'oierdb-data/dist'
@@ -77,10 +82,10 @@ def create_tables(cursor):
     ''')
     print("Tables created successfully.")
 
-def load_static_data(cursor):
+def load_static_data(cursor, static_file=STATIC_FILE):
     """从 static.json 加载 School 和 Contest 数据"""
-    print("Loading data from static.json...")
-    with open(STATIC_FILE, 'r', encoding='utf-8') as f:
+    print(f"Loading data from {static_file}...")
+    with open(static_file, 'r', encoding='utf-8') as f:
         data = json.load(f)
 
     schools_to_insert = []
@@ -99,13 +104,13 @@ def load_static_data(cursor):
     cursor.executemany('INSERT INTO Contest (id, name, type, year, fall_semester, full_score) VALUES (?, ?, ?, ?, ?, ?)', contests_to_insert)
     print(f"Inserted {len(contests_to_insert)} contests.")
 
-def load_results_data(cursor):
+def load_results_data(cursor, result_file=RESULT_FILE):
     """从 result.txt 加载 OIer 和 Record 数据"""
-    print("Loading data from result.txt...")
+    print(f"Loading data from {result_file}...")
     oiers_to_insert = []
     records_to_insert = []
 
-    with open(RESULT_FILE, 'r', encoding='utf-8') as f:
+    with open(result_file, 'r', encoding='utf-8') as f:
         for line in f:
             line = line.strip()
             if not line:
@@ -138,28 +143,120 @@ def load_results_data(cursor):
     cursor.executemany('INSERT INTO Record (oier_uid, contest_id, school_id, score, rank, province, level) VALUES (?, ?, ?, ?, ?, ?, ?)', records_to_insert)
     print(f"Inserted {len(records_to_insert)} Records.")
 
-def main():
-    """主函数"""
-    if os.path.exists(DB_FILE):
-        os.remove(DB_FILE)
+def create_indexes(cursor, verbose=True):
+    """创建查询引擎使用的索引 (与 cloudflare/script/create_indexes.py 保持一致)；已存在的索引会跳过"""
+    if verbose: print("Creating indexes...")
+    # 枚举模式: 按 oier_uid 探测其全部记录的覆盖索引
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_record_oier_covering ON Record(oier_uid, contest_id, level, score, rank, province, school_id)")
+    # 扫描模式: 按比赛 (及奖项) 取出记录的覆盖索引
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_record_contest_level_uid ON Record(contest_id, level, oier_uid)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_contest_year_type ON Contest(year, type, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_oier_enroll ON OIer(enroll_middle)")
+    # 排序取前 K 名: 与 finder_engine.order_clause 的 ORDER BY <列> DESC, uid 顺序一致
+    for column in ('oierdb_score', 'ccf_score', 'enroll_middle'):
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_oier_rank_{column} ON OIer({column} DESC, uid)")
+    # 按学校 (及省份、奖项) 取出 OIer 的覆盖索引，与 Worker 使用的同名索引一致
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_record_school_province_level_uid ON Record(school_id, province, level, oier_uid)")
+    if verbose: print("Indexes created successfully.")
+
+def create_search_index(cursor, verbose=True):
+    """
+    创建姓名/首字母与学校名的 FTS5 全文索引 (见 utils/text_search.py)；已存在时跳过。
+    SQLite 未编译 FTS5 时跳过并返回 False，查询引擎会退回 LIKE 查询。
+    """
+    if verbose: print("Creating full-text search index...")
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS OIerSearch USING fts5("
+                       "name, initials, content='OIer', content_rowid='uid', prefix='1 2 3')")
+        cursor.execute("INSERT INTO OIerSearch(OIerSearch) VALUES ('rebuild')")
+        cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS SchoolSearch USING fts5("
+                       "name, content='School', content_rowid='id', tokenize='trigram')")
+        cursor.execute("INSERT INTO SchoolSearch(SchoolSearch) VALUES ('rebuild')")
+    except sqlite3.OperationalError as e:
+        if verbose: print(f"Skipped full-text search index: {e}")
+        return False
+    if verbose: print("Full-text search index created successfully.")
+    return True
+
+def build_record_stats(cursor):
+    """预计算每场比赛按省份/奖项的记录数与人数 (统计立方体)，供查询代价估计使用"""
+    print("Building record stats...")
+    cursor.execute('''
+    CREATE TABLE RecordStats (
+        contest_id INTEGER,
+        province TEXT,
+        level TEXT,
+        record_count INTEGER,
+        oier_count INTEGER
+    )
+    ''')
+    cursor.execute('''
+    INSERT INTO RecordStats (contest_id, province, level, record_count, oier_count)
+    SELECT contest_id, province, level, COUNT(*), COUNT(DISTINCT oier_uid)
+    FROM Record GROUP BY contest_id, province, level
+    ''')
+    print(f"Inserted {cursor.rowcount} stats rows.")
+
+def build_database(static_file=STATIC_FILE, result_file=RESULT_FILE, db_file=DB_FILE):
+    """从 static.json 和 result.txt 重新生成数据库文件，失败时抛出异常"""
+    if os.path.exists(db_file):
+        os.remove(db_file)
 
-    conn = sqlite3.connect(DB_FILE)
+    conn = sqlite3.connect(db_file)
     cursor = conn.cursor()
 
     try:
         create_tables(cursor)
-        load_static_data(cursor)
-        load_results_data(cursor)
+        load_static_data(cursor, static_file)
+        load_results_data(cursor, result_file)
+        create_indexes(cursor)
+        create_search_index(cursor)
+        build_record_stats(cursor)
+        # 每个 OIer 的奖牌/奖项计数、最好成绩与活跃年份 (见 utils/oier_metrics.py)，供 metrics 条件与排序使用
+        oier_metrics.build(cursor)
+        data_version = compute_data_version(static_file, result_file)
+        write_meta(cursor, {
+            'data_version': data_version,
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        })
         conn.commit()
-        print(f"\nDatabase '{DB_FILE}' created and populated successfully!")
-    except Exception as e:
-        print(f"\nAn error occurred: {e}")
+        # 收集 sqlite_stat1 统计信息，供查询规划器与代价模型使用
+        cursor.execute("ANALYZE")
+        conn.commit()
+        print("Building snapshot...")
+        size = snapshot.build(cursor, snapshot.snapshot_path(db_file), data_version)
+        print(f"Wrote {size / 2**20:.1f} MB snapshot to '{snapshot.snapshot_path(db_file)}'.")
+        # 相似 OIer 检索的 MinHash/LSH 索引，构建需要 numpy
+        if similarity.available():
+            print("Building similarity index...")
+            size = similarity.build(cursor, similarity.index_path(db_file), data_version)
+            print(f"Wrote {size / 2**20:.1f} MB similarity index to '{similarity.index_path(db_file)}'.")
+        else:
+            print("numpy is not installed, skipping similarity index.")
+    except Exception:
         conn.rollback()
+        raise
     finally:
         conn.close()
 
-    print(f"\nProcess finished. Check for '{DB_FILE}'.")
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="从 OIerDb 数据生成 SQLite 数据库。")
+    parser.add_argument("--dist", default=DIST_DIR, help=f"static.json 与 result.txt 所在目录 (默认为: {DIST_DIR})")
+    parser.add_argument("--db", default=DB_FILE, help=f"输出的数据库文件 (默认为: {DB_FILE})")
+    args = parser.parse_args()
+
+    static_file = os.path.join(args.dist, 'static.json')
+    result_file = os.path.join(args.dist, 'result.txt')
+
+    try:
+        build_database(static_file, result_file, args.db)
+        print(f"\nDatabase '{args.db}' created and populated successfully!")
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
+
+    print(f"\nProcess finished. Check for '{args.db}'.")
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -1,13 +1,25 @@
 import sqlite3
 import os
+import sys
+import csv
+import glob
+import json
+import time
 import argparse
+import multiprocessing
 import yaml
 
 # 导入重构后的核心逻辑
-from utils import finder_engine
+from utils import finder_engine, columnar_engine, replica, admission, closest_match
 
 DB_FILE = 'oier_data.db'
 DEFAULT_CONFIG_FILE = 'config.yml'
+# 默认只输出排序后的前 DEFAULT_LIMIT 名，--limit 0 输出全部
+DEFAULT_LIMIT = 100
+# 批量模式下每个进程映射数据库文件的上限，多个进程通过 OS 页缓存共享同一份物理内存
+MMAP_SIZE = 1 << 30
+ENGINES = {'sqlite': finder_engine, 'columnar': columnar_engine}
+CSV_FIELDS = ['config', 'elapsed_ms', 'uid', 'initials', 'name', 'gender', 'enroll_middle', 'oierdb_score', 'ccf_score', 'ccf_level']
 
 def load_config(config_file):
     """加载 YAML 配置文件"""
@@ -21,7 +33,7 @@ def load_config(config_file):
         print(f"错误: 解析 YAML 文件 '{config_file}' 失败: {e}")
         return None
 
-def print_results(oiers):
+def print_results(oiers, limit=None, order_by=finder_engine.DEFAULT_ORDER_BY):
     """格式化并打印结果"""
     if not oiers:
         print("\n======================================")
@@ -30,7 +42,10 @@ def print_results(oiers):
         return
 
     print(f"\n======================================")
-    print(f"找到 {len(oiers)} 名符合所有条件的 OIer:")
+    if limit is not None and len(oiers) >= limit:
+        print(f"按 {order_by} 从高到低显示前 {limit} 名符合所有条件的 OIer (--limit 0 显示全部):")
+    else:
+        print(f"找到 {len(oiers)} 名符合所有条件的 OIer:")
     print("======================================")
     print(f"{'UID':<8} {'姓名':<10} {'性别':<4} {'入学年份':<8} {'DB评分':<10}")
     print("-" * 50)
@@ -48,6 +63,144 @@ def print_results(oiers):
         
         print(f"{uid:<8} {name:<10} {gender_map.get(gender, '?'):<4} {enroll:<8} {score:<10.2f}")
 
+def print_closest(units, results):
+    """打印最接近的匹配：每人满足的条件个数、得分与未满足的条件"""
+    print("\n======================================")
+    print(f"满足最多条件的 {len(results)} 名 OIer (共 {len(units)} 个条件):")
+    print("======================================")
+    for i, unit in enumerate(units):
+        condition = json.dumps(unit['condition'], ensure_ascii=False)
+        print(f"  [{i}] {'不满足 ' if unit['negated'] else ''}{condition} (权重 {unit['weight']:.2f}, {unit['matches']} 人)")
+    print(f"{'UID':<8} {'姓名':<10} {'满足':<6} {'得分':<8} {'未满足的条件'}")
+    print("-" * 50)
+    for result in results:
+        oier = dict(result['oier'])
+        missed = ', '.join(f"[{i}]" for i in result['missed']) or '-'
+        print(f"{oier['uid']:<8} {oier['name']:<10} {result['hits']:<6} {result['score']:<8.2f} {missed}")
+
+def print_profile(profile):
+    """打印每个查询步骤的执行情况"""
+    print(f"\n--- 查询执行分析 (总耗时 {profile.total_ms:.2f} ms) ---")
+    print(f"{'步骤':<22} {'模式':<10} {'参数':>6} {'返回行':>8} {'剩余人数':>8} {'耗时(ms)':>10}")
+    print("-" * 70)
+    for step in profile.steps:
+        survivors = '-' if step['survivors'] is None else step['survivors']
+        print(f"{step['name']:<22} {step['mode']:<10} {step['param_count']:>6} {step['rows']:>8} {survivors:>8} {step['elapsed_ms']:>10.2f}")
+    for step in profile.steps:
+        print(f"\n[{step['name']}] {step['sql']}")
+        for line in step['plan'] or []:
+            print(f"    {line}")
+
+def iter_batch_configs(source):
+    """
+    批量模式的输入：'-' 表示从标准输入读取 JSONL，否则为目录或 glob 模式。
+    逐个产出 (名称, config, 错误信息)。
+    """
+    if source == '-':
+        for lineno, line in enumerate(sys.stdin, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield f"stdin:{lineno}", None, f"解析 JSON 失败: {e}"
+                continue
+            if isinstance(item, dict) and isinstance(item.get('config'), dict):
+                yield item.get('name', f"stdin:{lineno}"), item['config'], None
+            else:
+                yield f"stdin:{lineno}", item, None
+        return
+
+    if os.path.isdir(source):
+        paths = sorted(glob.glob(os.path.join(source, '*.yml')) + glob.glob(os.path.join(source, '*.yaml')))
+    else:
+        paths = sorted(glob.glob(source))
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                yield path, yaml.safe_load(f), None
+        except (OSError, yaml.YAMLError) as e:
+            yield path, None, f"读取配置失败: {e}"
+
+_worker_conn = None
+_worker_engine = finder_engine
+_worker_options = {}
+_worker_budget = admission.UNLIMITED
+
+def open_readonly(db_file):
+    """以只读、不可变方式打开数据库，并通过 mmap 读取页面"""
+    conn = sqlite3.connect(f"file:{db_file}?mode=ro&immutable=1", uri=True)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    return conn
+
+def open_database(db_file, db_mode='file'):
+    """file 模式直接打开磁盘文件；memory 模式先把整个数据库加载到内存副本"""
+    if db_mode == 'memory':
+        return replica.Replica(db_file).connect()
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def _init_worker(db_file, backend='sqlite', db_mode='file', options=None, budget=None):
+    global _worker_conn, _worker_engine, _worker_options, _worker_budget
+    _worker_conn = open_database(db_file, db_mode) if db_mode == 'memory' else open_readonly(db_file)
+    _worker_engine = ENGINES[backend]
+    _worker_options = options or {}
+    _worker_budget = budget or admission.UNLIMITED
+
+def _run_batch_item(item):
+    """在工作进程中执行单个 config，返回可序列化的结果"""
+    name, config, error = item
+    result = {'config': name, 'elapsed_ms': 0.0, 'count': 0, 'oiers': []}
+    if error is not None:
+        result['error'] = error
+        return result
+    started = time.perf_counter()
+    try:
+        oiers, _, _ = admission.run(_worker_engine, config, _worker_conn.cursor(), _worker_budget, **_worker_options)
+    except (sqlite3.Error, TypeError, ValueError, AttributeError) as e:
+        result['error'] = f"查询失败: {e}"
+        oiers = []
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    result['count'] = len(oiers)
+    result['oiers'] = [dict(row) for row in oiers]
+    return result
+
+def run_batch(source, jobs, output_format, backend='sqlite', db_mode='file', options=None, out=sys.stdout, budget=None):
+    """批量执行多个 config，按输入顺序流式输出 JSONL 或 CSV；超出预算的 config 单独报错，不影响其他 config"""
+    if jobs > 1 and db_mode == 'memory':
+        # 每个进程各自加载一份内存副本会使内存随进程数成倍增长；多进程应共享 mmap 映射的只读文件 (file 模式)
+        raise ValueError("内存副本只能用于单进程批量模式 (-j 1)；多进程请使用 --db-mode file，各进程以只读 + mmap 方式共享数据库文件")
+    items = iter_batch_configs(source)
+    if jobs <= 1:
+        _init_worker(DB_FILE, backend, db_mode, options, budget)
+        results = map(_run_batch_item, items)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(DB_FILE, backend, db_mode, options, budget))
+        results = pool.imap(_run_batch_item, items, chunksize=4)
+
+    writer = csv.DictWriter(out, fieldnames=CSV_FIELDS, extrasaction='ignore') if output_format == 'csv' else None
+    if writer:
+        writer.writeheader()
+    total, started = 0, time.perf_counter()
+    try:
+        for result in results:
+            total += 1
+            if writer is None:
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            else:
+                base = {'config': result['config'], 'elapsed_ms': result['elapsed_ms']}
+                for oier in result['oiers'] or [{}]:
+                    writer.writerow({**base, **oier})
+            out.flush()
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    print(f"批量查询完成: {total} 个配置，耗时 {time.perf_counter() - started:.2f} s", file=sys.stderr)
+
 def main():
     parser = argparse.ArgumentParser(description="根据 YAML 配置查询 OIer 数据。")
     parser.add_argument(
@@ -55,34 +208,121 @@ def main():
         default=DEFAULT_CONFIG_FILE,
         help=f"指定 YAML 配置文件路径 (默认为: {DEFAULT_CONFIG_FILE})"
     )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help="输出每个查询步骤的 SQL、返回行数、耗时与查询计划"
+    )
+    parser.add_argument(
+        '--batch',
+        metavar='SOURCE',
+        help="批量模式: 配置目录、glob 模式 (如 'configs/*.yml')，或 '-' 表示从标准输入读取 JSONL"
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        help="批量模式的进程数 (默认为 CPU 核数；--db-mode memory 时为 1)"
+    )
+    parser.add_argument(
+        '--format',
+        choices=['jsonl', 'csv'],
+        default='jsonl',
+        help="批量模式的输出格式 (默认为: jsonl)"
+    )
+    parser.add_argument(
+        '--backend',
+        choices=sorted(ENGINES),
+        default='sqlite',
+        help="查询引擎: sqlite 逐条件执行 SQL；columnar 把记录表载入 NumPy 数组后向量化求值 (默认为: sqlite)"
+    )
+    parser.add_argument(
+        '--db-mode',
+        choices=['file', 'memory'],
+        default='file',
+        help="file 直接读取数据库文件；memory 先把数据库加载到内存副本再查询，批量模式下只能单进程运行，不能与大于 1 的 -j 同时使用 (默认为: file)"
+    )
+    parser.add_argument(
+        '--limit',
+        type=int,
+        default=DEFAULT_LIMIT,
+        help=f"只输出排序后的前 N 名，0 表示全部 (默认为: {DEFAULT_LIMIT})"
+    )
+    parser.add_argument(
+        '--order-by',
+        choices=finder_engine.ORDER_COLUMNS,
+        default=finder_engine.DEFAULT_ORDER_BY,
+        help=f"结果按该列从高到低排序，可以是 utils/oier_metrics.py 中的派生指标 (默认为: {finder_engine.DEFAULT_ORDER_BY})"
+    )
+    parser.add_argument(
+        '--closest',
+        type=int,
+        metavar='K',
+        help="不要求满足全部条件：按满足的记录条件个数 (或权重之和) 输出前 K 名及各自未满足的条件"
+    )
+    parser.add_argument(
+        '--weights',
+        default='uniform',
+        help="--closest 的条件权重: uniform 每个条件为 1；rarity 满足人数越少的条件权重越高；或逗号分隔的数值 (默认为: uniform)"
+    )
+    parser.add_argument(
+        '--max-cost-ms',
+        type=float,
+        help="估计耗时超过该值 (毫秒) 的查询直接拒绝，不执行 (默认不限制)"
+    )
+    parser.add_argument(
+        '--timeout-ms',
+        type=int,
+        help="单个查询的执行时间上限 (毫秒)，超时后中断 (默认不限制)"
+    )
     args = parser.parse_args()
+    if args.jobs is None:
+        args.jobs = 1 if args.db_mode == 'memory' else os.cpu_count() or 1
+    elif args.jobs > 1 and args.db_mode == 'memory':
+        parser.error("--db-mode memory 不能与大于 1 的 -j 同时使用：每个进程各自加载一份内存副本会使内存随进程数成倍增长")
+    limit = args.limit if args.limit > 0 else None
+    budget = admission.Budget(max_cost_ms=args.max_cost_ms, timeout_ms=args.timeout_ms)
 
     if not os.path.exists(DB_FILE):
         print(f"错误: 数据库文件 '{DB_FILE}' 不存在。请先运行 create_db.py。")
         return
 
+    if args.batch:
+        run_batch(args.batch, args.jobs, args.format, args.backend, args.db_mode,
+                  {'limit': limit, 'order_by': args.order_by}, budget=budget)
+        return
+
     config = load_config(args.config)
     if config is None:
         return
 
     conn = None
     try:
-        conn = sqlite3.connect(DB_FILE)
-        # 让返回结果可以像字典一样访问，方便打印
-        conn.row_factory = sqlite3.Row
+        # 返回结果可以像字典一样访问，方便打印
+        conn = open_database(DB_FILE, args.db_mode)
         cursor = conn.cursor()
         
         print(f"--- 开始使用 '{args.config}' 进行查询 ---")
         
         # 调用核心查询引擎
-        found_oiers = finder_engine.find_oiers(config, cursor)
-        
-        print_results(found_oiers)
+        profile = finder_engine.QueryProfile() if args.profile else None
+        if args.closest is not None:
+            weights = args.weights if args.weights in closest_match.WEIGHTINGS else [float(w) for w in args.weights.split(',')]
+            units, results = closest_match.find_closest(config, cursor, args.closest, weights, profile, args.order_by)
+            print_closest(units, results)
+        else:
+            found_oiers, _, _ = admission.run(ENGINES[args.backend], config, cursor, budget, profile=profile,
+                                              limit=limit, order_by=args.order_by)
+            print_results(found_oiers, limit, args.order_by)
+
+        if profile is not None:
+            print_profile(profile)
         
         print("\n--- 查询结束 ---")
 
     except sqlite3.Error as e:
         print(f"数据库错误: {e}")
+    except (admission.QueryRejected, admission.QueryTimeout, ValueError) as e:
+        print(f"错误: {e}")
     finally:
         if conn:
             conn.close()
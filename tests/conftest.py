@@ -0,0 +1,47 @@
+# conftest.py
+"""
+测试共用的数据库：由 bench/synth_data.py 生成小规模的合成数据 (约 2200 名选手)，
+再经 create_db.build_database 导入，与正式数据库一样带有指标表、快照与相似度索引 (后者需要 numpy)。
+整个测试会话只构建一次，各测试只读访问；client 为指向该数据库的 app.py 测试客户端。
+"""
+import os
+import sqlite3
+
+import pytest
+
+import create_db
+from bench import synth_data
+
+SCALE = 0.02
+
+
+@pytest.fixture(scope='session')
+def db_file(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('oier_data')
+    static_file, result_file = synth_data.generate(str(directory), SCALE, verbose=False)
+    path = os.path.join(directory, 'oier_data.db')
+    create_db.build_database(static_file, result_file, path)
+    return path
+
+
+@pytest.fixture(scope='session')
+def conn(db_file):
+    conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def cursor(conn):
+    cursor = conn.cursor()
+    yield cursor
+    cursor.close()
+
+
+@pytest.fixture
+def client(db_file, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, 'DATABASE', db_file)
+    monkeypatch.setitem(app_module.app.config, 'TESTING', True)
+    return app_module.app.test_client()
@@ -0,0 +1,54 @@
+# test_admission.py
+"""查询准入控制 (utils/admission.py)"""
+import pytest
+
+from utils import admission, finder_engine
+
+NOI = {'records': [{'contest_type': ['NOI']}]}
+
+
+@pytest.mark.parametrize('budget, limit, expected', [
+    (admission.UNLIMITED, None, (None, 'run')),
+    (admission.Budget(max_rows=100), None, (100, 'top_k')),
+    (admission.Budget(max_rows=100), 500, (100, 'top_k')),
+    (admission.Budget(max_rows=100), 20, (20, 'run')),
+    (admission.Budget(max_rows=5000), None, (None, 'run')),
+    (admission.Budget(max_cost_ms=50), 10, (10, 'run')),
+])
+def test_decide(budget, limit, expected):
+    assert admission.decide(admission.Estimate(10.0, 1000), budget, limit) == expected
+
+
+def test_decide_rejects_expensive_queries():
+    with pytest.raises(admission.QueryRejected):
+        admission.decide(admission.Estimate(200.0, 10), admission.Budget(max_cost_ms=100))
+
+
+def test_estimate(cursor):
+    oiers = cursor.execute("SELECT COUNT(*) FROM OIer").fetchone()[0]
+    everyone = admission.estimate({}, cursor)
+    assert everyone.rows == oiers and everyone.eval_ms == 0
+    estimated = admission.estimate(NOI, cursor)
+    assert 0 < estimated.rows < oiers
+    assert [step['kind'] for step in estimated.steps] == ['record']
+    assert estimated.to_dict()['rows'] == round(estimated.rows)
+
+
+def test_run_downgrades_to_top_k(cursor):
+    results, limit, decision = admission.run(finder_engine, {}, cursor, admission.Budget(max_rows=25))
+    assert (limit, decision) == (25, 'top_k')
+    assert [row['uid'] for row in results] == [row['uid'] for row in finder_engine.find_oiers({}, cursor, limit=25)]
+
+
+def test_run_rejects_before_executing(cursor):
+    with pytest.raises(admission.QueryRejected):
+        admission.run(finder_engine, {'records': [{'score_range': [0, None]}]}, cursor, admission.Budget(max_cost_ms=0))
+
+
+def test_deadline_interrupts_long_statements(conn):
+    slow = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n"
+    with pytest.raises(admission.QueryTimeout):
+        with admission.deadline(conn, 20):
+            conn.execute(slow).fetchone()
+    # 退出后不再限制
+    assert conn.execute("SELECT 1").fetchone()[0] == 1
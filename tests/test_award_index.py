@@ -0,0 +1,82 @@
+# test_award_index.py
+"""奖项倒排索引 (utils/award_index.py) 及其与扫描/枚举之间的代价选择"""
+import pytest
+
+from utils import award_index, cost_model, finder_engine
+from utils.school_catalog import RESOLVED_KEY
+
+POSTING_CONSTRAINTS = [
+    {'year_range': [2021, 2021]},
+    {'contest_type': ['NOI'], 'level_range': ['金牌', '银牌']},
+    {'year_range': [2018, 2023], 'province': ['浙江', '江苏']},
+    {'year_range': [None, 2010], 'contest_type': ['NOIP提高'], 'province': ['广东'], 'level_range': ['一等奖']},
+    {'contest_type': ['WC'], 'province': ['不存在']},
+    {'level_range': ['不存在']},
+    {'year_range': [2024, 2019]},
+]
+
+
+def sql_uids(cursor, constraint):
+    query, values = finder_engine.build_record_query(constraint)
+    return {row[0] for row in cursor.execute(query, values)}
+
+
+@pytest.mark.parametrize('constraint', POSTING_CONSTRAINTS)
+def test_lookup_matches_sql(cursor, constraint):
+    index = award_index.for_cursor(cursor)
+    assert index is not None
+    assert award_index.supports(constraint)
+    contests = cost_model.for_cursor(cursor).matching_contests(constraint)
+    assert index.lookup(constraint, contests) == sql_uids(cursor, constraint)
+
+
+def test_postings_are_sorted(cursor):
+    index = award_index.for_cursor(cursor)
+    for contest_id in index.contest_ids[:20]:
+        uids = list(index.postings(('c', contest_id, None, None)))
+        assert uids == sorted(set(uids))
+        assert set(uids) == {row[0] for row in cursor.execute("SELECT oier_uid FROM Record WHERE contest_id = ?", (contest_id,))}
+    assert list(index.postings(('cp', index.contest_ids[0], '不存在', None))) == []
+
+
+@pytest.mark.parametrize('constraint, expected', [
+    ({'year_range': [2020, None]}, True),
+    ({'contest_type': ['NOI'], 'score_range': [None, None], 'rank_range': None}, True),
+    ({'contest_type': ['NOI'], 'score_range': [100, None]}, False),
+    ({'contest_type': ['NOI'], RESOLVED_KEY: []}, False),
+    ({'year_range': [None, None], 'province': [None]}, False),
+    ({}, False),
+])
+def test_supports(constraint, expected):
+    assert award_index.supports(constraint) is expected
+
+
+@pytest.mark.parametrize('constraint', POSTING_CONSTRAINTS)
+def test_size_counts_merged_postings(cursor, constraint):
+    index = award_index.for_cursor(cursor)
+    contests = cost_model.for_cursor(cursor).matching_contests(constraint)
+    assert index.size(constraint, contests) == sum(len(index.postings(key)) for key in index.keys(constraint, contests))
+
+
+def test_choose_weighs_postings_against_candidates(cursor):
+    model = cost_model.for_cursor(cursor)
+    constraint = {'level_range': ['一等奖']}
+    assert model.choose(constraint, None, 50)[0] == 'postings'
+    assert model.choose(constraint, 3, 100_000)[0] == 'enumerate'
+    assert model.choose(constraint, None, None)[0] == 'scan'
+    assert set(model.choose(constraint, 3, 100_000)[1]) == {'scan', 'enumerate', 'postings'}
+
+
+def test_few_candidates_are_enumerated_instead_of_merging_postings(cursor):
+    names = [row[0] for row in cursor.execute("SELECT name FROM OIer ORDER BY uid LIMIT 2")]
+    # 两个 config 的记录条件不同，不在批量查询中共享 (共享的条件不限于某个 config 的候选集)
+    configs = [{'name': [name], 'records': [{'level_range': [level, '三等奖']}]} for name, level in zip(names, ['一等奖', '二等奖'])]
+    profile = finder_engine.QueryProfile(explain=False)
+    finder_engine.find_candidates(configs[0], cursor, profile)
+    assert [step['mode'] for step in profile.steps][-1] == 'enumerate'
+    profile = finder_engine.QueryProfile(explain=False)
+    finder_engine.find_oiers_batch(configs, cursor, profile)
+    assert 'postings' not in [step['mode'] for step in profile.steps]
+    profile = finder_engine.QueryProfile(explain=False)
+    assert finder_engine.find_candidates({'records': [{'level_range': ['一等奖']}]}, cursor, profile)
+    assert [step['mode'] for step in profile.steps] == ['postings']
@@ -0,0 +1,51 @@
+# test_batch.py
+"""批量查询 (finder_engine.find_oiers_batch 与 /api/search/batch)"""
+import pytest
+
+from bench.parity import random_configs
+from bench.query_catalog import build_catalog
+from utils import finder_engine
+
+
+@pytest.fixture(scope='module')
+def configs(conn):
+    cursor = conn.cursor()
+    return [config for _, config in build_catalog(cursor)] + random_configs(cursor, 32, seed=1)
+
+
+def test_batch_matches_single_queries(cursor, configs):
+    limits = [None if n % 2 else 7 for n in range(len(configs))]
+    results, stats = finder_engine.find_oiers_batch(configs, cursor, limits=limits)
+    assert stats['configs'] == len(configs)
+    assert stats['constraints_unique'] <= stats['constraints_total']
+    for n, (config, limit, rows) in enumerate(zip(configs, limits, results)):
+        expected = finder_engine.find_oiers(config, cursor, limit=limit)
+        assert sorted(row['uid'] for row in rows) == sorted(row['uid'] for row in expected), n
+
+
+def test_shared_constraints_are_evaluated_once(cursor):
+    noi = {'contest_type': ['NOI', 'CTSC'], 'year_range': [2019, None]}
+    configs = [{'records': [noi]}, {'records': [{'year_range': [None, 2019], 'contest_type': ['CTSC', 'NOI', 'NOI']}]},
+               {'records': [noi, {'level_range': ['金牌']}]}]
+    _, stats = finder_engine.find_oiers_batch(configs, cursor)
+    assert (stats['constraints_total'], stats['constraints_unique']) == (4, 3)
+
+
+def test_batch_endpoint(client):
+    response = client.post('/api/search/batch', json={'configs': [
+        {'records': [{'contest_type': ['NOI']}]}, {'yaml': 'records: [{contest_type: [WC]}]'}]})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert len(results) == 2 and all(result['count'] == len(result['oiers']) for result in results)
+
+
+@pytest.mark.parametrize('configs', [
+    [{'records': [{'contest_type': ['NOI']}]}, {'records': [{'year_range': 2020}]}],
+    [{'enroll_year_range': 2020}],
+    [{'yaml': '- 1'}],
+    ['NOI'],
+])
+def test_batch_endpoint_rejects_malformed_items(client, configs):
+    response = client.post('/api/search/batch', json={'configs': configs})
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
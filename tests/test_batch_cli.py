@@ -0,0 +1,53 @@
+# test_batch_cli.py
+"""oierfinder.py 的批量模式：内存副本只用于单进程"""
+import io
+import json
+import sys
+
+import pytest
+
+import oierfinder
+
+
+@pytest.fixture
+def configs(tmp_path):
+    (tmp_path / 'a.yml').write_text('enroll_year_range: [2015, 2016]\n', encoding='utf-8')
+    (tmp_path / 'b.yml').write_text('records:\n  - level_range: [一等奖]\n', encoding='utf-8')
+    return str(tmp_path)
+
+
+def test_memory_mode_runs_single_process(db_file, configs, monkeypatch):
+    monkeypatch.setattr(oierfinder, 'DB_FILE', db_file)
+    out = io.StringIO()
+    oierfinder.run_batch(configs, 1, 'jsonl', db_mode='memory', options={'limit': 5}, out=out)
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [len(result['oiers']) for result in results] == [5, 5]
+    assert not any('error' in result for result in results)
+
+
+def test_memory_mode_rejects_parallel_jobs(db_file, configs, monkeypatch):
+    monkeypatch.setattr(oierfinder, 'DB_FILE', db_file)
+    with pytest.raises(ValueError):
+        oierfinder.run_batch(configs, 2, 'jsonl', db_mode='memory', out=io.StringIO())
+
+
+@pytest.mark.parametrize('argv, jobs', [
+    (['--db-mode', 'memory'], 1),
+    (['--db-mode', 'memory', '-j', '1'], 1),
+    (['-j', '3'], 3),
+])
+def test_jobs_default_follows_db_mode(db_file, configs, monkeypatch, argv, jobs):
+    calls = []
+    monkeypatch.setattr(oierfinder, 'DB_FILE', db_file)
+    monkeypatch.setattr(oierfinder, 'run_batch', lambda source, jobs, *args, **kwargs: calls.append(jobs))
+    monkeypatch.setattr(sys, 'argv', ['oierfinder.py', '--batch', configs] + argv)
+    oierfinder.main()
+    assert calls == [jobs]
+
+
+def test_memory_mode_with_parallel_jobs_is_an_error(db_file, configs, monkeypatch):
+    monkeypatch.setattr(oierfinder, 'DB_FILE', db_file)
+    monkeypatch.setattr(sys, 'argv', ['oierfinder.py', '--batch', configs, '--db-mode', 'memory', '-j', '2'])
+    with pytest.raises(SystemExit) as excinfo:
+        oierfinder.main()
+    assert excinfo.value.code == 2
@@ -0,0 +1,60 @@
+# test_closest_match.py
+"""最接近的匹配 (utils/closest_match.py)"""
+import pytest
+
+from utils import closest_match, finder_engine
+
+# 第二条条件的比赛类型不存在，没有人满足全部条件；none_of 中的省份条件单独计分
+CONFIG = {'records': [
+    {'contest_type': ['NOI'], 'level_range': ['金牌', '银牌', '铜牌']},
+    {'contest_type': ['不存在的比赛']},
+    {'year_range': [2015, 2020], 'level_range': ['一等奖']},
+], 'none_of': [{'province': ['浙江']}]}
+
+
+def unit_members(cursor):
+    """每个计分单位单独求值 (none_of 单位为被排除的人)"""
+    return [finder_engine.find_candidates({'records': [constraint]}, cursor) for constraint in CONFIG['records']] + \
+           [finder_engine.find_candidates({'records': CONFIG['none_of']}, cursor)]
+
+
+@pytest.mark.parametrize('weights', [None, 'rarity'])
+def test_scores_match_per_unit_evaluation(cursor, weights):
+    units, results = closest_match.find_closest(CONFIG, cursor, k=15, weights=weights)
+    members = unit_members(cursor)
+    assert [unit['matches'] for unit in units] == [len(uids) for uids in members]
+    assert [unit['negated'] for unit in units] == [False, False, False, True]
+    assert len(results) == 15
+    for result in results:
+        uid = result['oier']['uid']
+        missed = [i for i, (unit, uids) in enumerate(zip(units, members)) if (uid in uids) == unit['negated']]
+        assert result['missed'] == missed
+        assert result['score'] == pytest.approx(sum(unit['weight'] for i, unit in enumerate(units) if i not in missed))
+    scores = [result['score'] for result in results]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_satisfiable_config_returns_strict_matches_first(cursor):
+    config = {'records': CONFIG['records'][:1]}
+    strict = finder_engine.find_oiers(config, cursor, limit=10)
+    _, results = closest_match.find_closest(config, cursor, k=10)
+    assert [result['oier']['uid'] for result in results] == [row['uid'] for row in strict]
+    assert all(result['missed'] == [] for result in results)
+
+
+def test_invalid_weights_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        closest_match.find_closest(CONFIG, cursor, weights=[1.0])
+
+
+def test_endpoint(client):
+    response = client.get('/api/closest', query_string={'query_type': 'yaml', 'yaml_content': 'enroll_year_range: [2015, 2016]', 'k': '3'})
+    assert response.status_code == 200
+    assert len(response.get_json()['results']) == 3
+
+
+@pytest.mark.parametrize('query', ["records:\n  - year_range: 2020", "enroll_year_range: 2020"])
+def test_endpoint_rejects_malformed_config(client, query):
+    response = client.get('/api/closest', query_string={'query_type': 'yaml', 'yaml_content': query})
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
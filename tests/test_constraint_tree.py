@@ -0,0 +1,49 @@
+# test_constraint_tree.py
+"""条件组的解析 (utils/constraint_tree.py)"""
+import pytest
+
+from utils import constraint_tree
+
+NOI = {'contest_type': ['NOI']}
+CTSC = {'contest_type': ['CTSC']}
+
+
+def test_build_tree_nests_groups():
+    config = {'records': [NOI, {'any_of': [CTSC, {'none_of': [NOI]}]}], 'none_of': [CTSC]}
+    assert constraint_tree.build_tree(config) == ('all_of', [
+        ('leaf', NOI),
+        ('any_of', [('leaf', CTSC), ('none_of', [('leaf', NOI)])]),
+        ('none_of', [('leaf', CTSC)]),
+    ])
+    assert constraint_tree.has_groups(config)
+    assert not constraint_tree.has_groups({'records': [NOI, CTSC]})
+
+
+def test_leaves_marks_negated_conditions():
+    tree = constraint_tree.build_tree({'records': [NOI], 'none_of': [{'any_of': [CTSC]}]})
+    assert list(constraint_tree.leaves(tree)) == [(NOI, False), (CTSC, True)]
+
+
+def test_empty_groups_do_not_constrain():
+    assert constraint_tree.is_empty(constraint_tree.build_tree({}))
+    assert constraint_tree.is_empty(constraint_tree.build_tree({'any_of': [{'none_of': []}]}))
+    # 空的记录条件表示「至少有一条记录」
+    assert not constraint_tree.is_empty(constraint_tree.build_tree({'records': [{}]}))
+
+
+@pytest.mark.parametrize('config', [
+    {'records': NOI},
+    {'records': ['NOI']},
+    {'any_of': [{'all_of': 'NOI'}]},
+])
+def test_malformed_configs_raise_value_error(config):
+    with pytest.raises(ValueError):
+        constraint_tree.build_tree(config)
+
+
+def test_map_leaves_keeps_structure():
+    config = {'records': [NOI, {'any_of': [CTSC]}], 'enroll_year_range': [2015, None]}
+    mapped = constraint_tree.map_leaves(config, lambda constraint: {**constraint, 'province': ['浙江']})
+    assert mapped == {'records': [{**NOI, 'province': ['浙江']}, {'any_of': [{**CTSC, 'province': ['浙江']}]}],
+                      'enroll_year_range': [2015, None]}
+    assert config['records'][0] == NOI
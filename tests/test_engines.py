@@ -0,0 +1,114 @@
+# test_engines.py
+"""
+查询引擎的一致性：finder_engine、columnar_engine 与逐条检查全部记录的朴素实现 (ReferenceEngine) 对同一批 config
+返回相同的结果。config 来自基准查询目录与 bench/parity.py 的随机抽样。
+"""
+from datetime import date
+
+import pytest
+
+try:
+    import numpy as np
+except ImportError:  # numpy 是可选依赖
+    np = None
+
+from bench.parity import random_configs, result_key
+from bench.query_catalog import build_catalog
+from utils import columnar_engine, constraint_tree, finder_engine, snapshot
+
+RANGE_FIELDS = (('year_range', 'year'), ('score_range', 'score'), ('rank_range', 'rank'))
+LIST_FIELDS = (('province', 'province'), ('level_range', 'level'), ('contest_type', 'type'))
+RANDOM_CONFIGS = 150
+
+requires_numpy = pytest.mark.skipif(not columnar_engine.available(), reason="numpy 未安装")
+
+
+class ReferenceEngine:
+    """不用索引、不用集合运算优化，逐条检查每条记录是否满足条件；只支持记录条件、条件组与入学年份/年级"""
+
+    def __init__(self, cursor):
+        self.records = cursor.execute(
+            "SELECT r.oier_uid AS uid, c.year, r.score, r.rank, r.province, r.level, c.type "
+            "FROM Record r JOIN Contest c ON r.contest_id = c.id").fetchall()
+        self.oiers = {row['uid']: row for row in cursor.execute("SELECT * FROM OIer")}
+
+    @staticmethod
+    def matches(constraint, record):
+        for field, column in RANGE_FIELDS:
+            if constraint.get(field):
+                low, high = constraint[field]
+                value = record[column]
+                if low is not None and (value is None or value < low): return False
+                if high is not None and (value is None or value > high): return False
+        for field, column in LIST_FIELDS:
+            if constraint.get(field) and constraint[field][0] is not None and record[column] not in constraint[field]:
+                return False
+        return True
+
+    def evaluate(self, node):
+        """节点限定的 uid 集合；不含任何叶子的条件组不构成限制，返回 None"""
+        kind, payload = node
+        if kind == 'leaf':
+            return {record['uid'] for record in self.records if self.matches(payload, record)}
+        results = [uids for uids in map(self.evaluate, payload) if uids is not None]
+        if not results:
+            return None
+        if kind == 'all_of':
+            return set.intersection(*results)
+        matched = set.union(*results)
+        return matched if kind == 'any_of' else set(self.oiers) - matched
+
+    def oier_matches(self, config, oier):
+        enroll = oier['enroll_middle']
+        low, high = config.get('enroll_year_range') or [None, None]
+        grades = config.get('grade_range') or [None, None]
+        # 当前年级 g 对应的初中入学年份为 今年 - g + 7
+        if grades[1] is not None: low = max(v for v in (low, date.today().year - grades[1] + 7) if v is not None)
+        if grades[0] is not None: high = min(v for v in (high, date.today().year - grades[0] + 7) if v is not None)
+        return (low is None or (enroll is not None and enroll >= low)) and (high is None or (enroll is not None and enroll <= high))
+
+    def find_oiers(self, config, limit=None):
+        uids = self.evaluate(constraint_tree.build_tree(config))
+        rows = [oier for uid, oier in self.oiers.items()
+                if (uids is None or uid in uids) and self.oier_matches(config, oier)]
+        rows.sort(key=lambda row: (-row['oierdb_score'], row['uid']))
+        return rows if limit is None else rows[:limit]
+
+
+@pytest.fixture(scope='module')
+def configs(conn):
+    cursor = conn.cursor()
+    catalog = list(build_catalog(cursor))
+    return catalog + [(f"random_{n}", config) for n, config in enumerate(random_configs(cursor, RANDOM_CONFIGS, seed=0))]
+
+
+@pytest.fixture(scope='module')
+def reference(conn):
+    return ReferenceEngine(conn.cursor())
+
+
+def test_finder_engine_matches_reference(cursor, configs, reference):
+    for name, config in configs:
+        expected = reference.find_oiers(config)
+        assert result_key(finder_engine.find_oiers(config, cursor)) == result_key(expected), name
+
+
+@requires_numpy
+def test_columnar_engine_matches_reference(cursor, configs, reference):
+    for name, config in configs:
+        expected = reference.find_oiers(config)
+        assert result_key(columnar_engine.find_oiers(config, cursor)) == result_key(expected), name
+
+
+@requires_numpy
+def test_columnar_data_from_cursor_matches_snapshot(cursor, configs):
+    """没有快照时从 SQLite 读入的列与快照中的列对每个记录条件给出相同的位图"""
+    from_snapshot = columnar_engine.ColumnarData.from_snapshot(snapshot.for_cursor(cursor))
+    from_cursor = columnar_engine.ColumnarData.from_cursor(cursor)
+    assert (from_snapshot.source, from_cursor.source) == ('snapshot', 'sqlite')
+    for name, config in configs:
+        if not columnar_engine.supports(config):
+            continue
+        for constraint, _ in constraint_tree.leaves(constraint_tree.build_tree(config)):
+            expected = np.flatnonzero(from_snapshot.constraint_bitmap(constraint))
+            assert np.array_equal(np.flatnonzero(from_cursor.constraint_bitmap(constraint)), expected), name
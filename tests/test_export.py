@@ -0,0 +1,77 @@
+# test_export.py
+"""
+/export：ndjson 与 csv 两种格式的流式导出，以及格式错误的条件返回 400 且数据库连接在任何情况下都被关闭。
+"""
+import csv
+import io
+import json
+
+import pytest
+
+import app as app_module
+
+MALFORMED_QUERIES = ("records:\n  - year_range: 2020", "enroll_year_range: 2020", "- 1")
+QUERY = 'enroll_year_range: [2015, 2016]'
+
+
+def export(client, yaml_content, **options):
+    return client.get('/export', query_string={'query_type': 'yaml', 'yaml_content': yaml_content, **options})
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    """记录 /export 打开的每个连接及其是否已关闭"""
+    opened = []
+    open_db = app_module.open_db
+
+    class TrackedConnection:
+        def __init__(self, conn):
+            self.conn, self.closed = conn, False
+
+        def __getattr__(self, name):
+            return getattr(self.conn, name)
+
+        def close(self):
+            self.closed = True
+            self.conn.close()
+
+    def tracked_open_db():
+        opened.append(TrackedConnection(open_db()))
+        return opened[-1]
+
+    monkeypatch.setattr(app_module, 'open_db', tracked_open_db)
+    return opened
+
+
+def test_export_ndjson(client, cursor, connections):
+    response = export(client, QUERY, records='1')
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    expected = cursor.execute("SELECT COUNT(*) FROM OIer WHERE enroll_middle BETWEEN 2015 AND 2016").fetchone()[0]
+    assert len(rows) == expected > 0
+    assert all(2015 <= row['enroll_middle'] <= 2016 and row['records'] for row in rows)
+    response.close()
+    assert [conn.closed for conn in connections] == [True]
+
+
+def test_export_csv_with_limit(client, connections):
+    response = export(client, QUERY, format='csv', limit='5')
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert len(rows) == 5
+    response.close()
+    assert [conn.closed for conn in connections] == [True]
+
+
+@pytest.mark.parametrize('query', MALFORMED_QUERIES)
+def test_export_malformed_config(client, connections, query):
+    response = export(client, query)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+    assert all(conn.closed for conn in connections)
+
+
+def test_export_unknown_format(client, connections):
+    response = export(client, QUERY, format='xml')
+    assert response.status_code == 400
+    assert connections == []
@@ -0,0 +1,27 @@
+# test_metrics.py
+"""/metrics：ETag 与查询计划缓存的命中次数"""
+import re
+
+from utils import query_plan
+
+FORM = {'query_type': 'yaml', 'yaml_content': 'enroll_year_range: [2015, 2016]'}
+
+
+def sample(text, name, **labels):
+    label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf'^{name}\{{{re.escape(label_text)}\}} (\S+)$', text, re.M)
+    return float(match.group(1)) if match else None
+
+
+def test_plan_cache_is_exported(client):
+    url = client.post('/search', data=FORM).headers['Location']
+    response = client.get(url)
+    client.get(url, headers={'If-None-Match': response.headers['ETag']})
+    text = client.get('/metrics').get_data(as_text=True)
+    info = query_plan.cache_info()
+    for cache, key in (('plan', 'plans'), ('plan_step', 'steps')):
+        assert sample(text, 'oierfinder_cache_requests_total', cache=cache, result='hit') == info[key]['hits']
+        assert sample(text, 'oierfinder_cache_requests_total', cache=cache, result='miss') == info[key]['misses']
+        assert sample(text, 'oierfinder_cache_entries', cache=cache) == info[key]['size']
+    assert info['plans']['hits'] + info['plans']['misses'] > 0
+    assert sample(text, 'oierfinder_cache_requests_total', cache='etag', result='hit') >= 1
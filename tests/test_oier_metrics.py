@@ -0,0 +1,36 @@
+# test_oier_metrics.py
+"""派生指标表 (utils/oier_metrics.py) 与 metrics 条件"""
+import pytest
+
+from utils import finder_engine, oier_metrics
+
+
+def test_metrics_match_record_aggregates(cursor):
+    expected = {row[0]: tuple(row[1:]) for row in cursor.execute(
+        "SELECT o.uid, COUNT(r.oier_uid), MIN(c.year), "
+        "COUNT(CASE WHEN c.type = 'NOI' AND r.level = '金牌' THEN 1 END), "
+        "COUNT(CASE WHEN c.type IN ('NOIP', 'NOIP提高') AND r.level = '一等奖' THEN 1 END) "
+        "FROM OIer o LEFT JOIN Record r ON r.oier_uid = o.uid LEFT JOIN Contest c ON r.contest_id = c.id GROUP BY o.uid")}
+    actual = {row[0]: tuple(row[1:]) for row in cursor.execute(
+        f"SELECT uid, record_count, first_year, noi_gold, noip_first FROM {oier_metrics.TABLE}")}
+    assert actual == expected
+
+
+def test_metrics_condition_matches_record_condition(cursor):
+    by_metrics = finder_engine.find_candidates({'metrics': {'noi_best': [2, None]}}, cursor)
+    by_records = finder_engine.find_candidates(
+        {'records': [{'contest_type': ['NOI'], 'level_range': ['金牌', '银牌']}]}, cursor)
+    assert by_metrics == by_records and by_metrics
+
+
+def test_order_by_metric_column(cursor):
+    rows = finder_engine.find_oiers({}, cursor, limit=20, order_by='noip_first')
+    counts = dict(cursor.execute(f"SELECT uid, noip_first FROM {oier_metrics.TABLE}").fetchall())
+    keys = [(-counts[row['uid']], row['uid']) for row in rows]
+    assert keys == sorted(keys) == sorted((-count, uid) for uid, count in counts.items())[:20]
+
+
+@pytest.mark.parametrize('metrics', [{'no_such_column': [1, None]}, {'noi_best': 2}, ['noi_best']])
+def test_invalid_metrics_are_rejected(cursor, metrics):
+    with pytest.raises(ValueError):
+        finder_engine.find_candidates({'metrics': metrics}, cursor)
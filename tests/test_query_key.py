@@ -0,0 +1,48 @@
+# test_query_key.py
+"""config 的规范形式与 URL 编码 (utils/query_key.py)"""
+import pytest
+
+from utils import query_key
+
+
+def test_equivalent_configs_share_a_key():
+    first = {'records': [{'contest_type': ['NOI', 'CTSC', 'NOI'], 'year_range': [2020, 2021], 'province': None}],
+             'grade_range': [None, None], 'enroll_year_range': [2015, None]}
+    second = {'enroll_year_range': [2015, None],
+              'records': [{'year_range': [2020, 2021], 'contest_type': ['CTSC', 'NOI'], 'level_range': [None]}]}
+    assert query_key.canonical_config(first) == {
+        'enroll_year_range': [2015, None],
+        'records': [{'contest_type': ['CTSC', 'NOI'], 'year_range': [2020, 2021]}],
+    }
+    assert query_key.config_hash(first) == query_key.config_hash(second)
+    assert query_key.encode_config(first) == query_key.encode_config(second)
+
+
+def test_record_order_and_empty_constraints_are_kept():
+    noi, ctsc = {'contest_type': ['NOI']}, {'contest_type': ['CTSC']}
+    assert query_key.canonical_config({'records': [noi, ctsc]}) != query_key.canonical_config({'records': [ctsc, noi]})
+    assert query_key.canonical_config({'records': [{}]}) == {'records': [{}]}
+    assert query_key.canonical_config({'records': [], 'any_of': None}) == {}
+
+
+def test_metrics_ranges_are_canonical():
+    config = {'metrics': {'noi_best': [2, None], 'first_year': [None, None]}}
+    assert query_key.canonical_config(config) == {'metrics': {'noi_best': [2, None]}}
+    assert query_key.canonical_config({'metrics': {'first_year': [None, None]}}) == {}
+
+
+@pytest.mark.parametrize('config', [
+    {},
+    {'name': '张三', 'records': [{'province': ['浙江'], 'level_range': ['一等奖']}]},
+    {'records': [{'any_of': [{'contest_type': ['NOI']}, {'none_of': [{'year_range': [2019, None]}]}]}]},
+])
+def test_encode_round_trip(config):
+    encoded = query_key.encode_config(config)
+    assert '=' not in encoded
+    assert query_key.decode_config(encoded) == query_key.canonical_config(config)
+
+
+@pytest.mark.parametrize('text', ['', 'not-base64!', query_key.encode_config({})[:-2] + 'xx'])
+def test_decode_rejects_invalid_input(text):
+    with pytest.raises(ValueError):
+        query_key.decode_config(text)
@@ -0,0 +1,82 @@
+# test_replica.py
+"""内存副本 (utils/replica.py) 与各处按数据版本缓存的旁路文件"""
+import shutil
+import sqlite3
+
+import pytest
+
+from utils import cost_model, replica, similarity, snapshot
+from utils.db_meta import write_meta
+
+
+def copy_database(db_file, directory, data_version, sidecars=()):
+    """复制数据库 (及指定的旁路文件)，并改写数据版本，使各处缓存把它当作另一份数据"""
+    path = str(directory / 'copy.db')
+    shutil.copy(db_file, path)
+    for suffix in sidecars:
+        shutil.copy(db_file + suffix, path + suffix)
+    conn = sqlite3.connect(path)
+    write_meta(conn.cursor(), {'data_version': data_version})
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_replica_answers_queries_and_reloads(db_file, tmp_path):
+    path = copy_database(db_file, tmp_path, 'replica-test', (snapshot.SNAPSHOT_SUFFIX,))
+    # 快照按数据版本校验，复制后重新生成
+    conn = sqlite3.connect(path)
+    snapshot.build(conn.cursor(), snapshot.snapshot_path(path), 'replica-test')
+    conn.close()
+
+    current = replica.Replica(path)
+    try:
+        conn = current.connect()
+        assert conn.execute("SELECT COUNT(*) FROM OIer").fetchone()[0] > 0
+        loaded = snapshot.for_cursor(conn.cursor())
+        assert loaded is not None and loaded.in_memory
+        conn.close()
+        assert not current.reload_if_changed()
+
+        # 只更新校准版本时重新加载副本，但同一数据版本的快照不再重复读入内存
+        disk = sqlite3.connect(path)
+        write_meta(disk.cursor(), {'calibration_version': 'recalibrated'})
+        disk.commit()
+        disk.close()
+        assert current.reload_if_changed() and current.reloads == 1
+        conn = current.connect()
+        assert snapshot.for_cursor(conn.cursor()) is loaded
+        assert list(snapshot._SNAPSHOTS) == ['replica-test']
+        conn.close()
+    finally:
+        current.close()
+
+
+def test_missing_sidecars_are_picked_up_once_written(db_file, tmp_path):
+    path = copy_database(db_file, tmp_path, 'late-sidecar')
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    assert snapshot.for_cursor(cursor) is None
+    assert snapshot.for_cursor(cursor) is None
+    snapshot.build(cursor, snapshot.snapshot_path(path), 'late-sidecar')
+    assert snapshot.for_cursor(cursor) is not None
+    if similarity.available():
+        assert similarity.for_cursor(cursor) is None
+        similarity.build(cursor, similarity.index_path(path), 'late-sidecar')
+        assert similarity.for_cursor(cursor) is not None
+        assert list(similarity._INDEXES) == ['late-sidecar']
+    conn.close()
+
+
+def test_caches_keep_only_the_current_version(conn, db_file, tmp_path):
+    assert snapshot.for_cursor(conn.cursor()) is not None
+    cost_model.for_cursor(conn.cursor())
+    path = copy_database(db_file, tmp_path, 'other-version', (snapshot.SNAPSHOT_SUFFIX,))
+    other = sqlite3.connect(path)
+    # 旁路文件的数据版本与复制后的数据库不一致，不使用也不缓存
+    assert snapshot.for_cursor(other.cursor()) is None
+    cost_model.for_cursor(other.cursor())
+    assert len(cost_model._MODELS) == 1
+    other.close()
+    assert snapshot.for_cursor(conn.cursor()) is not None
+    assert len(snapshot._SNAPSHOTS) == 1
@@ -0,0 +1,49 @@
+# test_search.py
+"""/search：POST 重定向到规范 GET 地址、ETag 与 304，以及按需显示的查询执行分析"""
+import pytest
+
+from utils import finder_engine
+
+FORM = {'query_type': 'yaml', 'yaml_content': 'enroll_year_range: [2015, 2016]', 'order_by': 'oierdb_score', 'limit': '20'}
+
+
+@pytest.fixture
+def explain_calls(monkeypatch):
+    calls = []
+    explain_query_plan = finder_engine.explain_query_plan
+
+    def counting(*args):
+        calls.append(args[1])
+        return explain_query_plan(*args)
+
+    monkeypatch.setattr(finder_engine, 'explain_query_plan', counting)
+    return calls
+
+
+def search(client, **form):
+    response = client.post('/search', data=dict(FORM, **form))
+    assert response.status_code == 303
+    return response.headers['Location']
+
+
+def test_search_is_cacheable_without_profile(client, explain_calls):
+    url = search(client)
+    assert 'profile' not in url
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'].startswith('public')
+    assert '查询执行分析' not in response.get_data(as_text=True)
+    assert explain_calls == []
+    assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_profile_is_opt_in_and_not_shared(client, explain_calls):
+    url = search(client, profile='1')
+    assert 'profile=1' in url
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-store'
+    assert '查询执行分析' in response.get_data(as_text=True)
+    assert explain_calls
+    plain = client.get(search(client))
+    assert plain.headers['ETag'] != response.headers['ETag']
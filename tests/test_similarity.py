@@ -0,0 +1,43 @@
+# test_similarity.py
+"""相似 OIer 检索 (utils/similarity.py)"""
+from collections import defaultdict
+
+import pytest
+
+from utils import similarity
+
+pytestmark = pytest.mark.skipif(not similarity.available(), reason="numpy 未安装，数据库未生成相似度索引")
+
+
+@pytest.fixture(scope='module')
+def tokens(conn):
+    uids, token_ids, _ = similarity.award_tokens(conn.cursor())
+    tokens = defaultdict(set)
+    for uid, token_id in zip(uids, token_ids):
+        tokens[uid].add(token_id)
+    return tokens
+
+
+def test_index_stores_deduplicated_tokens(cursor, tokens):
+    index = similarity.for_cursor(cursor)
+    assert index is not None
+    for uid in list(tokens)[:200]:
+        assert list(index.token_ids(uid)) == sorted(tokens[uid])
+
+
+def test_similar_returns_exact_jaccard_in_order(cursor, tokens):
+    busiest = sorted(tokens, key=lambda uid: (-len(tokens[uid]), uid))[:10]
+    for uid in busiest:
+        matches = similarity.similar(cursor, uid, k=5)
+        assert matches and all(match['oier']['uid'] != uid for match in matches)
+        keys = []
+        for match in matches:
+            other = tokens[match['oier']['uid']]
+            assert match['jaccard'] == pytest.approx(len(tokens[uid] & other) / len(tokens[uid] | other))
+            assert len(match['shared']) == len(tokens[uid] & other)
+            keys.append((-match['jaccard'], match['oier']['uid']))
+        assert keys == sorted(keys)
+
+
+def test_unknown_uid_has_no_matches(cursor):
+    assert similarity.similar(cursor, 10**9) == []
@@ -0,0 +1,23 @@
+# test_snapshot.py
+"""只读快照 (utils/snapshot.py)"""
+from utils import snapshot
+from utils.db_meta import get_data_version
+
+
+def test_snapshot_matches_database(cursor, db_file):
+    snap = snapshot.for_cursor(cursor)
+    assert snap is not None and snap.data_version == get_data_version(cursor)
+    assert [row[0] for row in snap.catalog['contests']] == [row[0] for row in cursor.execute("SELECT id FROM Contest ORDER BY id")]
+    assert len(snap.view('record_oier_uid')) == cursor.execute("SELECT COUNT(*) FROM Record").fetchone()[0]
+
+    copy = snapshot.open_snapshot(snapshot.snapshot_path(db_file), in_memory=True)
+    for row in snap.catalog['contests'][:20]:
+        key = ('c', row[0], None, None)
+        assert list(copy.postings(key)) == list(snap.postings(key))
+        assert list(snap.postings(key)) == [uid for (uid,) in cursor.execute(
+            "SELECT DISTINCT oier_uid FROM Record WHERE contest_id = ? ORDER BY oier_uid", (row[0],))]
+
+
+def test_open_snapshot_rejects_missing_or_foreign_files(db_file, tmp_path):
+    assert snapshot.open_snapshot(str(tmp_path / 'missing.snapshot')) is None
+    assert snapshot.open_snapshot(db_file) is None
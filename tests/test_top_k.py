@@ -0,0 +1,46 @@
+# test_top_k.py
+"""按排序列取前 K 名 (finder_engine.fetch_ranked / iter_ranked)"""
+import pytest
+
+from bench.parity import random_configs
+from bench.query_catalog import build_catalog
+from utils import columnar_engine, finder_engine
+
+
+@pytest.fixture(scope='module')
+def configs(conn):
+    cursor = conn.cursor()
+    return [config for _, config in build_catalog(cursor)] + random_configs(cursor, 24, seed=2)
+
+
+@pytest.mark.parametrize('order_by', ['oierdb_score', 'ccf_score', 'enroll_middle'])
+@pytest.mark.parametrize('limit', [1, 10, 300])
+def test_limit_returns_top_rows_in_order(cursor, configs, order_by, limit):
+    for n, config in enumerate(configs):
+        full = finder_engine.find_oiers(config, cursor, order_by=order_by)
+        top = finder_engine.find_oiers(config, cursor, limit=limit, order_by=order_by)
+        assert [row['uid'] for row in top] == [row['uid'] for row in full[:limit]], n
+        if columnar_engine.available():
+            columnar = columnar_engine.find_oiers(config, cursor, limit=limit, order_by=order_by)
+            assert [row['uid'] for row in columnar] == [row['uid'] for row in top], n
+
+
+def test_full_results_follow_the_order_column(cursor, configs):
+    for config in configs:
+        rows = finder_engine.find_oiers(config, cursor)
+        keys = [finder_engine._rank_key(row['oierdb_score'], row['uid']) for row in rows]
+        assert keys == sorted(keys)
+
+
+def test_iter_ranked_streams_the_same_rows(cursor, configs):
+    for config in configs[:10]:
+        candidates = finder_engine.find_candidates(config, cursor)
+        expected = [row['uid'] for row in finder_engine.find_oiers(config, cursor, limit=120)]
+        batches = list(finder_engine.iter_ranked(cursor, candidates, 120, batch_size=50))
+        assert all(len(batch) <= 50 for batch in batches)
+        assert [row['uid'] for batch in batches for row in batch] == expected
+
+
+def test_unknown_order_column_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        finder_engine.find_oiers({}, cursor, order_by='uid; DROP TABLE OIer')
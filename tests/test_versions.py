@@ -0,0 +1,63 @@
+# test_versions.py
+"""每个查询只读一次 Meta 表：查询入口读取 db_meta.Versions 后传给各 for_cursor"""
+import sqlite3
+
+import pytest
+
+from utils import admission, closest_match, columnar_engine, db_meta, finder_engine
+
+# 同时经过学校目录、全文检索、代价模型与倒排索引
+CONFIG = {'enroll_year_range': [2012, 2018], 'name': ['张'],
+          'records': [{'school': ['一中'], 'level_range': ['一等奖']}, {'year_range': [2015, 2020]}]}
+
+
+@pytest.fixture
+def meta_reads(db_file):
+    conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    statements = []
+    conn.set_trace_callback(statements.append)
+    yield conn, lambda: sum('FROM Meta' in statement for statement in statements)
+    conn.close()
+
+
+def test_read_versions_matches_getters(cursor):
+    versions = db_meta.read_versions(cursor)
+    assert versions == (db_meta.get_data_version(cursor), db_meta.get_calibration_version(cursor))
+    assert versions.data
+
+
+@pytest.mark.parametrize('engine', [finder_engine, columnar_engine])
+def test_query_reads_meta_once(meta_reads, engine):
+    conn, count = meta_reads
+    for _ in range(2):
+        before = count()
+        admission.run(engine, CONFIG, conn.cursor(), limit=10)
+        assert count() - before == 1
+
+
+def test_closest_and_batch_read_meta_once(meta_reads):
+    conn, count = meta_reads
+    before = count()
+    closest_match.find_closest(CONFIG, conn.cursor(), k=5)
+    assert count() - before == 1
+    before = count()
+    finder_engine.find_oiers_batch([CONFIG, {'records': CONFIG['records'][1:]}], conn.cursor(), limits=[5, 5])
+    assert count() - before == 1
+
+
+def test_search_request_reads_meta_once(client, db_file, monkeypatch):
+    import app as app_module
+    counts = []
+    open_db = app_module.open_db
+
+    def traced_open_db():
+        conn = open_db()
+        counts.append(0)
+        conn.set_trace_callback(lambda statement: counts.__setitem__(-1, counts[-1] + ('FROM Meta' in statement)))
+        return conn
+
+    monkeypatch.setattr(app_module, 'open_db', traced_open_db)
+    url = client.post('/search', data={'query_type': 'yaml', 'yaml_content': 'records:\n  - school: [一中]'}).headers['Location']
+    assert client.get(url).status_code == 200
+    assert counts[-1] == 1
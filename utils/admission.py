@@ -0,0 +1,205 @@
+# admission.py
+"""
+查询准入控制：执行前用代价模型估计查询的耗时与结果人数，超出预算时拒绝或降级，执行时限制 SQLite 语句的总耗时。
+
+    max_cost_ms   求候选集 (各记录条件的扫描/枚举) 的估计耗时上限，超出时拒绝 (QueryRejected)
+    max_rows      一次返回的最多人数；未限制人数或 limit 更大时降级为只取排序后的前 max_rows 名 (top-K)
+    timeout_ms    执行时间上限，由 SQLite 的 progress handler 中断正在执行的语句 (QueryTimeout)
+
+各入口使用不同的预算：web 服务 (app.py，可用环境变量调整) 较严格，命令行默认不限制 (可用参数指定)。
+与 Worker 的 MINIMUM_QUERY_STRENGTH 不同，这里不拒绝「条件太弱」的查询本身：结果人数多的查询降级为 top-K 后
+代价很低，只有求候选集本身太贵的查询才会被拒绝。
+"""
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from utils import award_index, constraint_tree, cost_model, finder_engine, school_catalog, text_search
+from utils.db_meta import read_versions
+
+# 取出一行 OIer 完整数据的代价 (微秒)，在参考机器上测得
+FETCH_ROW_US = 3.0
+# 姓名/首字母/学校条件的估计命中人数 (全文索引查询本身的代价可忽略)
+SEARCH_ESTIMATE = 1000
+# progress handler 每执行多少条虚拟机指令检查一次时间
+PROGRESS_STEPS = 10_000
+
+
+class QueryRejected(ValueError):
+    """估计代价超出预算，查询未执行"""
+
+
+class QueryTimeout(ValueError):
+    """查询执行超过时间上限，已被中断"""
+
+
+class Budget:
+    """某个入口的查询预算；各项为 None 表示不限制"""
+
+    def __init__(self, max_cost_ms=None, max_rows=None, timeout_ms=None):
+        self.max_cost_ms = max_cost_ms
+        self.max_rows = max_rows
+        self.timeout_ms = timeout_ms
+
+    def __repr__(self):
+        return f"Budget(max_cost_ms={self.max_cost_ms}, max_rows={self.max_rows}, timeout_ms={self.timeout_ms})"
+
+
+UNLIMITED = Budget()
+
+
+class Estimate:
+    """
+    查询的代价估计：求候选集耗时、取结果耗时 (毫秒) 与结果人数。
+    steps 为按求值顺序的各步骤估计，每项含 kind (search / oier_filter / record)、mode、cost_ms、
+    matches (该条件单独命中的人数) 与 survivors (执行到该步骤后剩余的人数)，记录条件另含 constraint。
+    """
+
+    def __init__(self, eval_ms, rows, fetch_row_us=FETCH_ROW_US, steps=None):
+        self.eval_ms = eval_ms
+        self.rows = rows
+        self.fetch_row_us = fetch_row_us
+        self.steps = steps or []
+
+    def fetch_ms(self, limit=None):
+        rows = self.rows if limit is None else min(self.rows, limit)
+        return rows * self.fetch_row_us / 1000
+
+    def total_ms(self, limit=None):
+        return self.eval_ms + self.fetch_ms(limit)
+
+    def to_dict(self, limit=None):
+        return {'eval_ms': round(self.eval_ms, 3), 'fetch_ms': round(self.fetch_ms(limit), 3),
+                'total_ms': round(self.total_ms(limit), 3), 'rows': round(self.rows),
+                'steps': [{**step, 'cost_ms': round(step['cost_ms'], 3), 'matches': round(step['matches']),
+                           'survivors': round(step['survivors'])} for step in self.steps]}
+
+
+class _Estimator:
+    """按 finder_engine.ConstraintEvaluator 的求值顺序模拟执行，累计估计代价 (微秒) 与人数"""
+
+    def __init__(self, cursor, versions):
+        self.model = cost_model.for_cursor(cursor, versions)
+        self.index = award_index.for_cursor(cursor, versions)
+        self.total = max(self.model.oier_count, 1)
+        self.cost_us = 0.0
+        self.steps = []
+
+    def add_step(self, kind, mode, cost_us, matches, survivors, **extra):
+        self.cost_us += cost_us
+        self.steps.append({'kind': kind, 'mode': mode, 'cost_ms': cost_us / 1000,
+                           'matches': matches, 'survivors': survivors, **extra})
+
+    def leaf(self, constraint, candidates, damping=1.0):
+        """damping < 1 时按「指数退避」放宽选择率 (同一个人的各条记录高度相关，直接相乘会严重低估人数)"""
+        if candidates is not None and candidates < 1:
+            return 0.0
+        # 与 finder_engine.ConstraintEvaluator.leaf 的选择相同
+        postings = finder_engine.postings_size(constraint, self.index, self.model)
+        mode, costs = self.model.choose(constraint, None if candidates is None else int(candidates), postings)
+        cost_us = costs[mode]
+        matches = self.model.estimate_oiers(constraint)
+        survivors = (matches / self.total) ** damping * (self.total if candidates is None else candidates)
+        self.add_step('record', mode, cost_us, matches, survivors, constraint=constraint)
+        return survivors
+
+    def node(self, node, candidates, damping=1.0):
+        kind, payload = node
+        if kind == 'leaf':
+            return self.leaf(payload, candidates, damping)
+        children = [child for child in payload if not constraint_tree.is_empty(child)]
+        if kind == 'any_of':
+            pool = self.total if candidates is None else candidates
+            return min(sum(self.node(child, candidates) for child in children), pool)
+        if kind == 'none_of':
+            pool = self.total if candidates is None else candidates
+            if candidates is None:
+                self.add_step('all_oiers', 'filter', self.total * self.model.constants['scan_row_us'], self.total, self.total)
+            return max(pool - self.node(('any_of', children), pool), 0.0)
+        positive = sorted((c for c in children if c[0] != 'none_of'), key=self.size)
+        for i, child in enumerate(positive):
+            candidates = self.node(child, candidates, 0.5 ** i)
+        for child in children:
+            if child[0] == 'none_of':
+                candidates = self.node(child, candidates)
+        return candidates
+
+    def size(self, node):
+        """与 ConstraintEvaluator.estimate 相同的排序键"""
+        kind, payload = node
+        if kind == 'leaf': return self.model.estimate_scan_rows(payload)
+        if kind == 'any_of': return sum(self.size(child) for child in payload)
+        if kind == 'all_of': return min((self.size(child) for child in payload if child[0] != 'none_of'), default=float('inf'))
+        return float('inf')
+
+
+def estimate(config, cursor, versions=None):
+    """
+    估计 config 的代价；只使用代价模型的统计信息 (统计立方体、倒排表的规模)，不读取 Record 表。
+    入学年份/年级条件直接对 OIer 表计数 (有索引，代价很低)。versions 见 finder_engine.find_oiers。
+    """
+    versions = versions or read_versions(cursor)
+    config = school_catalog.resolve_config(cursor, config or {}, versions)
+    estimator = _Estimator(cursor, versions)
+    candidates = None
+    if text_search.has_search_conditions(config):
+        candidates = float(SEARCH_ESTIMATE)
+        estimator.add_step('search', 'search', 0.0, candidates, candidates)
+    oier_conditions, oier_values = finder_engine.build_oier_conditions(config)
+    if oier_conditions:
+        count = cursor.execute(f"SELECT COUNT(*) FROM OIer WHERE {' AND '.join(oier_conditions)}", oier_values).fetchone()[0]
+        candidates = float(count) if candidates is None else candidates * count / estimator.total
+        estimator.add_step('oier_filter', 'filter', 0.0, count, candidates)
+    tree = constraint_tree.build_tree(config)
+    if not constraint_tree.is_empty(tree):
+        candidates = estimator.node(tree, candidates)
+    rows = estimator.total if candidates is None else candidates
+    return Estimate(estimator.cost_us / 1000, rows, steps=estimator.steps)
+
+
+def decide(estimated, budget, limit=None):
+    """
+    按预算决定如何执行：返回 (实际使用的 limit, 决定)。决定为 'run' 或 'top_k' (结果人数超过 max_rows，降级为前 max_rows 名)。
+    估计的求候选集耗时超过 max_cost_ms 时抛出 QueryRejected。
+    """
+    if budget.max_cost_ms is not None and estimated.eval_ms > budget.max_cost_ms:
+        raise QueryRejected(f"查询估计耗时 {estimated.eval_ms:.0f} ms，超过上限 {budget.max_cost_ms} ms，请增加限制条件 "
+                            f"(例如比赛年份、比赛类型或奖项)")
+    if budget.max_rows is not None and (limit is None or limit > budget.max_rows) and estimated.rows > budget.max_rows:
+        return budget.max_rows, 'top_k'
+    return limit, 'run'
+
+
+def admit(config, cursor, budget, limit=None, versions=None):
+    """估计 config 的代价并按预算决定如何执行，返回 (实际使用的 limit, 决定, 估计)，见 decide"""
+    estimated = estimate(config, cursor, versions)
+    limit, decision = decide(estimated, budget, limit)
+    return limit, decision, estimated
+
+
+@contextmanager
+def deadline(conn, timeout_ms):
+    """在 with 块内限制该连接上 SQLite 语句的总执行时间，超时时中断语句并抛出 QueryTimeout"""
+    if timeout_ms is None:
+        yield
+        return
+    expires = time.perf_counter() + timeout_ms / 1000
+    conn.set_progress_handler(lambda: 1 if time.perf_counter() > expires else 0, PROGRESS_STEPS)
+    try:
+        yield
+    except sqlite3.OperationalError as e:
+        if time.perf_counter() > expires and 'interrupted' in str(e):
+            raise QueryTimeout(f"查询超过时间上限 {timeout_ms} ms，已中断") from e
+        raise
+    finally:
+        conn.set_progress_handler(None, 0)
+
+
+def run(engine, config, cursor, budget=UNLIMITED, profile=None, limit=None, order_by=finder_engine.DEFAULT_ORDER_BY,
+        versions=None):
+    """准入检查后在时间上限内执行查询，返回 (结果, 实际使用的 limit, 决定)；估计与执行共用一次读取的 versions"""
+    versions = versions or read_versions(cursor)
+    limit, decision, _ = admit(config, cursor, budget, limit, versions)
+    with deadline(cursor.connection, budget.timeout_ms):
+        results = engine.find_oiers(config, cursor, profile=profile, limit=limit, order_by=order_by, versions=versions)
+    return results, limit, decision
@@ -0,0 +1,74 @@
+# award_index.py
+"""
+奖项倒排索引：把 (比赛)、(比赛, 奖项)、(比赛, 省份)、(比赛, 省份, 奖项) 映射到有序的 uid 倒排表。
+倒排表保存在 create_db.py 生成的快照 (<db>.snapshot) 中，见 utils/snapshot.py。
+
+只由 year_range / contest_type / level_range / province 组成的记录条件 (洛谷导入的条件全部属于此类)
+可以直接由倒排表的并集回答，不再读取 Record 表；含分数、名次条件时仍由 SQL 处理。
+"""
+from utils import snapshot as snapshot_module
+from utils.school_catalog import RESOLVED_KEY
+
+POSTING_KEYS = {'year_range', 'contest_type', 'level_range', 'province'}
+
+
+class AwardIndex:
+    """快照中倒排表的查询接口；倒排表是指向 mmap 映射区的零拷贝视图"""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.data_version = snapshot.data_version
+        self.contest_ids = [row[0] for row in snapshot.catalog['contests']]
+
+    def postings(self, key):
+        """返回某个键的有序 uid 序列，键不存在时为空"""
+        return self.snapshot.postings(key)
+
+    def keys(self, constraint, contest_ids):
+        """条件涉及的各倒排表的键。contest_ids 为匹配的比赛，None 表示不限比赛"""
+        if contest_ids is None:
+            contest_ids = self.contest_ids
+        levels = constraint.get('level_range')
+        levels = levels if levels and levels[0] is not None else [None]
+        provinces = constraint.get('province')
+        provinces = provinces if provinces and provinces[0] is not None else [None]
+        kind = 'c' + ('p' if provinces[0] is not None else '') + ('l' if levels[0] is not None else '')
+        return [(kind, contest_id, province, level)
+                for contest_id in contest_ids for province in provinces for level in levels]
+
+    def lookup(self, constraint, contest_ids):
+        """条件对应的 uid 集合 (各比赛倒排表的并集)"""
+        uids = set()
+        for key in self.keys(constraint, contest_ids):
+            uids.update(self.postings(key))
+        return uids
+
+    def size(self, constraint, contest_ids):
+        """lookup 需要合并的 uid 总数，由倒排表目录中的长度相加得到，供代价模型与扫描/枚举比较"""
+        return sum(self.snapshot.posting_count(key) for key in self.keys(constraint, contest_ids))
+
+
+def _constrained_keys(constraint):
+    """
+    实际构成限制的键：取值为 None、空列表或全为 None 的列表的键不限制 (UI 表单的条件总带有这些空键)；
+    学校解析结果 school_ids 为空列表时表示没有匹配的学校，仍是限制。
+    """
+    return {key for key, value in constraint.items()
+            if key == RESOLVED_KEY or not (value is None or (isinstance(value, (list, tuple)) and all(v is None for v in value)))}
+
+
+def supports(constraint):
+    """条件能否只用倒排索引回答：不含分数/名次，且至少限制了年份、比赛类型、奖项或省份中的一项"""
+    keys = _constrained_keys(constraint) if constraint else set()
+    if not keys or not keys <= POSTING_KEYS:
+        return False
+    if any(v is not None for v in constraint.get('year_range') or []):
+        return True
+    return any(constraint.get(field) and constraint[field][0] is not None
+               for field in ('contest_type', 'level_range', 'province'))
+
+
+def for_cursor(cursor, versions=None):
+    """返回与当前数据库版本一致的倒排索引；没有快照或版本不一致时返回 None。versions 见 snapshot.for_cursor"""
+    snapshot = snapshot_module.for_cursor(cursor, versions)
+    return None if snapshot is None else AwardIndex(snapshot)
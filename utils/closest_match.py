@@ -0,0 +1,188 @@
+# closest_match.py
+"""
+最接近的匹配：洛谷导入或手写的 config 常有一两条条件因数据错误、比赛更名或奖项映射缺失而无人满足，
+严格的「且」查询 (finder_engine.find_oiers) 因此没有结果。这里统计每个 uid 满足了哪些条件，
+按满足条件的权重之和返回前 k 名，并给出每人未满足的条件。
+
+计分单位为 config 中「且」关系的各项：records 中的每一项 (记录条件或 any_of 组)，all_of 组展开为其中的各项，
+none_of 组的每个子条件各为一项 (不满足该子条件即得分)。
+姓名/首字母/学校与入学年份/年级条件仍是必须满足的过滤条件。
+
+每个单位只完整求值一次 (倒排索引或一次 SQL 扫描，见 finder_engine.ConstraintEvaluator)，不按 uid 逐个检查；
+得分在按 uid 下标的数组上累加 (安装 numpy 时为向量化的下标加法，否则逐个累加)。
+候选为至少满足一个正向条件的 uid，得分相同时按 order_by 排序。
+"""
+import heapq
+import math
+import time
+
+try:
+    import numpy as np
+except ImportError:  # numpy 是可选依赖
+    np = None
+
+from utils import constraint_tree, finder_engine, query_plan, school_catalog
+from utils.db_meta import read_versions
+
+DEFAULT_K = 20
+WEIGHTINGS = ('uniform', 'rarity')
+
+
+def scoring_units(node):
+    """把条件树根节点下「且」关系的各项展开为计分单位，依次产出节点"""
+    for child in node[1]:
+        if constraint_tree.is_empty(child):
+            continue
+        if child[0] == 'all_of':
+            yield from scoring_units(child)
+        elif child[0] == 'none_of':
+            for negated in child[1]:
+                if not constraint_tree.is_empty(negated):
+                    yield 'none_of', [negated]
+        else:
+            yield child
+
+
+def describe(node):
+    """计分单位对应的条件 (叶子为 query_plan.BoundStep；与 config 中的写法相同，去掉解析学校时加入的键)"""
+    kind, payload = node
+    if kind == 'leaf':
+        return {key: value for key, value in payload.constraint.items() if key != school_catalog.RESOLVED_KEY}
+    return {kind: [describe(child) for child in payload]}
+
+
+def unit_weights(weights, units, oier_count):
+    """
+    各计分单位的权重。weights 为 None / 'uniform' 时均为 1；
+    'rarity' 时为 log(总人数 / 满足人数)，满足的人越少的条件权重越高；也可以直接给出与单位一一对应的数值列表。
+    """
+    if weights is None or weights == 'uniform':
+        return [1.0] * len(units)
+    if weights == 'rarity':
+        result = []
+        for negated, uids in units:
+            matched = oier_count - len(uids) if negated else len(uids)
+            result.append(math.log((oier_count + 1) / (matched + 1)))
+        return result
+    if isinstance(weights, str) or len(weights) != len(units):
+        raise ValueError(f"weights 必须是 {' / '.join(WEIGHTINGS)} 或与 {len(units)} 个条件一一对应的数值列表")
+    return [float(w) for w in weights]
+
+
+def _split(scores, k):
+    """按第 k 名的分数线把 {uid: 得分} 分为 (线上方的, 恰在线上的)"""
+    if k is None or len(scores) <= k:
+        return scores, {}
+    threshold = heapq.nlargest(k, scores.values())[-1]
+    above = {uid: score for uid, score in scores.items() if score > threshold}
+    return above, {uid: score for uid, score in scores.items() if score == threshold}
+
+
+def score_units(units, weights, pool, k):
+    """
+    累加各单位的得分，返回 (候选人数, 得分高于第 k 名分数线的 {uid: 得分}, 恰在分数线上的 {uid: 得分})。
+    pool 为 None 时候选为至少满足一个正向单位的 uid。
+    """
+    base = sum((w for (negated, _), w in zip(units, weights) if negated), 0.0)
+    if np is None:
+        if pool is None:
+            pool = set().union(*(uids for negated, uids in units if not negated))
+        scores = dict.fromkeys(pool, base)
+        for (negated, uids), w in zip(units, weights):
+            delta = -w if negated else w
+            for uid in uids:
+                if uid in scores:
+                    scores[uid] += delta
+        return (len(scores),) + _split(scores, k)
+
+    size = max([max(uids) for _, uids in units if uids] + [max(pool) if pool else 0]) + 1
+    scores, covered = np.full(size, base, dtype=np.float64), np.zeros(size, dtype=bool)
+    for (negated, uids), w in zip(units, weights):
+        if uids:
+            index = np.fromiter(uids, dtype=np.int64, count=len(uids))
+            scores[index] += -w if negated else w
+            if not negated:
+                covered[index] = True
+    candidates = np.flatnonzero(covered) if pool is None else np.fromiter(pool, dtype=np.int64, count=len(pool))
+    values = scores[candidates]
+    if k is None or len(values) <= k:
+        return len(values), dict(zip(candidates.tolist(), values.tolist())), {}
+    threshold = np.partition(values, len(values) - k)[len(values) - k]
+    above, tied = values > threshold, values == threshold
+    return (len(values), dict(zip(candidates[above].tolist(), values[above].tolist())),
+            dict(zip(candidates[tied].tolist(), values[tied].tolist())))
+
+
+def find_closest(config, cursor, k=DEFAULT_K, weights=None, profile=None, order_by=finder_engine.DEFAULT_ORDER_BY):
+    """
+    返回 (units, results)：
+        units   每个计分单位的 {'condition', 'negated', 'weight', 'matches'}，matches 为满足该条件的人数
+                (negated 为 True 时是被 none_of 排除的人数)
+        results 前 k 名的 {'oier', 'score', 'hits', 'missed'}，oier 为 OIer 表的行，hits 为满足的单位个数，
+                missed 为未满足的单位下标；按得分从高到低、同分按 order_by 排列
+    config 中没有记录条件时等同于严格查询 (每人得分为 0)。
+    """
+    finder_engine.order_clause(order_by)
+    started = time.perf_counter()
+    try:
+        return _find_closest(config or {}, cursor, k, weights, profile, order_by)
+    finally:
+        if profile is not None:
+            profile.total_ms = (time.perf_counter() - started) * 1000
+
+
+def _find_closest(config, cursor, k, weights, profile, order_by):
+    versions = read_versions(cursor)
+    config = school_catalog.resolve_config(cursor, config, versions)
+    domain = finder_engine.find_search_candidates(cursor, profile, config, versions=versions)
+    oier_conditions, oier_values = finder_engine.build_oier_conditions(config)
+    if oier_conditions and (domain is None or domain):
+        domain = finder_engine.filter_oiers(cursor, profile, "oier_filter", oier_conditions, oier_values, domain)
+    if domain is not None and not domain:
+        return [], []
+
+    # 每个单位在过滤条件之内完整求值一次；none_of 单位记录满足被否定条件的 uid
+    evaluator = finder_engine.ConstraintEvaluator(cursor, profile, step_prefix="closest_constraint_", versions=versions)
+    tree = constraint_tree.build_tree(config)
+    _, tree = query_plan.plan_for(config, tree).bind(config, tree)
+    nodes = list(scoring_units(tree))
+    units = []
+    for kind, payload in nodes:
+        if kind == 'none_of':
+            units.append((True, evaluator.evaluate(payload[0], domain)))
+        else:
+            units.append((False, evaluator.evaluate((kind, payload), domain)))
+
+    oier_count = cursor.execute("SELECT COUNT(*) FROM OIer").fetchone()[0] if weights == 'rarity' else 0
+    weights = unit_weights(weights, units, oier_count)
+    unit_info = [{'condition': describe(node), 'negated': negated, 'weight': w, 'matches': len(uids)}
+                 for node, (negated, uids), w in zip(nodes, units, weights)]
+
+    if any(not negated for negated, _ in units):
+        pool = None
+    elif domain is not None:
+        pool = domain
+    else:
+        pool = {row[0] for row in finder_engine.run_step(cursor, profile, "all_oiers", "filter", "SELECT uid FROM OIer", [])}
+    if (pool is not None and not pool) or k == 0:
+        return unit_info, []
+
+    step_started = time.perf_counter()
+    candidates, above, tied = score_units(units, weights, pool, k)
+    if profile is not None:
+        step = profile.add_step("closest_score", "numpy" if np is not None else "count",
+                                f"{len(units)} scoring units over {candidates} candidates", [], candidates,
+                                (time.perf_counter() - step_started) * 1000, None)
+        step['survivors'] = len(above) + len(tied)
+
+    # 线上方的全部入选，恰在线上的按 order_by 补足 k 人；fetch_ranked 的结果已按 order_by 排列，按得分稳定排序
+    rows = finder_engine.fetch_ranked(cursor, profile, set(above), None, order_by, versions)
+    if tied:
+        rows += finder_engine.fetch_ranked(cursor, profile, set(tied), k - len(above), order_by, versions)
+    scores = {**above, **tied}
+    results = []
+    for row in sorted(rows, key=lambda row: -scores[row[0]]):
+        uid = row[0]
+        missed = [i for i, (negated, uids) in enumerate(units) if (uid in uids) == negated]
+        results.append({'oier': row, 'score': scores[uid], 'hits': len(units) - len(missed), 'missed': missed})
+    return unit_info, results
@@ -0,0 +1,291 @@
+# columnar_engine.py
+"""
+列式内存引擎：把 Record 表的各列作为 NumPy 数组使用 (每个数据版本只加载一次；有快照时直接映射快照)，
+每个记录条件计算为向量化的布尔掩码，命中的 oier_uid 写入按 uid 下标的位图，
+多个条件之间用位图按位与求交集。
+
+返回结果与 finder_engine.find_oiers 相同 (按 oierdb_score 降序的 sqlite3.Row 列表)。
+未安装 numpy，或 config 中含有本引擎不支持的键时，自动退回 finder_engine。
+"""
+import json
+import time
+
+try:
+    import numpy as np
+except ImportError:  # numpy 是可选依赖
+    np = None
+
+from utils import constraint_tree, finder_engine, school_catalog, snapshot, text_search
+from utils.db_meta import read_versions
+
+# 姓名/首字母/学校条件 (text_search.SEARCH_KEYS) 由全文索引求出候选 uid 后再转为位图
+CONFIG_KEYS = {'enroll_year_range', 'grade_range', 'records', *text_search.SEARCH_KEYS, *constraint_tree.GROUP_KEYS}
+RECORD_KEYS = {'year_range', 'score_range', 'rank_range', 'province', 'level_range', 'contest_type',
+               *school_catalog.SCHOOL_KEYS, school_catalog.RESOLVED_KEY}
+
+_DATASETS = {}
+
+
+def available():
+    return np is not None
+
+
+class ColumnarData:
+    """
+    Record 表的列式副本。记录按 contest_id 排序，按比赛筛选时只需取对应的连续区间。
+    有快照时各列是指向 mmap 映射区的只读视图 (多进程共享)，否则从 SQLite 读入进程内存。
+    """
+
+    def __init__(self, contests, columns, province_codes, level_codes, enroll_middle, oier_exists, source):
+        size = max((row[0] for row in contests), default=-1) + 1
+        self.contest_year = np.full(size, np.nan)
+        self.contest_type = np.empty(size, dtype=object)
+        for contest_id, year, contest_type in contests:
+            self.contest_year[contest_id] = np.nan if year is None else year
+            self.contest_type[contest_id] = contest_type
+
+        self.oier_uid = columns['oier_uid']
+        self.contest_id = columns['contest_id']
+        # NULL 记为 NaN，与 SQL 中 NULL 参与比较恒为假的语义一致
+        self.score = columns['score']
+        self.rank = columns['rank']
+        self.province, self.province_codes = columns['province'], province_codes
+        self.level, self.level_codes = columns['level'], level_codes
+        self.school_id = columns['school_id']  # 没有学校时为 -1
+        self.contest_start = np.searchsorted(self.contest_id, np.arange(size), side='left')
+        self.contest_end = np.searchsorted(self.contest_id, np.arange(size), side='right')
+        self.enroll_middle = enroll_middle
+        self.oier_exists = oier_exists
+        self.uid_size = len(oier_exists)
+        self.source = source
+
+    @classmethod
+    def from_snapshot(cls, snap):
+        """零拷贝地使用快照中的列"""
+        catalog = snap.catalog
+        columns = {name: snap.numpy(f'record_{name}')
+                   for name in ('oier_uid', 'contest_id', 'school_id', 'score', 'rank', 'province', 'level')}
+        return cls([(row[0], row[3], row[2]) for row in catalog['contests']], columns,
+                   {v: i for i, v in enumerate(catalog['provinces'])}, {v: i for i, v in enumerate(catalog['levels'])},
+                   snap.numpy('oier_enroll_middle'), snap.numpy('oier_exists').view(bool), 'snapshot')
+
+    @classmethod
+    def from_cursor(cls, cursor):
+        """没有快照时从数据库读入各列"""
+        contests = cursor.execute("SELECT id, year, type FROM Contest").fetchall()
+        rows = cursor.execute(
+            "SELECT oier_uid, contest_id, score, rank, province, level, school_id FROM Record ORDER BY contest_id").fetchall()
+        raw = list(zip(*rows)) if rows else [()] * 7
+        province_codes, province = cls._encode(raw[4])
+        level_codes, level = cls._encode(raw[5])
+        columns = {
+            'oier_uid': np.array(raw[0], dtype=np.int64), 'contest_id': np.array(raw[1], dtype=np.int64),
+            'score': np.array([np.nan if v is None else v for v in raw[2]], dtype=np.float64),
+            'rank': np.array([np.nan if v is None else v for v in raw[3]], dtype=np.float64),
+            'province': province, 'level': level,
+            'school_id': np.array([-1 if v is None else v for v in raw[6]], dtype=np.int64),
+        }
+
+        oiers = cursor.execute("SELECT uid, enroll_middle FROM OIer").fetchall()
+        uid_size = max([row[0] for row in oiers] + [int(columns['oier_uid'].max()) if rows else 0]) + 1
+        enroll_middle = np.full(uid_size, np.nan)
+        oier_exists = np.zeros(uid_size, dtype=bool)
+        for uid, enroll in oiers:
+            oier_exists[uid] = True
+            enroll_middle[uid] = np.nan if enroll is None else enroll
+        return cls(contests, columns, province_codes, level_codes, enroll_middle, oier_exists, 'sqlite')
+
+    @staticmethod
+    def _encode(values):
+        """把文本列编码为 int16 代码，返回 ({文本: 代码}, 代码数组)"""
+        codes = {}
+        encoded = np.fromiter((codes.setdefault(v, len(codes)) for v in values), dtype=np.int16, count=len(values))
+        return codes, encoded
+
+    def record_indices(self, constraint):
+        """按 year_range / contest_type 取出候选记录的下标；条件不限制比赛时返回 None (全表)"""
+        year_range = constraint.get('year_range') or [None, None]
+        types = constraint.get('contest_type')
+        if year_range[0] is None and year_range[1] is None and not (types and types[0] is not None):
+            return None
+        ok = np.ones(len(self.contest_year), dtype=bool)
+        if year_range[0] is not None: ok &= self.contest_year >= year_range[0]
+        if year_range[1] is not None: ok &= self.contest_year <= year_range[1]
+        if types and types[0] is not None: ok &= np.isin(self.contest_type, list(types))
+        contest_ids = np.flatnonzero(ok)
+        if len(contest_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(self.contest_start[c], self.contest_end[c]) for c in contest_ids])
+
+    def constraint_bitmap(self, constraint, candidates=None):
+        """返回满足条件的 uid 位图；给出 candidates 位图时只保留其中的 uid"""
+        indices = self.record_indices(constraint)
+        uid = self.oier_uid if indices is None else self.oier_uid[indices]
+
+        def column(values):
+            return values if indices is None else values[indices]
+
+        mask = np.ones(len(uid), dtype=bool)
+        for field, values in (('score_range', self.score), ('rank_range', self.rank)):
+            if constraint.get(field):
+                low, high = constraint[field]
+                if low is not None: mask &= column(values) >= low
+                if high is not None: mask &= column(values) <= high
+        for field, codes, values in (('province', self.province_codes, self.province),
+                                     ('level_range', self.level_codes, self.level)):
+            wanted = constraint.get(field)
+            if wanted and wanted[0] is not None:
+                mask &= np.isin(column(values), [codes[v] for v in wanted if v in codes])
+        school_ids = constraint.get(school_catalog.RESOLVED_KEY)
+        if school_ids is not None:
+            mask &= np.isin(column(self.school_id), school_ids)
+        if candidates is not None:
+            mask &= candidates[uid]
+
+        bitmap = np.zeros(self.uid_size, dtype=bool)
+        bitmap[uid[mask]] = True
+        return bitmap
+
+    def oier_bitmap(self, config):
+        """入学年份 / 年级条件对应的 uid 位图；没有此类条件时返回 None"""
+        conditions, values = finder_engine.build_oier_conditions(config)
+        if not conditions:
+            return None
+        bitmap = self.oier_exists.copy()
+        for condition, value in zip(conditions, values):
+            if condition.endswith('>= ?'): bitmap &= self.enroll_middle >= value
+            else: bitmap &= self.enroll_middle <= value
+        return bitmap
+
+
+def load(cursor, versions=None):
+    """返回当前数据库版本的列式数据 (每个数据版本只加载一次)。versions 见 snapshot.for_cursor"""
+    versions = versions or read_versions(cursor)
+    data = _DATASETS.get(versions.data)
+    if data is None:
+        _DATASETS.clear()
+        snap = snapshot.for_cursor(cursor, versions)
+        data = ColumnarData.from_snapshot(snap) if snap is not None else ColumnarData.from_cursor(cursor)
+        _DATASETS[versions.data] = data
+    return data
+
+
+def supports(config):
+    """config 是否只包含本引擎能处理的键与数值型范围"""
+    if not isinstance(config, dict) or not set(config) <= CONFIG_KEYS:
+        return False
+    try:
+        constraints = [constraint for constraint, _ in constraint_tree.leaves(constraint_tree.build_tree(config))]
+    except ValueError:
+        return False
+    for constraint in constraints:
+        if not set(constraint) <= RECORD_KEYS:
+            return False
+        for field in ('year_range', 'score_range', 'rank_range'):
+            if any(v is not None and not isinstance(v, (int, float)) for v in constraint.get(field) or []):
+                return False
+    return True
+
+
+def find_oiers(config, cursor, profile=None, limit=None, order_by=finder_engine.DEFAULT_ORDER_BY, versions=None):
+    """与 finder_engine.find_oiers 接口、结果相同的列式实现"""
+    if not config: config = {}
+    if np is None or not supports(config):
+        return finder_engine.find_oiers(config, cursor, profile, limit, order_by, versions)
+    finder_engine.order_clause(order_by)
+
+    started = time.perf_counter()
+    try:
+        return _find_oiers(config, cursor, profile, limit, order_by, versions or read_versions(cursor))
+    finally:
+        if profile is not None:
+            profile.total_ms = (time.perf_counter() - started) * 1000
+
+
+def _record(profile, name, mode, description, bitmap, started):
+    if profile is not None:
+        count = int(bitmap.sum())
+        step = profile.add_step(name, mode, description, [], count, (time.perf_counter() - started) * 1000, None)
+        step['survivors'] = count
+
+
+def _find_oiers(config, cursor, profile, limit, order_by, versions):
+    candidate_uids = _find_candidates(config, cursor, profile, versions)
+    if candidate_uids is not None and not candidate_uids: return []
+    return finder_engine.fetch_ranked(cursor, profile, candidate_uids, limit, order_by, versions)
+
+
+def find_candidates(config, cursor, profile=None, versions=None):
+    """与 finder_engine.find_candidates 相同：返回 uid 集合，config 没有任何条件时返回 None"""
+    if not config: config = {}
+    if np is None or not supports(config):
+        return finder_engine.find_candidates(config, cursor, profile, versions)
+    return _find_candidates(config, cursor, profile, versions or read_versions(cursor))
+
+
+def _find_candidates(config, cursor, profile, versions):
+    config = school_catalog.resolve_config(cursor, config, versions)
+    step_started = time.perf_counter()
+    data = load(cursor, versions)
+    if profile is not None:
+        profile.add_step("columnar_load", "columnar", f"load Record columns ({data.source})", [], len(data.oier_uid),
+                         (time.perf_counter() - step_started) * 1000, None)
+
+    candidates = None
+    search_uids = finder_engine.find_search_candidates(cursor, profile, config, versions=versions)
+    if search_uids is not None:
+        candidates = np.zeros(data.uid_size, dtype=bool)
+        candidates[[uid for uid in search_uids if uid < data.uid_size]] = True
+
+    step_started = time.perf_counter()
+    oier_candidates = data.oier_bitmap(config)
+    if oier_candidates is not None:
+        candidates = oier_candidates if candidates is None else candidates & oier_candidates
+        _record(profile, "oier_filter", "columnar", "enroll_middle mask", candidates, step_started)
+
+    tree = constraint_tree.build_tree(config)
+    if not constraint_tree.is_empty(tree):
+        candidates = BitmapEvaluator(data, profile).evaluate(tree, candidates)
+        if not candidates.any():
+            return set()
+
+    return None if candidates is None else set(np.flatnonzero(candidates).tolist())
+
+
+class BitmapEvaluator:
+    """用位图运算对条件树 (见 utils/constraint_tree.py) 求值，与 finder_engine.ConstraintEvaluator 的结果相同"""
+
+    def __init__(self, data, profile=None):
+        self.data = data
+        self.profile = profile
+        self.steps = 0
+
+    def evaluate(self, node, candidates):
+        """返回候选位图 (None 表示全部 OIer) 中满足节点条件的 uid 位图"""
+        kind, payload = node
+        if kind == 'leaf':
+            step_started = time.perf_counter()
+            bitmap = self.data.constraint_bitmap(payload, candidates)
+            _record(self.profile, f"record_constraint_{self.steps}", "columnar",
+                    json.dumps(payload, ensure_ascii=False), bitmap, step_started)
+            self.steps += 1
+            return bitmap
+        children = [child for child in payload if not constraint_tree.is_empty(child)]
+        if kind == 'any_of':
+            matched = np.zeros(self.data.uid_size, dtype=bool)
+            for child in children:
+                matched |= self.evaluate(child, candidates)
+            return matched
+        if kind == 'none_of':
+            base = self.data.oier_exists if candidates is None else candidates
+            return base & ~self.evaluate(('any_of', children), base)
+        # all_of: 先求交集，候选为空时停止，最后再减去 none_of
+        for child in children:
+            if child[0] != 'none_of':
+                candidates = self.evaluate(child, candidates)
+                if not candidates.any():
+                    return candidates
+        for child in children:
+            if child[0] == 'none_of':
+                candidates = self.evaluate(child, candidates)
+        return candidates
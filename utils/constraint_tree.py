@@ -0,0 +1,92 @@
+# constraint_tree.py
+"""
+记录条件的逻辑组合。
+
+config 中的 records 是一组 "且" 关系的记录条件；此外还可以使用三种条件组：
+    all_of: [...]    全部满足 (与 records 相同)
+    any_of: [...]    至少满足其中一个
+    none_of: [...]   一个都不满足
+
+条件组既可以写在 config 顶层，也可以作为 records (或其他条件组) 中的一项，从而任意嵌套，例如：
+
+    records:
+      - {year_range: [2021, 2021], level_range: [一等奖]}
+    any_of:
+      - {contest_type: [NOI], level_range: [金牌, 银牌, 铜牌]}
+      - {contest_type: [CTSC], level_range: [金牌, 银牌, 铜牌]}
+    none_of:
+      - {contest_type: [NOI]}
+
+这里把 config 解析为 (类型, 内容) 形式的树：叶子为 ('leaf', 记录条件)，内部节点为 ('all_of' / 'any_of' / 'none_of', [子节点])。
+求值由查询引擎完成 (finder_engine 用集合运算，columnar_engine 用位图运算)。
+"""
+GROUP_KEYS = ('all_of', 'any_of', 'none_of')
+
+
+def is_group(item):
+    return isinstance(item, dict) and len(item) == 1 and next(iter(item)) in GROUP_KEYS
+
+
+def _parse_items(items, where):
+    if items is None:
+        return []
+    if not isinstance(items, list):
+        raise ValueError(f"{where} 必须是列表")
+    return [parse_node(item, f"{where}[{i}]") for i, item in enumerate(items)]
+
+
+def parse_node(item, where='records'):
+    """把单个条件 (记录条件或条件组) 解析为树节点"""
+    if is_group(item):
+        kind, items = next(iter(item.items()))
+        return kind, _parse_items(items, f"{where}.{kind}")
+    if not isinstance(item, dict):
+        raise ValueError(f"{where} 必须是记录条件或条件组 (all_of / any_of / none_of)")
+    return 'leaf', item
+
+
+def build_tree(config):
+    """config 中全部记录条件组成的树，根节点为 all_of"""
+    children = _parse_items(config.get('records'), 'records')
+    for kind in GROUP_KEYS:
+        if config.get(kind) is not None:
+            children.append((kind, _parse_items(config[kind], kind)))
+    return 'all_of', children
+
+
+def has_groups(config):
+    """config 是否用到了条件组 (只有 records 中的普通记录条件时为 False)"""
+    if any(config.get(kind) is not None for kind in GROUP_KEYS):
+        return True
+    return any(is_group(item) for item in config.get('records') or [])
+
+
+def is_empty(node):
+    """节点是否不含任何叶子 (空的条件组不构成限制)"""
+    kind, payload = node
+    return kind != 'leaf' and all(is_empty(child) for child in payload)
+
+
+def leaves(node, negated=False):
+    """依次产出 (记录条件, 是否处于 none_of 之下)"""
+    kind, payload = node
+    if kind == 'leaf':
+        yield payload, negated
+        return
+    for child in payload:
+        yield from leaves(child, negated or kind == 'none_of')
+
+
+def map_leaves(config, function):
+    """返回把每个记录条件替换为 function(条件) 后的 config，条件组结构保持不变"""
+    def convert(item):
+        if is_group(item):
+            kind, items = next(iter(item.items()))
+            return {kind: [convert(child) for child in items]} if isinstance(items, list) else item
+        return function(item) if isinstance(item, dict) else item
+
+    converted = dict(config)
+    for key in ('records',) + GROUP_KEYS:
+        if isinstance(config.get(key), list):
+            converted[key] = [convert(item) for item in config[key]]
+    return converted
@@ -0,0 +1,326 @@
+# cost_model.py
+"""
+记录条件的代价模型：为每个条件在「扫描」和「枚举」之间选择代价更低的执行方式。
+
+    scan:      SELECT DISTINCT r.oier_uid ... WHERE <条件>
+               代价 ≈ 需要读取的记录数 × scan_row_us
+    enumerate: ... WHERE <条件> AND r.oier_uid IN (SELECT value FROM json_each(<候选 uid>))
+               代价 ≈ 候选人数 × probe_us (每个 uid 一次索引探测及其名下记录)
+    postings:  只含年份/比赛类型/奖项/省份的条件合并奖项倒排表 (见 utils/award_index.py)
+               代价 ≈ 需要合并的 uid 总数 (倒排表目录中的长度之和) × posting_us
+
+需要读取的记录数来自 RecordStats 统计立方体 (按比赛/省份/奖项的记录数) 与 sqlite_stat1；
+满足条件的人数 (estimate_oiers) 同样来自统计立方体中的人数，不读取 Record 表。
+各常数可以用 `python -m utils.cost_model --db oier_data.db` 在当前数据库上校准，
+结果写入 EngineCalibration 表，并在 Meta 表中更新校准版本；模型按 (数据版本, 校准版本) 缓存，
+运行中的进程在下一次查询时即使用新常数，不需要重启。
+"""
+import argparse
+import random
+import sqlite3
+import statistics
+import time
+
+from utils import award_index
+from utils.db_meta import read_versions, write_meta
+from utils.school_catalog import RESOLVED_KEY
+
+# 未校准时使用的默认常数 (微秒)
+DEFAULT_CONSTANTS = {'scan_row_us': 0.5, 'probe_us': 8.0, 'posting_us': 0.15}
+# 没有任何统计信息时假定的规模
+DEFAULT_RECORD_COUNT = 400_000
+DEFAULT_OIER_COUNT = 110_000
+DEFAULT_SCHOOL_COUNT = 12_000
+# 枚举模式的候选人数上限，超过后一律扫描
+MAX_ENUMERATE_UIDS = 30_000
+# 每个代价模型缓存的 (年份范围, 比赛类型) → 比赛 id 列表的个数上限
+MAX_CONTEST_MATCHES = 4096
+
+_MODELS = {}
+
+
+def _index_leading_columns(cursor, table):
+    """返回 {索引名: 首列} """
+    indexes = {}
+    for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?", (table,)).fetchall():
+        columns = cursor.execute(f"PRAGMA index_info('{row[0]}')").fetchall()
+        if columns:
+            indexes[row[0]] = columns[0][2]
+    return indexes
+
+
+def _read_stat1(cursor):
+    """读取 sqlite_stat1，返回 {(表, 索引): [数值, ...]}；未执行 ANALYZE 时返回空字典"""
+    try:
+        rows = cursor.execute("SELECT tbl, idx, stat FROM sqlite_stat1").fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    return {(row[0], row[1]): [int(v) for v in row[2].split() if v.isdigit()] for row in rows}
+
+
+class CostModel:
+    """某个数据库版本上的代价模型，包含比赛目录、统计立方体与校准常数"""
+
+    def __init__(self, contests, contest_records, contest_level_records, record_count,
+                 has_oier_index, has_contest_index, constants=None, oier_count=DEFAULT_OIER_COUNT,
+                 has_school_index=False, school_count=DEFAULT_SCHOOL_COUNT, contest_oiers=None):
+        self.contests = contests                          # [(id, year, type), ...]
+        self.contest_records = contest_records            # {contest_id: 记录数}
+        self.contest_level_records = contest_level_records  # {(contest_id, level): 记录数}
+        self.record_count = record_count
+        self.has_oier_index = has_oier_index
+        self.has_contest_index = has_contest_index
+        self.constants = dict(DEFAULT_CONSTANTS, **(constants or {}))
+        self.oier_count = oier_count
+        self.has_school_index = has_school_index
+        self.school_count = school_count
+        # {(是否限制省份, 是否限制奖项): {(contest_id, 省份或 None, 奖项或 None): 人数}}
+        self.contest_oiers = contest_oiers or {}
+        self._contest_matches = {}                        # {(起始年份, 结束年份, 比赛类型): [contest_id, ...]}
+
+    @classmethod
+    def load(cls, cursor):
+        """从数据库读取统计信息；缺少的部分使用保守的默认值"""
+        stat1 = _read_stat1(cursor)
+        record_indexes = _index_leading_columns(cursor, 'Record')
+        contests = [tuple(row) for row in cursor.execute("SELECT id, year, type FROM Contest").fetchall()]
+
+        contest_records, contest_level_records = {}, {}
+        contest_oiers = {(False, False): {}, (True, False): {}, (False, True): {}, (True, True): {}}
+        try:
+            for contest_id, province, level, count, oiers in cursor.execute(
+                    "SELECT contest_id, province, level, record_count, oier_count FROM RecordStats").fetchall():
+                contest_records[contest_id] = contest_records.get(contest_id, 0) + count
+                contest_level_records[(contest_id, level)] = contest_level_records.get((contest_id, level), 0) + count
+                # 每人在一场比赛中只有一个省份与奖项，各格的人数可以直接相加
+                for (by_province, by_level), table in contest_oiers.items():
+                    key = (contest_id, province if by_province else None, level if by_level else None)
+                    table[key] = table.get(key, 0) + oiers
+        except sqlite3.OperationalError:
+            contest_oiers = None
+
+        record_count = next((v[0] for (tbl, _), v in stat1.items() if tbl == 'Record' and v), None)
+        if record_count is None:
+            record_count = cursor.execute("SELECT MAX(id) FROM Record").fetchone()[0] or DEFAULT_RECORD_COUNT
+
+        oier_count = next((v[0] for (tbl, _), v in stat1.items() if tbl == 'OIer' and v), None)
+        if oier_count is None:
+            oier_count = cursor.execute("SELECT MAX(uid) FROM OIer").fetchone()[0] or DEFAULT_OIER_COUNT
+
+        school_count = next((v[0] for (tbl, _), v in stat1.items() if tbl == 'School' and v), None)
+        if school_count is None:
+            school_count = cursor.execute("SELECT COUNT(*) FROM School").fetchone()[0] or DEFAULT_SCHOOL_COUNT
+
+        constants = {}
+        try:
+            constants = {row[0]: row[1] for row in cursor.execute("SELECT name, value FROM EngineCalibration").fetchall()}
+        except sqlite3.OperationalError:
+            pass
+
+        return cls(contests, contest_records, contest_level_records, record_count,
+                   has_oier_index='oier_uid' in record_indexes.values(),
+                   has_contest_index='contest_id' in record_indexes.values(),
+                   constants=constants, oier_count=oier_count,
+                   has_school_index='school_id' in record_indexes.values(), school_count=school_count,
+                   contest_oiers=contest_oiers)
+
+    def matching_contests(self, constraint):
+        """按 year_range / contest_type 解析出匹配的比赛 id；条件不限制比赛时返回 None"""
+        year_range = constraint.get('year_range') or [None, None]
+        types = constraint.get('contest_type')
+        types = set(types) if types and types[0] is not None else None
+        min_year, max_year = year_range
+        if min_year is None and max_year is None and types is None:
+            return None
+        # 同一查询中排序与求值各解析一次，洛谷式查询之间也大量重复，按取值缓存
+        key = (min_year, max_year, None if types is None else frozenset(types))
+        contest_ids = self._contest_matches.get(key)
+        if contest_ids is None:
+            if len(self._contest_matches) >= MAX_CONTEST_MATCHES:
+                self._contest_matches.clear()
+            contest_ids = self._contest_matches[key] = [
+                cid for cid, year, ctype in self.contests
+                if (min_year is None or (year is not None and year >= min_year))
+                and (max_year is None or (year is not None and year <= max_year))
+                and (types is None or ctype in types)]
+        return contest_ids
+
+    def estimate_scan_rows(self, constraint):
+        """估计扫描模式需要读取的记录数；限制学校时取按比赛与按学校 (假定各校记录数相同) 估计的较小者"""
+        rows = self.estimate_contest_rows(constraint)
+        school_ids = constraint.get(RESOLVED_KEY)
+        if school_ids is not None and self.has_school_index:
+            rows = min(rows, self.record_count * len(school_ids) / max(self.school_count, 1))
+        return rows
+
+    def estimate_oiers(self, constraint):
+        """
+        估计满足记录条件的人数：按统计立方体中匹配的 (比赛, 省份, 奖项) 各格的人数相加。
+        同一人参加多场比赛时重复计数，分数/名次条件不在立方体中 (不缩小估计)，因此通常偏高；不超过总人数。
+        没有统计立方体时退化为按比赛估计的记录数。
+        """
+        if not self.contest_oiers:
+            return min(self.estimate_scan_rows(constraint), self.oier_count)
+        provinces = constraint.get('province')
+        provinces = provinces if provinces and provinces[0] is not None else None
+        levels = constraint.get('level_range')
+        levels = levels if levels and levels[0] is not None else None
+        contest_ids = self.matching_contests(constraint)
+        if contest_ids is None:
+            contest_ids = [row[0] for row in self.contests]
+        table = self.contest_oiers[(provinces is not None, levels is not None)]
+        oiers = sum(table.get((cid, province, level), 0)
+                    for cid in contest_ids for province in provinces or [None] for level in levels or [None])
+        school_ids = constraint.get(RESOLVED_KEY)
+        if school_ids is not None:
+            oiers = min(oiers, self.oier_count * len(school_ids) / max(self.school_count, 1))
+        return min(oiers, self.oier_count)
+
+    def estimate_contest_rows(self, constraint):
+        """按比赛 (及奖项) 估计的记录数"""
+        contest_ids = self.matching_contests(constraint)
+        if contest_ids is None or not self.has_contest_index:
+            return self.record_count
+        if not self.contest_records:
+            return self.record_count * len(contest_ids) / max(len(self.contests), 1)
+        levels = constraint.get('level_range')
+        if levels and levels[0] is not None:
+            return sum(self.contest_level_records.get((cid, level), 0) for cid in contest_ids for level in levels)
+        return sum(self.contest_records.get(cid, 0) for cid in contest_ids)
+
+    def costs(self, constraint, candidate_count, postings=None):
+        """返回 {'scan': 微秒, 'enumerate': 微秒}；给出倒排表的总长度 postings 时另含 'postings'"""
+        scan_cost = self.estimate_scan_rows(constraint) * self.constants['scan_row_us']
+        if self.has_oier_index:
+            enumerate_cost = candidate_count * self.constants['probe_us']
+        else:
+            enumerate_cost = self.record_count * self.constants['scan_row_us']
+        costs = {'scan': scan_cost, 'enumerate': enumerate_cost}
+        if postings is not None:
+            costs['postings'] = postings * self.constants['posting_us']
+        return costs
+
+    def choose(self, constraint, candidate_count, postings=None):
+        """
+        返回 (模式, 代价估计)，模式为 'postings'、'enumerate' 或 'scan'。
+        candidate_count 为 None 表示没有候选集 (不能枚举)；postings 为条件能由倒排索引回答时需要合并的 uid 总数。
+        候选很少时枚举比合并很长的倒排表便宜得多 (例如姓名条件之后的常见奖项条件)。
+        """
+        costs = self.costs(constraint, candidate_count or 0, postings)
+        modes = ['postings'] if postings is not None else []
+        if candidate_count is not None and candidate_count <= MAX_ENUMERATE_UIDS:
+            modes.append('enumerate')
+        modes.append('scan')
+        return min(modes, key=costs.__getitem__), costs
+
+    def choose_top_k(self, candidate_count, limit):
+        """
+        从 candidate_count 个候选中取排序后的前 limit 名：
+            index_walk: 沿排序列的索引从高到低遍历 OIer，命中 limit 个候选即停，约读 limit × 总人数 / 候选数 行
+            heap:       按 uid 逐个取出候选的排序列，用大小为 limit 的堆选出前 limit 名，读 candidate_count 行
+        """
+        walk_rows = limit * self.oier_count / max(candidate_count, 1)
+        return 'index_walk' if walk_rows < candidate_count else 'heap'
+
+
+def for_cursor(cursor, versions=None):
+    """返回当前数据库版本的代价模型 (每个数据版本与校准版本只加载一次)。versions 见 snapshot.for_cursor"""
+    version = tuple(versions or read_versions(cursor))
+    model = _MODELS.get(version)
+    if model is None:
+        # 只保留当前版本的模型，数据或校准更新后释放旧的统计信息
+        _MODELS.clear()
+        model = _MODELS[version] = CostModel.load(cursor)
+    return model
+
+
+def _timed(function):
+    """执行一次的耗时 (微秒)"""
+    started = time.perf_counter()
+    function()
+    return (time.perf_counter() - started) * 1e6
+
+
+def _best_of(cursor, query, values, repeat=3):
+    """多次执行取最短耗时 (微秒)"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cursor.execute(query, values)
+        cursor.fetchall()
+        elapsed = (time.perf_counter() - started) * 1e6
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def calibrate(conn, seed=0, verbose=True):
+    """在当前数据库上测量扫描与枚举的单位代价，线性拟合后写入 EngineCalibration 表"""
+    cursor = conn.cursor()
+    model = CostModel.load(cursor)
+    rng = random.Random(seed)
+
+    # 扫描: 按比赛取记录，x 为读取的记录数
+    scan_x, scan_y = [], []
+    contest_ids = sorted(cid for cid, _, _ in model.contests)
+    query = "SELECT DISTINCT r.oier_uid FROM Record r JOIN Contest c ON r.contest_id = c.id WHERE r.contest_id = ?"
+    for contest_id in rng.sample(contest_ids, min(12, len(contest_ids))):
+        rows = model.contest_records.get(contest_id)
+        if rows is None:
+            rows = cursor.execute("SELECT COUNT(*) FROM Record WHERE contest_id = ?", (contest_id,)).fetchone()[0]
+        scan_x.append(rows)
+        scan_y.append(_best_of(cursor, query, [contest_id]))
+
+    # 枚举: 随机取 k 个 uid，x 为 uid 个数
+    probe_x, probe_y = [], []
+    max_uid = cursor.execute("SELECT MAX(uid) FROM OIer").fetchone()[0] or 1
+    for k in (10, 50, 200, 1000, 3000):
+        uids = [rng.randint(1, max_uid) for _ in range(k)]
+        query = ("SELECT DISTINCT r.oier_uid FROM Record r JOIN Contest c ON r.contest_id = c.id "
+                 f"WHERE c.year >= ? AND r.oier_uid IN ({', '.join(['?'] * k)})")
+        probe_x.append(k)
+        probe_y.append(_best_of(cursor, query, [0] + uids))
+
+    constants = {
+        'scan_row_us': max(statistics.linear_regression(scan_x, scan_y).slope, 1e-3),
+        'probe_us': max(statistics.linear_regression(probe_x, probe_y).slope, 1e-3),
+    }
+
+    # 倒排表: 合并若干场比赛的倒排表，x 为合并的 uid 总数 (没有快照时不校准，使用默认值)
+    index = award_index.for_cursor(cursor)
+    if index is not None:
+        posting_x, posting_y = [], []
+        for k in (1, 4, 16, 64):
+            constraint, contests = {'year_range': [None, None]}, rng.sample(contest_ids, min(k, len(contest_ids)))
+            posting_x.append(index.size(constraint, contests))
+            posting_y.append(min(_timed(lambda: index.lookup(constraint, contests)) for _ in range(3)))
+        if len(set(posting_x)) > 1:
+            constants['posting_us'] = max(statistics.linear_regression(posting_x, posting_y).slope, 1e-3)
+    cursor.execute("CREATE TABLE IF NOT EXISTS EngineCalibration (name TEXT PRIMARY KEY, value REAL, calibrated_at TEXT)")
+    now = time.strftime('%Y-%m-%dT%H:%M:%S')
+    cursor.executemany("INSERT OR REPLACE INTO EngineCalibration (name, value, calibrated_at) VALUES (?, ?, ?)",
+                       [(name, value, now) for name, value in constants.items()])
+    write_meta(cursor, {'calibration_version': f"{time.time():.6f}"})
+    conn.commit()
+    _MODELS.clear()
+
+    if verbose:
+        for name, value in constants.items():
+            print(f"{name:<12} {value:10.4f} us  (default {DEFAULT_CONSTANTS[name]})")
+        print(f"一个候选 uid 的枚举代价约等于扫描 {constants['probe_us'] / constants['scan_row_us']:.1f} 条记录")
+    return constants
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在当前数据库上校准查询代价模型的常数。")
+    parser.add_argument('--db', default='oier_data.db', help="SQLite 数据库文件路径 (默认为: oier_data.db)")
+    parser.add_argument('--seed', type=int, default=0, help="随机抽样种子")
+    args = parser.parse_args()
+    conn = sqlite3.connect(args.db)
+    try:
+        calibrate(conn, args.seed)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# db_meta.py
+"""
+数据库版本信息。create_db.py 把输入数据的摘要写入 Meta 表，各处缓存以此区分数据版本；
+代价模型校准 (utils/cost_model.py) 另写入校准版本，数据不变而常数更新时运行中的进程也能重新加载。
+"""
+import hashlib
+import os
+import sqlite3
+from collections import namedtuple
+
+# 一个查询中各缓存 (快照、代价模型、学校目录、相似度索引等) 共用的一次 Meta 读取结果
+Versions = namedtuple('Versions', ['data', 'calibration'])
+
+
+def compute_data_version(*paths):
+    """根据输入文件内容计算数据版本号"""
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def write_meta(cursor, values):
+    """写入 (或覆盖) Meta 表中的键值"""
+    cursor.execute("CREATE TABLE IF NOT EXISTS Meta (key TEXT PRIMARY KEY, value TEXT)")
+    cursor.executemany("INSERT OR REPLACE INTO Meta (key, value) VALUES (?, ?)", [(k, str(v)) for k, v in values.items()])
+
+
+def read_meta(cursor):
+    """读取 Meta 表，旧版数据库没有该表时返回空字典"""
+    try:
+        return {row[0]: row[1] for row in cursor.execute("SELECT key, value FROM Meta").fetchall()}
+    except sqlite3.OperationalError:
+        return {}
+
+
+def database_path(cursor):
+    """返回 main 数据库的文件路径，内存数据库返回空字符串"""
+    for row in cursor.execute("PRAGMA database_list").fetchall():
+        if row[1] == 'main':
+            return row[2] or ''
+    return ''
+
+
+def _data_version(cursor, meta):
+    version = meta.get('data_version')
+    if version:
+        return version
+    path = database_path(cursor)
+    if path and os.path.exists(path):
+        return f"{path}@{os.path.getmtime(path)}"
+    return f"memory@{id(cursor.connection)}"
+
+
+def read_versions(cursor):
+    """只读一次 Meta 表，返回 Versions(数据版本, 校准版本)；查询入口读取一次后传给各 for_cursor"""
+    meta = read_meta(cursor)
+    return Versions(_data_version(cursor, meta), meta.get('calibration_version', ''))
+
+
+def get_data_version(cursor):
+    """返回当前数据库的数据版本；旧版数据库退化为 文件路径 + 修改时间"""
+    return _data_version(cursor, read_meta(cursor))
+
+
+def get_calibration_version(cursor):
+    """返回代价模型常数的校准版本；从未校准时为空字符串"""
+    return read_meta(cursor).get('calibration_version', '')
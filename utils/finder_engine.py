@@ -1,74 +1,519 @@
 # finder_engine.py
-import sqlite3
-from datetime import date
+import heapq
+import json
+import time
 
-ENUMERATE_THRESHOLD = 20
+from utils import award_index, constraint_tree, cost_model, oier_metrics, query_plan, school_catalog, text_search
+from utils.db_meta import read_versions
+
+class QueryProfile:
+    """可选的查询执行记录：每个步骤的 SQL、参数个数、返回行数、交集后剩余人数、耗时与查询计划"""
+    def __init__(self, explain=True):
+        self.explain = explain
+        self.steps = []
+        self.total_ms = 0.0
+
+    def add_step(self, name, mode, sql, values, rows, elapsed_ms, plan):
+        step = {
+            'name': name, 'mode': mode, 'sql': sql, 'param_count': len(values),
+            'rows': rows, 'survivors': None, 'cost': None, 'elapsed_ms': elapsed_ms, 'plan': plan,
+        }
+        self.steps.append(step)
+        return step
+
+    def to_dict(self):
+        return {'total_ms': self.total_ms, 'steps': self.steps}
+
+def explain_query_plan(cursor, query, values):
+    """返回 EXPLAIN QUERY PLAN 的结果，按树形缩进为字符串列表"""
+    cursor.execute(f"EXPLAIN QUERY PLAN {query}", values)
+    depth, lines = {0: -1}, []
+    for row in cursor.fetchall():
+        node_id, parent, detail = row[0], row[1], row[3]
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+def run_step(cursor, profile, name, mode, query, values):
+    """执行一个查询步骤并返回全部结果行；提供 profile 时记录该步骤"""
+    plan = explain_query_plan(cursor, query, values) if profile is not None and profile.explain else None
+    started = time.perf_counter()
+    cursor.execute(query, values)
+    rows = cursor.fetchall()
+    if profile is not None:
+        profile.add_step(name, mode, query, values, len(rows), (time.perf_counter() - started) * 1000, plan)
+    return rows
+
+def lookup_postings(cursor, profile, name, constraint, index=None, model=None):
+    """
+    只含年份/比赛类型/奖项/省份的条件直接由奖项倒排索引回答，不读取 Record 表。
+    没有可用的索引或条件含分数/名次时返回 None，由调用方退回 SQL。
+    index / model 为调用方已取得的倒排索引与代价模型，省略时按 cursor 的数据版本查找。
+    """
+    if not award_index.supports(constraint):
+        return None
+    if index is None:
+        index = award_index.for_cursor(cursor)
+        if index is None:
+            return None
+    started = time.perf_counter()
+    uids = index.lookup(constraint, (model or cost_model.for_cursor(cursor)).matching_contests(constraint))
+    if profile is not None:
+        profile.add_step(name, "postings", f"award_index: {json.dumps(constraint, ensure_ascii=False)}", [],
+                         len(uids), (time.perf_counter() - started) * 1000, None)
+    return uids
+
+def postings_size(constraint, index, model):
+    """条件由倒排索引回答时需要合并的 uid 总数；没有可用的索引或条件含其他键时返回 None"""
+    if index is None or not award_index.supports(constraint):
+        return None
+    return index.size(constraint, model.matching_contests(constraint))
 
 def build_where_clause_and_values(params):
-    # ... (这个函数和 oierfinder.py 中的完全一样) ...
-    conditions, values = [], []
-    range_fields = {'year_range': 'c.year', 'score_range': 'r.score', 'rank_range': 'r.rank'}
-    list_fields = {'province': 'r.province', 'level_range': 'r.level', 'contest_type': 'c.type'}
-    for field, column in range_fields.items():
-        if field in params and params[field]:
-            min_val, max_val = params[field]
-            if min_val is not None: conditions.append(f"{column} >= ?"); values.append(min_val)
-            if max_val is not None: conditions.append(f"{column} <= ?"); values.append(max_val)
-    for field, column in list_fields.items():
-        if field in params and params[field] and params[field][0] is not None:
-             placeholders = ', '.join(['?'] * len(params[field])); conditions.append(f"{column} IN ({placeholders})"); values.extend(params[field])
-    return " AND ".join(conditions) if conditions else "1=1", values
-
-def find_oiers(config, cursor):
+    # SQL 文本由 query_plan 按条件的形状编译并缓存，这里只按取值绑定参数
+    step = query_plan.record_step(params)
+    return step.where_clause, step.bind(params)
+
+# 结果可按这些列降序排列 (同值时 uid 小者在前)，create_db.py 为每一列建有对应顺序的索引；
+# OIer 表之外的列来自派生指标表 (见 utils/oier_metrics.py)，排序时与 OIer 表连接
+ORDER_COLUMNS = ('oierdb_score', 'ccf_score', 'enroll_middle') + oier_metrics.COLUMNS
+DEFAULT_ORDER_BY = 'oierdb_score'
+
+def order_clause(order_by):
+    if order_by not in ORDER_COLUMNS:
+        raise ValueError(f"不支持的排序字段: {order_by} (可选: {', '.join(ORDER_COLUMNS)})")
+    if order_by in oier_metrics.COLUMNS:
+        return f"{oier_metrics.TABLE}.{order_by} DESC, {oier_metrics.TABLE}.uid"
+    return f"{order_by} DESC, uid"
+
+def _order_table(order_by):
+    """排序列所在的表"""
+    return oier_metrics.TABLE if order_by in oier_metrics.COLUMNS else "OIer"
+
+def _ranked_source(order_by):
+    """取 OIer 行并按 order_by 排序时的 FROM 子句"""
+    if order_by in oier_metrics.COLUMNS:
+        return f"OIer JOIN {oier_metrics.TABLE} USING (uid)"
+    return "OIer"
+
+def _rank_key(order_by_value, uid):
+    """与 ORDER BY <列> DESC, uid 一致的排序键 (SQLite 中 NULL 在降序时排在最后)"""
+    return (order_by_value is None, -(order_by_value or 0), uid)
+
+def fetch_ranked(cursor, profile, candidate_uids, limit=None, order_by=DEFAULT_ORDER_BY, versions=None):
+    """
+    取出候选 OIer 的完整行并排序；candidate_uids 为 None 表示全部 OIer。
+    给出 limit 时只取前 limit 名：全部 OIer 直接沿索引取前 limit 行；
+    候选集较大时沿索引遍历并在命中 limit 个候选后停止；较小时用有界堆选出前 limit 名再取行。
+    versions 为查询入口读取的 db_meta.Versions (见 find_oiers)。
+    """
+    order, source = order_clause(order_by), _ranked_source(order_by)
+    if candidate_uids is None:
+        if limit is None:
+            return run_step(cursor, profile, "fetch_oiers", "fetch", f"SELECT OIer.* FROM {source} ORDER BY {order}", [])
+        return run_step(cursor, profile, "fetch_oiers", "top_k", f"SELECT OIer.* FROM {source} ORDER BY {order} LIMIT ?", [limit])
+    if not candidate_uids or limit == 0:
+        return []
+
+    fetch_query = f"SELECT OIer.* FROM {source} WHERE uid IN (SELECT value FROM json_each(?)) ORDER BY {order}"
+    if limit is None or len(candidate_uids) <= limit:
+        return run_step(cursor, profile, "fetch_oiers", "fetch", fetch_query, [json.dumps(sorted(candidate_uids))])
+
+    if cost_model.for_cursor(cursor, versions).choose_top_k(len(candidate_uids), limit) == 'index_walk':
+        query = f"SELECT OIer.* FROM {source} ORDER BY {order}"
+        plan = explain_query_plan(cursor, query, []) if profile is not None and profile.explain else None
+        started, scanned, rows = time.perf_counter(), 0, []
+        cursor.execute(query)
+        for row in cursor:
+            scanned += 1
+            if row[0] in candidate_uids:
+                rows.append(row)
+                if len(rows) == limit:
+                    break
+        if profile is not None:
+            step = profile.add_step("fetch_oiers", "index_walk", query, [], scanned,
+                                    (time.perf_counter() - started) * 1000, plan)
+            step['survivors'] = len(rows)
+        return rows
+
+    query = f"SELECT uid, {order_by} FROM {_order_table(order_by)} WHERE uid IN (SELECT value FROM json_each(?))"
+    scores = run_step(cursor, profile, "rank_candidates", "heap", query, [json.dumps(sorted(candidate_uids))])
+    top = heapq.nsmallest(limit, scores, key=lambda row: _rank_key(row[1], row[0]))
+    return run_step(cursor, profile, "fetch_oiers", "fetch", fetch_query, [json.dumps([row[0] for row in top])])
+
+def iter_ranked(cursor, candidate_uids, limit=None, order_by=DEFAULT_ORDER_BY, batch_size=500):
+    """
+    与 fetch_ranked 顺序相同，但以每批至多 batch_size 行的方式逐批产出，不在内存中保留全部结果。
+    candidate_uids 为 None 表示全部 OIer。
+    """
+    order, source = order_clause(order_by), _ranked_source(order_by)
+    if candidate_uids is None:
+        query, values = f"SELECT OIer.* FROM {source} ORDER BY {order}", []
+    elif not candidate_uids:
+        return
+    else:
+        query = f"SELECT OIer.* FROM {source} WHERE uid IN (SELECT value FROM json_each(?)) ORDER BY {order}"
+        values = [json.dumps(sorted(candidate_uids))]
+    if limit is not None:
+        query += " LIMIT ?"
+        values.append(limit)
+    cursor.execute(query, values)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield rows
+
+RECORD_COLUMNS = ('contest_id', 'contest_name', 'contest_type', 'year', 'level', 'score', 'rank', 'province', 'school_name')
+# 结果页中每个 OIer 最多附带的匹配记录条数
+DEFAULT_RECORDS_PER_OIER = 5
+
+def build_records_query(constraints=None, per_oier=None):
+    """
+    一批 OIer (json_each 参数) 的记录查询，按 uid、年份排列，返回 (query, values)。
+    给出 constraints 时只保留满足其中任一条件的记录；给出 per_oier 时每人只保留最近的 per_oier 条，
+    并在最后一列给出截断前的条数。
+    """
+    where_clause, values = "r.oier_uid IN (SELECT value FROM json_each(?))", []
+    if constraints:
+        clauses = []
+        for constraint in constraints:
+            clause, clause_values = build_where_clause_and_values(constraint)
+            clauses.append(f"({clause})")
+            values.extend(clause_values)
+        where_clause += f" AND ({' OR '.join(clauses)})"
+    select = "SELECT r.oier_uid, r.contest_id, c.name, c.type, c.year, r.level, r.score, r.rank, r.province, s.name"
+    joins = "FROM Record r JOIN Contest c ON r.contest_id = c.id LEFT JOIN School s ON r.school_id = s.id"
+    if per_oier is None:
+        return f"{select} {joins} WHERE {where_clause} ORDER BY r.oier_uid, c.year, c.id", values
+    windowed = (f"{select}, ROW_NUMBER() OVER (PARTITION BY r.oier_uid ORDER BY c.year DESC, c.id DESC) AS n, "
+                f"COUNT(*) OVER (PARTITION BY r.oier_uid) AS total {joins} WHERE {where_clause}")
+    # 外层按列序号排序: oier_uid, year, contest_id
+    return f"SELECT * FROM ({windowed}) WHERE n <= ? ORDER BY 1, 5, 2", values + [per_oier]
+
+def records_for_oiers(cursor, uids):
+    """一次查询取出一批 OIer 的全部记录，返回 {uid: [记录字典, ...]}，按比赛年份排列"""
+    records = {uid: [] for uid in uids}
+    if not records:
+        return records
+    query, values = build_records_query()
+    cursor.execute(query, [json.dumps(list(records))] + values)
+    for row in cursor.fetchall():
+        records[row[0]].append(dict(zip(RECORD_COLUMNS, row[1:])))
+    return records
+
+def matching_records(config, cursor, uids, per_oier=DEFAULT_RECORDS_PER_OIER, profile=None, versions=None):
+    """
+    一次查询取出结果页中各 OIer 满足 config 中任一记录条件 (含 all_of / any_of 中的) 的记录 (没有记录条件时为全部记录)，
+    每人最多 per_oier 条 (最近的比赛)。返回 ({uid: [记录字典, ...]}, {uid: 匹配记录总数})。
+    """
+    records, totals = {uid: [] for uid in uids}, {}
+    if not records:
+        return records, totals
+    config = school_catalog.resolve_config(cursor, config or {}, versions)
+    # 条件组中 none_of 之下的条件描述的是不应出现的记录，不用于挑选展示的记录
+    constraints = [c for c, negated in constraint_tree.leaves(constraint_tree.build_tree(config)) if not negated]
+    query, values = build_records_query(constraints or None, per_oier)
+    rows = run_step(cursor, profile, "fetch_records", "enrich", query, [json.dumps(list(records))] + values)
+    for row in rows:
+        records[row[0]].append(dict(zip(RECORD_COLUMNS, row[1:len(RECORD_COLUMNS) + 1])))
+        totals[row[0]] = row[-1]
+    return records, totals
+
+def find_oiers(config, cursor, profile=None, limit=None, order_by=DEFAULT_ORDER_BY, versions=None):
     # ... (这个函数也和 oierfinder.py 中的几乎一样) ...
     # 唯一的区别是，它只接受 config 和 cursor，并返回结果列表
+    # 传入 QueryProfile 时会记录每个步骤的执行情况
+    # limit 为 None 时返回全部结果，否则只返回按 order_by 降序排列的前 limit 名
+    # versions 为调用方已读取的 db_meta.Versions；整个查询只读一次 Meta 表，再传给各 for_cursor
+    order_clause(order_by)
+    started = time.perf_counter()
+    try:
+        return _find_oiers(config, cursor, profile, limit, order_by, versions or read_versions(cursor))
+    finally:
+        if profile is not None:
+            profile.total_ms = (time.perf_counter() - started) * 1000
+
+def build_oier_conditions(config):
+    """OIer 表上的条件 (入学年份/当前年级/派生指标)，返回 (conditions, values)"""
+    conditions, binder = query_plan.compile_oier_conditions(config)
+    return list(conditions), query_plan.bind_values(binder, config)
+
+def build_record_query(constraint, candidate_uids=None):
+    """记录条件对应的 SQL；给出 candidate_uids 时为枚举模式 (候选 uid 以一个 JSON 参数传入，SQL 文本不随人数变化)"""
+    return query_plan.record_step(constraint).query(constraint, candidate_uids)
+
+def _find_oiers(config, cursor, profile, limit, order_by, versions):
+    candidate_uids = find_candidates(config, cursor, profile, versions)
+    if candidate_uids is not None and not candidate_uids: return []
+    return fetch_ranked(cursor, profile, candidate_uids, limit, order_by, versions)
+
+def find_search_candidates(cursor, profile, config, step_prefix="", versions=None):
+    """
+    姓名/首字母/学校条件 (见 utils/text_search.py) 的 uid 交集；没有此类条件时返回 None。
+    这些条件选择性极高，总是最先执行。
+    """
+    candidate_uids = None
+    for name, mode, query, values in text_search.search_queries(cursor, config, versions):
+        rows = run_step(cursor, profile, f"{step_prefix}{name}", mode, query, values)
+        uids = {row[0] for row in rows}
+        candidate_uids = uids if candidate_uids is None else candidate_uids & uids
+        if profile is not None: profile.steps[-1]['survivors'] = len(candidate_uids)
+        if not candidate_uids: break
+    return candidate_uids
+
+def filter_oiers(cursor, profile, name, oier_conditions, oier_values, candidate_uids=None):
+    """OIer 表上的条件；已有候选集时只检查候选 uid"""
+    where_clause, values = " AND ".join(oier_conditions), list(oier_values)
+    if candidate_uids is not None:
+        where_clause += " AND uid IN (SELECT value FROM json_each(?))"
+        values.append(json.dumps(sorted(candidate_uids)))
+    rows = run_step(cursor, profile, name, "filter", f"SELECT uid FROM OIer WHERE {where_clause}", values)
+    uids = {row[0] for row in rows}
+    if profile is not None: profile.steps[-1]['survivors'] = len(uids)
+    return uids
+
+def find_candidates(config, cursor, profile=None, versions=None):
+    """求出满足 config 全部条件的 uid 集合；config 没有任何条件时返回 None，表示全部 OIer"""
     if not config: config = {}
+    versions = versions or read_versions(cursor)
 
-    initial_candidates = None
-    oier_conditions, oier_values = [], []
-
-    if config.get('enroll_year_range') and any(v is not None for v in config['enroll_year_range']):
-        min_yr, max_yr = config['enroll_year_range']
-        if min_yr is not None: oier_conditions.append("enroll_middle >= ?"); oier_values.append(min_yr)
-        if max_yr is not None: oier_conditions.append("enroll_middle <= ?"); oier_values.append(max_yr)
-            
-    if config.get('grade_range') and any(v is not None for v in config['grade_range']):
-        min_grade, max_grade = config['grade_range']
-        current_year = date.today().year
-        if max_grade is not None: oier_conditions.append("enroll_middle >= ?"); oier_values.append(current_year - max_grade + 7)
-        if min_grade is not None: oier_conditions.append("enroll_middle <= ?"); oier_values.append(current_year - min_grade + 7)
-
-    if oier_conditions:
-        where_clause = " AND ".join(oier_conditions)
-        query = f"SELECT uid FROM OIer WHERE {where_clause}"
-        cursor.execute(query, oier_values)
-        initial_candidates = {row[0] for row in cursor.fetchall()}
-    
-    candidate_uids = initial_candidates
-    record_constraints = config.get('records', [])
-    enumeration_mode = bool(candidate_uids and len(candidate_uids) < ENUMERATE_THRESHOLD)
+    config = school_catalog.resolve_config(cursor, config, versions)
+    candidate_uids = find_search_candidates(cursor, profile, config, versions=versions)
+    # 同形状的 config 共用编译好的计划 (见 utils/query_plan.py)，这里只绑定取值
+    tree = constraint_tree.build_tree(config)
+    plan = query_plan.plan_for(config, tree)
+    oier_conditions = plan.oier_conditions
+    oier_values, tree = plan.bind(config, tree)
+
+    if oier_conditions and (candidate_uids is None or candidate_uids):
+        candidate_uids = filter_oiers(cursor, profile, "oier_filter", oier_conditions, oier_values, candidate_uids)
     
-    for constraint in record_constraints:
-        where_clause, values = build_where_clause_and_values(constraint)
-        if enumeration_mode and candidate_uids:
-            placeholders = ', '.join(['?'] * len(candidate_uids))
-            where_clause += f" AND r.oier_uid IN ({placeholders})"
-            values.extend(list(candidate_uids))
-        query = f"SELECT DISTINCT r.oier_uid FROM Record r JOIN Contest c ON r.contest_id = c.id WHERE {where_clause}"
-        cursor.execute(query, values)
-        uids_for_this_constraint = {row[0] for row in cursor.fetchall()}
-        if candidate_uids is None: candidate_uids = uids_for_this_constraint
-        else: candidate_uids.intersection_update(uids_for_this_constraint)
-        if not enumeration_mode and candidate_uids and len(candidate_uids) < ENUMERATE_THRESHOLD: enumeration_mode = True
-        if not candidate_uids: break
+    if not constraint_tree.is_empty(tree) and (candidate_uids is None or candidate_uids):
+        candidate_uids = ConstraintEvaluator(cursor, profile, versions=versions).all_of(tree[1], candidate_uids)
 
-    if candidate_uids is None:
-        if not oier_conditions and not record_constraints:
-            cursor.execute("SELECT * FROM OIer ORDER BY oierdb_score DESC")
-        else: return []
-    elif not candidate_uids: return []
+    if candidate_uids is None and (oier_conditions or not constraint_tree.is_empty(tree)):
+        return set()
+    return candidate_uids
+
+class ConstraintEvaluator:
+    """
+    用集合运算对条件树 (见 utils/constraint_tree.py) 求值，树的叶子为 query_plan.BoundStep。
+    各方法接受当前候选集 (None 表示全部 OIer)，返回其中满足条件的 uid 集合；候选集为空时立即返回，不再执行剩余的子条件。
+    """
+    def __init__(self, cursor, profile=None, step_prefix="record_constraint_", versions=None):
+        self.cursor = cursor
+        self.profile = profile
+        # 代价模型与倒排索引在整个查询中只按数据版本查找一次
+        versions = versions or read_versions(cursor)
+        self.model = cost_model.for_cursor(cursor, versions)
+        self.index = award_index.for_cursor(cursor, versions)
+        self.step_prefix = step_prefix
+        self.steps = 0
+
+    def estimate(self, node):
+        """节点命中记录数的粗略估计，用于安排求值顺序"""
+        kind, payload = node
+        if kind == 'leaf': return self.model.estimate_scan_rows(payload.constraint)
+        if kind == 'any_of': return sum(self.estimate(child) for child in payload)
+        if kind == 'all_of': return min((self.estimate(child) for child in payload if child[0] != 'none_of'), default=float('inf'))
+        return float('inf')
+
+    def evaluate(self, node, candidate_uids):
+        kind, payload = node
+        if kind == 'leaf': return self.leaf(payload, candidate_uids)
+        return getattr(self, kind)(payload, candidate_uids)
+
+    def leaf(self, bound, candidate_uids):
+        """单个记录条件；由代价模型在合并倒排表、扫描与按候选 uid 枚举 (已有候选集时) 之间选择"""
+        if candidate_uids is not None and not candidate_uids: return set()
+        step, constraint = bound.step, bound.constraint
+        name, uids = f"{self.step_prefix}{self.steps}", None
+        self.steps += 1
+        postings = postings_size(constraint, self.index, self.model) if step.postings else None
+        mode, costs = self.model.choose(constraint, None if candidate_uids is None else len(candidate_uids), postings)
+        if mode == "postings":
+            uids = lookup_postings(self.cursor, self.profile, name, constraint, self.index, self.model)
+        if uids is None:
+            query, values = step.query(constraint, candidate_uids if mode == "enumerate" else None)
+            rows = run_step(self.cursor, self.profile, name, mode, query, values)
+            uids = {row[0] for row in rows}
+        if candidate_uids is not None: uids &= candidate_uids
+        if self.profile is not None: self.profile.steps[-1].update(survivors=len(uids), cost=costs)
+        return uids
+
+    def all_of(self, children, candidate_uids):
+        """先按估计命中数从小到大求交集，再在缩小后的候选集上减去 none_of"""
+        children = [child for child in children if not constraint_tree.is_empty(child)]
+        positive = sorted((c for c in children if c[0] != 'none_of'), key=self.estimate)
+        for child in positive:
+            if candidate_uids is not None and not candidate_uids: return set()
+            candidate_uids = self.evaluate(child, candidate_uids)
+        for child in children:
+            if child[0] == 'none_of':
+                candidate_uids = self.none_of(child[1], candidate_uids)
+        return candidate_uids
+
+    def any_of(self, children, candidate_uids):
+        """并集；已有候选集时后面的子条件只检查尚未命中的候选，候选全部命中后停止"""
+        children = [child for child in children if not constraint_tree.is_empty(child)]
+        if not children: return candidate_uids
+        matched, remaining = set(), None if candidate_uids is None else set(candidate_uids)
+        for child in sorted(children, key=self.estimate, reverse=True):
+            if remaining is not None and not remaining: break
+            uids = self.evaluate(child, remaining)
+            matched |= uids
+            if remaining is not None: remaining -= uids
+        return matched
+
+    def none_of(self, children, candidate_uids):
+        """候选集减去满足任一子条件的 uid；没有候选集时以全部 OIer 为候选"""
+        if candidate_uids is None:
+            rows = run_step(self.cursor, self.profile, "all_oiers", "filter", "SELECT uid FROM OIer", [])
+            candidate_uids = {row[0] for row in rows}
+        if not candidate_uids: return set()
+        return candidate_uids - self.any_of(children, candidate_uids)
+
+LIST_FIELDS = ('province', 'level_range', 'contest_type')
+_ALL_OIERS = object()  # 批量查询中表示「无任何条件，返回全部 OIer」
+
+def _batch_top_k(cursor, profile, candidates_per_config, limits):
+    """
+    按 limits 只保留每个 config 排序后的前 limit 名 uid，使批量查询只取出被选中的完整行：
+    全部 OIer 沿排序索引取前 limit 个 uid，其余候选集先取出排序列再用有界堆选出前 limit 名。
+    """
+    order = order_clause(DEFAULT_ORDER_BY)
+    pending = set()
+    for candidate_uids, limit in zip(candidates_per_config, limits):
+        if limit is not None and candidate_uids is not _ALL_OIERS and len(candidate_uids) > limit:
+            pending |= candidate_uids
+    scores = {}
+    if pending:
+        rows = run_step(cursor, profile, "batch_rank_candidates", "heap",
+                        f"SELECT uid, {DEFAULT_ORDER_BY} FROM OIer WHERE uid IN (SELECT value FROM json_each(?))",
+                        [json.dumps(sorted(pending))])
+        scores = {row[0]: _rank_key(row[1], row[0]) for row in rows}
+
+    selected = []
+    for candidate_uids, limit in zip(candidates_per_config, limits):
+        if limit is None:
+            selected.append(candidate_uids)
+        elif candidate_uids is _ALL_OIERS:
+            rows = run_step(cursor, profile, "batch_top_k", "top_k", f"SELECT uid FROM OIer ORDER BY {order} LIMIT ?", [limit])
+            selected.append({row[0] for row in rows})
+        elif len(candidate_uids) > limit:
+            selected.append(set(heapq.nsmallest(limit, candidate_uids, key=scores.__getitem__)))
+        else:
+            selected.append(candidate_uids)
+    return selected
+
+def normalize_constraint(constraint):
+    """把记录条件规范化为可哈希的键：语义相同的条件 (列表顺序、重复值不同) 得到相同的键"""
+    normalized = dict(constraint)
+    for field in LIST_FIELDS:
+        if normalized.get(field) and normalized[field][0] is not None:
+            normalized[field] = sorted(set(normalized[field]), key=str)
+    where_clause, values = build_where_clause_and_values(normalized)
+    return where_clause, tuple(values)
+
+def find_oiers_batch(configs, cursor, profile=None, limits=None, versions=None):
+    """
+    批量查询：对整批 config 中规范化后相同的条件只求值一次，再用集合交集得到每个 config 的结果。
+    limits[i] 不为 None 时第 i 个 config 只取按 oierdb_score 排序的前 limits[i] 名。
+    返回 (results, stats)，results[i] 与 find_oiers(configs[i], limit=limits[i]) 的结果一致。
+    """
+    started = time.perf_counter()
+    versions = versions or read_versions(cursor)
+    configs = [school_catalog.resolve_config(cursor, config or {}, versions) for config in configs]
+    stats = {
+        'configs': len(configs), 'constraints_total': 0, 'constraints_unique': 0,
+        'evaluations': 0, 'shared_hits': 0, 'oier_filters_total': 0, 'oier_filters_unique': 0,
+        'fetched_oiers': 0, 'elapsed_ms': 0.0,
+    }
+
+    # 统计每个条件在整批中出现的次数，出现多次的条件完整扫描一次后共享
+    plans, occurrences = [], {}
+    for config in configs:
+        # 含条件组的 config 单独求值，不参与条件共享
+        grouped = constraint_tree.has_groups(config)
+        keys = [] if grouped else [normalize_constraint(constraint) for constraint in config.get('records', [])]
+        plans.append(keys)
+        for key in set(keys):
+            occurrences[key] = occurrences.get(key, 0) + 1
+    stats['constraints_total'] = sum(len(keys) for keys in plans)
+    stats['constraints_unique'] = len(occurrences)
+
+    model = cost_model.for_cursor(cursor, versions) if occurrences else None
+    index = award_index.for_cursor(cursor, versions) if occurrences else None
+    shared, oier_cache, candidates_per_config = {}, {}, []
+    for n, (config, keys) in enumerate(zip(configs, plans)):
+        if constraint_tree.has_groups(config):
+            candidate_uids = find_candidates(config, cursor, profile, versions)
+            candidates_per_config.append(_ALL_OIERS if candidate_uids is None else candidate_uids)
+            continue
+        candidate_uids = find_search_candidates(cursor, profile, config, f"config_{n}_", versions)
+        oier_conditions, oier_values = build_oier_conditions(config)
+        if oier_conditions:
+            stats['oier_filters_total'] += 1
+            oier_key = (" AND ".join(oier_conditions), tuple(oier_values))
+            if oier_key not in oier_cache:
+                rows = run_step(cursor, profile, f"batch_oier_filter_{len(oier_cache)}", "filter",
+                                f"SELECT uid FROM OIer WHERE {oier_key[0]}", oier_values)
+                oier_cache[oier_key] = frozenset(row[0] for row in rows)
+            candidate_uids = set(oier_cache[oier_key]) if candidate_uids is None else candidate_uids & oier_cache[oier_key]
+
+        for key, constraint in zip(keys, config.get('records', [])):
+            if candidate_uids is not None and not candidate_uids: break
+            if key in shared:
+                stats['shared_hits'] += 1
+                uids = shared[key]
+            elif occurrences[key] > 1:
+                # 共享的条件完整求值一次 (不限于某个 config 的候选集)，只在倒排表与扫描之间选择
+                mode, _ = model.choose(constraint, None, postings_size(constraint, index, model))
+                uids = None
+                if mode == "postings":
+                    uids = lookup_postings(cursor, profile, f"batch_constraint_{len(shared)}", constraint, index, model)
+                if uids is None:
+                    query, values = build_record_query(constraint)
+                    rows = run_step(cursor, profile, f"batch_constraint_{len(shared)}", "shared_scan", query, values)
+                    uids = {row[0] for row in rows}
+                uids = shared[key] = frozenset(uids)
+                stats['evaluations'] += 1
+            else:
+                mode, _ = model.choose(constraint, None if candidate_uids is None else len(candidate_uids),
+                                       postings_size(constraint, index, model))
+                uids = None
+                if mode == "postings":
+                    uids = lookup_postings(cursor, profile, f"config_{n}_constraint", constraint, index, model)
+                if uids is None:
+                    query, values = build_record_query(constraint, candidate_uids if mode == "enumerate" else None)
+                    rows = run_step(cursor, profile, f"config_{n}_constraint", mode, query, values)
+                    uids = {row[0] for row in rows}
+                stats['evaluations'] += 1
+            candidate_uids = set(uids) if candidate_uids is None else candidate_uids & uids
+
+        if candidate_uids is None and not oier_conditions and not keys:
+            candidate_uids = _ALL_OIERS
+        candidates_per_config.append(candidate_uids or set())
+    stats['oier_filters_unique'] = len(oier_cache)
+    if limits is not None and any(limit is not None for limit in limits):
+        candidates_per_config = _batch_top_k(cursor, profile, candidates_per_config, limits)
+
+    # 所有 config 的结果一次性取出，再按 oierdb_score 的顺序分发
+    if any(c is _ALL_OIERS for c in candidates_per_config):
+        rows = run_step(cursor, profile, "batch_fetch_oiers", "fetch", f"SELECT * FROM OIer ORDER BY {order_clause(DEFAULT_ORDER_BY)}", [])
     else:
-        placeholders = ', '.join(['?'] * len(candidate_uids))
-        query = f"SELECT * FROM OIer WHERE uid IN ({placeholders}) ORDER BY oierdb_score DESC"
-        cursor.execute(query, list(candidate_uids))
-    return cursor.fetchall()
\ No newline at end of file
+        union = set().union(*candidates_per_config) if candidates_per_config else set()
+        rows = run_step(cursor, profile, "batch_fetch_oiers", "fetch",
+                        f"SELECT * FROM OIer WHERE uid IN (SELECT value FROM json_each(?)) ORDER BY {order_clause(DEFAULT_ORDER_BY)}",
+                        [json.dumps(sorted(union))]) if union else []
+    stats['fetched_oiers'] = len(rows)
+
+    results, position = [], {row[0]: i for i, row in enumerate(rows)}
+    for candidate_uids in candidates_per_config:
+        if candidate_uids is _ALL_OIERS: results.append(list(rows))
+        else: results.append([rows[i] for i in sorted(position[uid] for uid in candidate_uids)])
+
+    stats['elapsed_ms'] = (time.perf_counter() - started) * 1000
+    if profile is not None: profile.total_ms = stats['elapsed_ms']
+    return results, stats
@@ -0,0 +1,166 @@
+# metrics.py
+"""
+查询服务的运行指标 (Prometheus 文本格式) 与慢查询日志。
+
+指标保存在进程内 (多个 gunicorn worker 各自计数，由 Prometheus 按实例汇总)：
+    oierfinder_request_duration_seconds{endpoint, query_type}   请求耗时直方图
+    oierfinder_engine_phase_seconds{phase}                       查询步骤耗时直方图 (按 QueryProfile 中的步骤模式)
+    oierfinder_result_rows{endpoint}                             结果人数直方图
+    oierfinder_cache_requests_total{cache, result}               各类缓存的命中 (hit) / 未命中 (miss) 次数
+    oierfinder_cache_entries{cache}                              各类进程内缓存当前的条目数
+    oierfinder_admission_total{decision}                         准入控制的决定 (run / top_k / rejected / timeout)
+    oierfinder_data_version_info{version}                        当前数据版本
+    oierfinder_slow_queries_total{endpoint}                      写入慢查询日志的请求数
+
+ETag 的命中在请求中计数；查询计划缓存 (plan / plan_step) 自己维护累计次数，在 /metrics 被抓取时由 observe_cache 读入。
+
+耗时超过阈值的请求以 JSON 行写入滚动日志：规范化的 config、各查询步骤与总耗时。
+记录一次请求只是几次加锁的计数，开销见 bench/metrics_overhead.py。
+"""
+import bisect
+import json
+import logging
+import logging.handlers
+import threading
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 10, 100, 500, 1000, 5000, 10000, 50000, 100000)
+# 慢查询日志中每个步骤的 SQL 最多保留的字符数 (枚举模式的 SQL 含大量占位符)
+MAX_SQL_LENGTH = 500
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+class Counter:
+    def __init__(self, name, documentation, labels=()):
+        self.name, self.documentation, self.labels = name, documentation, tuple(labels)
+        self.type = 'counter'
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def set(self, *labels, value):
+        with self.lock:
+            self.values[labels] = value
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, self.labels, key, value) for key, value in sorted(self.values.items())]
+
+
+class Gauge(Counter):
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self.type = 'gauge'
+
+    def replace(self, *labels, value):
+        """只保留这一组标签 (例如数据版本切换后去掉旧版本)"""
+        with self.lock:
+            self.values = {labels: value}
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.documentation, self.labels = name, documentation, tuple(labels)
+        self.type = 'histogram'
+        self.buckets = tuple(buckets)
+        self.values = {}  # labels -> [各桶计数 (非累计)..., +Inf 桶计数, 总和]
+        self.lock = threading.Lock()
+
+    def observe(self, *labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts = self.values.get(labels)
+            if counts is None:
+                counts = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def samples(self):
+        with self.lock:
+            items = [(key, list(counts)) for key, counts in sorted(self.values.items())]
+        samples = []
+        for key, counts in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                samples.append((f"{self.name}_bucket", self.labels + ('le',), key + (le,), cumulative))
+            samples.append((f"{self.name}_sum", self.labels, key, counts[-1]))
+            samples.append((f"{self.name}_count", self.labels, key, cumulative))
+        return samples
+
+
+REQUEST_DURATION = Histogram('oierfinder_request_duration_seconds', "请求耗时", ('endpoint', 'query_type'))
+ENGINE_PHASE = Histogram('oierfinder_engine_phase_seconds', "查询步骤耗时", ('phase',))
+RESULT_ROWS = Histogram('oierfinder_result_rows', "结果人数", ('endpoint',), buckets=ROW_BUCKETS)
+CACHE_REQUESTS = Counter('oierfinder_cache_requests_total', "缓存命中与未命中次数", ('cache', 'result'))
+CACHE_ENTRIES = Gauge('oierfinder_cache_entries', "进程内缓存当前的条目数", ('cache',))
+ADMISSION = Counter('oierfinder_admission_total', "准入控制的决定", ('decision',))
+DATA_VERSION = Gauge('oierfinder_data_version_info', "当前数据版本", ('version',))
+SLOW_QUERIES = Counter('oierfinder_slow_queries_total', "写入慢查询日志的请求数", ('endpoint',))
+
+REGISTRY = [REQUEST_DURATION, ENGINE_PHASE, RESULT_ROWS, CACHE_REQUESTS, CACHE_ENTRIES, ADMISSION, DATA_VERSION, SLOW_QUERIES]
+
+
+def render():
+    """全部指标的 Prometheus 文本格式"""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for name, label_names, label_values, value in metric.samples():
+            lines.append(f"{name}{_format_labels(label_names, label_values)} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+def observe_cache(cache, info):
+    """写入自己维护累计命中次数的缓存：info 为 {'hits', 'misses', 'size'} (例如 query_plan.cache_info() 的一项)"""
+    CACHE_REQUESTS.set(cache, 'hit', value=info['hits'])
+    CACHE_REQUESTS.set(cache, 'miss', value=info['misses'])
+    CACHE_ENTRIES.set(cache, value=info['size'])
+
+
+def observe_profile(profile):
+    """把 QueryProfile 中各步骤的耗时按模式 (scan / enumerate / postings / fts / ...) 计入直方图"""
+    if profile is None:
+        return
+    for step in profile.steps:
+        ENGINE_PHASE.observe(step['mode'], value=step['elapsed_ms'] / 1000)
+
+
+class SlowQueryLog:
+    """耗时超过 threshold_ms 的请求写入滚动日志 (每个文件 max_bytes，保留 backup_count 个旧文件)"""
+
+    def __init__(self, path, threshold_ms, max_bytes=10 << 20, backup_count=5):
+        self.threshold_ms = threshold_ms
+        self.logger = logging.getLogger(f"oierfinder.slow_query.{path}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                           encoding='utf-8', delay=True)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self.logger.addHandler(handler)
+
+    def record(self, endpoint, elapsed_ms, config=None, profile=None, **extra):
+        """超过阈值时写入一行 JSON，返回是否写入"""
+        if self.threshold_ms is None or elapsed_ms < self.threshold_ms:
+            return False
+        entry = {'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'endpoint': endpoint,
+                 'elapsed_ms': round(elapsed_ms, 3), 'config': config, **extra}
+        if profile is not None:
+            entry['profile'] = [dict({key: step[key] for key in ('name', 'mode', 'rows', 'survivors', 'elapsed_ms')},
+                                     sql=step['sql'][:MAX_SQL_LENGTH]) for step in profile.steps]
+        self.logger.info(json.dumps(entry, ensure_ascii=False, default=str))
+        SLOW_QUERIES.inc(endpoint)
+        return True
@@ -0,0 +1,93 @@
+# oier_metrics.py
+"""
+每个 OIer 的派生指标表 OIerMetrics，由 create_db.py 在导入数据时从 Record 表聚合生成，每个 OIer 一行：
+    record_count                        获奖记录数
+    first_year / last_year              最早 / 最近一条记录的比赛年份 (没有记录时为 NULL)
+    <级别>_gold / _silver / _bronze     奖牌类比赛 (NOI、WC、CTSC、APIO) 的金/银/铜牌数
+    <级别>_first / _second / _third     联赛类比赛 (NOIP 提高、CSP-S、普及组) 的一/二/三等奖数
+    <级别>_best                         该级别的最好成绩: 3 = 金牌/一等奖, 2 = 银牌/二等奖, 1 = 铜牌/三等奖, 0 = 没有
+
+每一列都建有 (<列> DESC, uid) 索引，既用于区间筛选，也与 finder_engine.order_clause 的排序顺序一致。
+config 中的 metrics 键按列给出区间 [min, max]，例如至少一块 NOI 银牌、2018 年及以后首次获奖:
+    metrics: {noi_best: [2, null], first_year: [2018, null]}
+
+用法 (在仓库根目录，为已有的数据库重新生成指标表):
+    python -m utils.oier_metrics --db oier_data.db
+"""
+import argparse
+import sqlite3
+
+TABLE = 'OIerMetrics'
+MEDALS = (('gold', '金牌'), ('silver', '银牌'), ('bronze', '铜牌'))
+AWARDS = (('first', '一等奖'), ('second', '二等奖'), ('third', '三等奖'))
+# (级别, 比赛类型, 奖项)；NOIP 自 2020 年起不再分组，与此前的 NOIP提高 合为一级
+TIERS = (
+    ('noi', ('NOI',), MEDALS),
+    ('wc', ('WC',), MEDALS),
+    ('ctsc', ('CTSC',), MEDALS),
+    ('apio', ('APIO',), MEDALS),
+    ('noip', ('NOIP', 'NOIP提高'), AWARDS),
+    ('csp', ('CSP提高',), AWARDS),
+    ('junior', ('NOIP普及', 'CSP入门'), AWARDS),
+)
+COLUMNS = ('record_count', 'first_year', 'last_year') + tuple(
+    column for tier, _, levels in TIERS for column in [f"{tier}_{name}" for name, _ in levels] + [f"{tier}_best"])
+
+
+def _quoted(values):
+    return ', '.join(f"'{value}'" for value in values)
+
+
+def _aggregates():
+    """与 COLUMNS 一一对应的聚合表达式"""
+    expressions = ["COUNT(r.oier_uid)", "MIN(c.year)", "MAX(c.year)"]
+    for _, types, levels in TIERS:
+        in_tier = f"c.type IN ({_quoted(types)})"
+        expressions += [f"COUNT(CASE WHEN {in_tier} AND r.level = '{level}' THEN 1 END)" for _, level in levels]
+        ranks = ' '.join(f"WHEN '{level}' THEN {len(levels) - i}" for i, (_, level) in enumerate(levels))
+        expressions.append(f"COALESCE(MAX(CASE WHEN {in_tier} THEN CASE r.level {ranks} ELSE 0 END END), 0)")
+    return expressions
+
+
+def build(cursor, verbose=True):
+    """重新生成 OIerMetrics 表及其索引 (已存在时先删除)，返回行数"""
+    if verbose: print("Building OIer metrics...")
+    cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    definitions = ', '.join(f"{column} INTEGER" for column in COLUMNS)
+    cursor.execute(f"CREATE TABLE {TABLE} (uid INTEGER PRIMARY KEY, {definitions})")
+    cursor.execute(f'''
+    INSERT INTO {TABLE} (uid, {', '.join(COLUMNS)})
+    SELECT o.uid, {', '.join(_aggregates())}
+    FROM OIer o LEFT JOIN Record r ON r.oier_uid = o.uid LEFT JOIN Contest c ON r.contest_id = c.id
+    GROUP BY o.uid
+    ''')
+    rows = cursor.rowcount
+    for column in COLUMNS:
+        cursor.execute(f"CREATE INDEX idx_metrics_{column} ON {TABLE}({column} DESC, uid)")
+    if verbose: print(f"Inserted {rows} OIer metrics rows.")
+    return rows
+
+
+def check_column(column):
+    """校验指标列名 (列名会拼入 SQL)，不存在时抛出 ValueError"""
+    if column not in COLUMNS:
+        raise ValueError(f"不支持的指标: {column} (可选: {', '.join(COLUMNS)})")
+    return column
+
+
+def main():
+    parser = argparse.ArgumentParser(description="为已有的数据库重新生成每个 OIer 的派生指标表 OIerMetrics。")
+    parser.add_argument('--db', default='oier_data.db', help="SQLite 数据库文件路径 (默认为: oier_data.db)")
+    args = parser.parse_args()
+    conn = sqlite3.connect(args.db)
+    try:
+        build(conn.cursor())
+        conn.commit()
+        conn.execute(f"ANALYZE {TABLE}")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
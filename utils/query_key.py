@@ -0,0 +1,93 @@
+# query_key.py
+"""
+config 的规范形式，用于生成可缓存的查询 URL 与查询的哈希键。
+
+语义相同的 config (键的顺序、列表中值的顺序与重复、未设置的区间 [null, null]、单个值与单元素列表不同) 规范化后完全相同：
+    canonical_config(config)   规范化后的 config
+    encode_config(config)      规范形式的紧凑 URL 编码 (JSON → zlib → base64url)，decode_config 为其逆运算
+    config_hash(config)        规范形式的短哈希
+"""
+import base64
+import hashlib
+import json
+import zlib
+
+from utils import constraint_tree
+
+# 值为集合语义的键 (列表内为 "或" 关系，顺序与重复无关)
+SET_KEYS = ('province', 'level_range', 'contest_type', 'school', 'school_id', 'city', 'name', 'initials_prefix')
+# 解码后 JSON 的大小上限，防止压缩炸弹
+MAX_DECODED_BYTES = 1 << 20
+
+
+def _is_unset(value):
+    """None、空字符串、空列表与全为 None 的列表都表示不限制"""
+    if value is None or value == '':
+        return True
+    return isinstance(value, list) and all(v is None or v == '' for v in value)
+
+
+def _canonical_value(key, value):
+    if key in SET_KEYS:
+        values = value if isinstance(value, list) else [value]
+        return sorted({v for v in values if v is not None and v != ''}, key=lambda v: (str(type(v)), str(v)))
+    return value
+
+
+def _canonical_item(item):
+    """记录条件或条件组"""
+    if constraint_tree.is_group(item):
+        kind, items = next(iter(item.items()))
+        return {kind: [_canonical_item(child) for child in items] if isinstance(items, list) else items}
+    if not isinstance(item, dict):
+        return item
+    return {key: _canonical_value(key, value) for key, value in sorted(item.items()) if not _is_unset(value)}
+
+
+def canonical_config(config):
+    """规范化后的 config；记录条件列表保持原顺序 (空的记录条件 {} 表示「至少有一条记录」，不能去掉)"""
+    canonical = {}
+    for key, value in sorted((config or {}).items()):
+        if key in ('records',) + constraint_tree.GROUP_KEYS:
+            if isinstance(value, list) and value:
+                canonical[key] = [_canonical_item(item) for item in value]
+            elif not isinstance(value, list) and value is not None:
+                canonical[key] = value
+        elif key == 'metrics' and isinstance(value, dict):
+            # 派生指标的区间 {列: [min, max]}，未设置的区间去掉
+            ranges = {column: bounds for column, bounds in sorted(value.items()) if not _is_unset(bounds)}
+            if ranges:
+                canonical[key] = ranges
+        elif not _is_unset(value):
+            canonical[key] = _canonical_value(key, value)
+    return canonical
+
+
+def canonical_json(config):
+    return json.dumps(canonical_config(config), ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+
+
+def config_hash(config):
+    return hashlib.sha256(canonical_json(config).encode('utf-8')).hexdigest()[:16]
+
+
+def encode_config(config):
+    """规范形式的 URL 安全编码 (不含填充字符 =)"""
+    data = zlib.compress(canonical_json(config).encode('utf-8'), 9)
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def decode_config(text):
+    """encode_config 的逆运算；内容无效时抛出 ValueError"""
+    try:
+        data = base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+        decompressor = zlib.decompressobj()
+        raw = decompressor.decompress(data, MAX_DECODED_BYTES)
+        if decompressor.unconsumed_tail:
+            raise ValueError("查询参数过长")
+        config = json.loads(raw.decode('utf-8'))
+    except (ValueError, zlib.error, UnicodeDecodeError) as e:
+        raise ValueError(f"无法解析查询参数: {e}") from e
+    if not isinstance(config, dict):
+        raise ValueError("无法解析查询参数: 必须是 config 对象")
+    return config
@@ -0,0 +1,48 @@
+# query_log.py
+"""
+查询日志：按采样率把收到的查询 (规范化的 config 与排序、人数参数) 追加写入 JSONL 文件，供 bench/replay.py 回放。
+
+每行一个查询：
+    {"time": ..., "endpoint": "search", "config": {...}, "order_by": "oierdb_score", "limit": 500}
+    {"time": ..., "endpoint": "batch", "configs": [{...}, ...]}
+"""
+import json
+import random
+import threading
+import time
+
+
+class QueryLog:
+    """线程安全的 JSONL 查询日志；sample_rate 为记录的比例 (0~1)"""
+
+    def __init__(self, path, sample_rate=1.0, seed=None):
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(f"查询日志的采样率必须在 0 到 1 之间: {sample_rate}")
+        self.path = path
+        self.sample_rate = sample_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, **entry):
+        """按采样率写入一行，返回是否写入"""
+        with self.lock:
+            if self.random.random() >= self.sample_rate:
+                return False
+            line = json.dumps({'time': round(time.time(), 3), 'endpoint': endpoint, **entry}, ensure_ascii=False)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        return True
+
+
+def read(path):
+    """逐行读取查询日志，跳过空行与无法解析的行"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(entry, dict) and entry.get('endpoint') in ('search', 'export', 'batch'):
+                yield entry
@@ -0,0 +1,238 @@
+# query_plan.py
+"""
+查询计划缓存：把 config 编译为与具体取值无关的计划 (各步骤的 SQL 模板与参数绑定方式)，按 config 的形状缓存。
+
+形状只包含键与列表的长度 (以及哪些位置为 None)，不包含取值，例如
+    {'year_range': [2021, 2021], 'contest_type': ['NOI'], 'level_range': ['金牌']}
+    {'year_range': [2019, 2019], 'contest_type': ['CSP提高'], 'level_range': ['一等奖']}
+形状相同，共用同一个计划：不再拼接 SQL 字符串，SQL 文本保持不变，从而命中连接上的预编译语句缓存。
+按候选 uid 枚举时 uid 列表以一个 JSON 参数传入 (json_each)，SQL 文本不随候选人数变化。
+
+计划只描述「怎样查」；求值顺序与扫描/枚举的选择依赖取值与候选人数，仍在执行时由代价模型决定。
+"""
+import json
+from datetime import date
+
+from utils import award_index, constraint_tree, oier_metrics
+from utils.school_catalog import RESOLVED_KEY
+
+RANGE_FIELDS = (('year_range', 'c.year'), ('score_range', 'r.score'), ('rank_range', 'r.rank'))
+LIST_FIELDS = (('province', 'r.province'), ('level_range', 'r.level'), ('contest_type', 'c.type'))
+RECORD_QUERY = "SELECT DISTINCT r.oier_uid FROM Record r JOIN Contest c ON r.contest_id = c.id WHERE {}"
+ENUMERATE_CONDITION = " AND r.oier_uid IN (SELECT value FROM json_each(?))"
+# 缓存的计划个数上限，超过时清空 (不同形状的数量在实际流量中很少)
+MAX_PLANS = 4096
+
+_STEPS = {}
+_PLANS = {}
+_STATS = {'plans': {'hits': 0, 'misses': 0}, 'steps': {'hits': 0, 'misses': 0}}
+
+
+def _value_shape(key, value):
+    kind = type(value)
+    if kind is list or kind is tuple:
+        if key == RESOLVED_KEY:
+            # 学校 id 列表作为一个 JSON 参数传入，只区分 无匹配学校 / 有匹配学校
+            return bool(value)
+        return tuple([v is None for v in value])
+    if kind is str:
+        return 'str', len(value)
+    return kind
+
+
+def constraint_shape(constraint):
+    """记录条件的形状：各键 (按出现顺序，顺序不同只会多编译一次) 及其取值的形状"""
+    return tuple([(key, _value_shape(key, value)) for key, value in constraint.items()])
+
+
+def _metrics_shape(metrics):
+    """metrics 条件的形状：各列名 (列名会拼入 SQL) 及其区间中哪些位置为 None"""
+    if not isinstance(metrics, dict):
+        return type(metrics)
+    return tuple(sorted((column, _value_shape(column, value)) for column, value in metrics.items()))
+
+
+def _tree_shape(node):
+    kind, payload = node
+    if kind == 'leaf':
+        return kind, constraint_shape(payload)
+    return kind, tuple(_tree_shape(child) for child in payload)
+
+
+def bind_values(binder, source):
+    """按编译得到的绑定方式从 source 中取出 SQL 参数"""
+    values = []
+    for key, index, convert in binder:
+        value = source[key]
+        if index is not None:
+            value = value[index]
+        if convert is not None:
+            values.append(convert(value))
+        elif index is None:
+            values.extend(value)
+        else:
+            values.append(value)
+    return values
+
+
+def compile_where(constraint):
+    """
+    记录条件的 WHERE 子句与参数绑定方式，返回 (where_clause, binder)。
+    binder 中每项为 (键, 下标, 转换)：下标为 None 时取整个值 (列表展开为多个参数)，否则取该下标的元素。
+    """
+    conditions, binder = [], []
+    for field, column in RANGE_FIELDS:
+        if field in constraint and constraint[field]:
+            min_val, max_val = constraint[field]
+            if min_val is not None: conditions.append(f"{column} >= ?"); binder.append((field, 0, None))
+            if max_val is not None: conditions.append(f"{column} <= ?"); binder.append((field, 1, None))
+    for field, column in LIST_FIELDS:
+        if field in constraint and constraint[field] and constraint[field][0] is not None:
+            placeholders = ', '.join(['?'] * len(constraint[field]))
+            conditions.append(f"{column} IN ({placeholders})"); binder.append((field, None, None))
+    # 学校类条件由 school_catalog 解析为学校 id 列表 (见 utils/school_catalog.py)；空列表表示没有匹配的学校
+    if constraint.get(RESOLVED_KEY) is not None:
+        if constraint[RESOLVED_KEY]:
+            conditions.append("r.school_id IN (SELECT value FROM json_each(?))"); binder.append((RESOLVED_KEY, None, json.dumps))
+        else:
+            conditions.append("0")
+    return " AND ".join(conditions) if conditions else "1=1", tuple(binder)
+
+
+def _grade_to_enroll(grade):
+    """当前年级对应的初中入学年份 (每次绑定时按当天日期计算，跨年后自动更新)"""
+    return date.today().year - grade + 7
+
+
+def compile_oier_conditions(config):
+    """OIer 表上的条件 (入学年份/当前年级/派生指标)，返回 (conditions, binder)"""
+    conditions, binder = [], []
+    if config.get('enroll_year_range') and any(v is not None for v in config['enroll_year_range']):
+        min_yr, max_yr = config['enroll_year_range']
+        if min_yr is not None: conditions.append("enroll_middle >= ?"); binder.append(('enroll_year_range', 0, None))
+        if max_yr is not None: conditions.append("enroll_middle <= ?"); binder.append(('enroll_year_range', 1, None))
+    if config.get('grade_range') and any(v is not None for v in config['grade_range']):
+        min_grade, max_grade = config['grade_range']
+        if max_grade is not None: conditions.append("enroll_middle >= ?"); binder.append(('grade_range', 1, _grade_to_enroll))
+        if min_grade is not None: conditions.append("enroll_middle <= ?"); binder.append(('grade_range', 0, _grade_to_enroll))
+    metrics = _metric_ranges(config.get('metrics'))
+    if metrics:
+        # 派生指标表上的区间条件合为一个子查询 (见 utils/oier_metrics.py)，由各列的 (<列> DESC, uid) 索引回答
+        clauses = []
+        for column, (min_val, max_val) in metrics:
+            oier_metrics.check_column(column)
+            if min_val is not None: clauses.append(f"{column} >= ?"); binder.append(('metrics', None, _metric_bound(column, 0)))
+            if max_val is not None: clauses.append(f"{column} <= ?"); binder.append(('metrics', None, _metric_bound(column, 1)))
+        conditions.append(f"uid IN (SELECT uid FROM {oier_metrics.TABLE} WHERE {' AND '.join(clauses)})")
+    return tuple(conditions), tuple(binder)
+
+
+def _metric_ranges(metrics):
+    """metrics 条件中设置了上下限的 (列, [min, max])，按列名排列；格式错误时抛出 ValueError"""
+    if not metrics:
+        return []
+    if not isinstance(metrics, dict):
+        raise ValueError("metrics 应为 {指标: [min, max]} 的映射")
+    ranges = []
+    for column, value in sorted(metrics.items()):
+        if not isinstance(value, (list, tuple)) or len(value) != 2:
+            raise ValueError(f"指标 {column} 的区间应为 [min, max]")
+        if any(v is not None for v in value):
+            ranges.append((column, value))
+    return ranges
+
+
+def _metric_bound(column, index):
+    return lambda metrics: metrics[column][index]
+
+
+class RecordStep:
+    """一个记录条件的编译结果：WHERE 子句、扫描与枚举两种模式的 SQL、参数绑定方式、能否由倒排索引回答"""
+    __slots__ = ('where_clause', 'binder', 'scan_sql', 'enumerate_sql', 'postings')
+
+    def __init__(self, constraint):
+        self.where_clause, self.binder = compile_where(constraint)
+        self.scan_sql = RECORD_QUERY.format(self.where_clause)
+        self.enumerate_sql = RECORD_QUERY.format(self.where_clause + ENUMERATE_CONDITION)
+        self.postings = award_index.supports(constraint)
+
+    def bind(self, constraint):
+        return bind_values(self.binder, constraint)
+
+    def query(self, constraint, candidate_uids=None):
+        """返回 (query, values)；给出 candidate_uids 时为枚举模式"""
+        values = self.bind(constraint)
+        if candidate_uids is None:
+            return self.scan_sql, values
+        values.append(json.dumps(sorted(candidate_uids)))
+        return self.enumerate_sql, values
+
+
+class BoundStep:
+    """计划中的一个记录条件与其取值"""
+    __slots__ = ('step', 'constraint')
+
+    def __init__(self, step, constraint):
+        self.step = step
+        self.constraint = constraint
+
+
+class QueryPlan:
+    """
+    一个形状的 config 的计划：OIer 表条件 (oier_conditions / oier_binder) 与记录条件树 (叶子为 RecordStep)。
+    bind(config) 返回 (OIer 条件的参数, 叶子为 BoundStep 的条件树)。
+    """
+    __slots__ = ('shape', 'oier_conditions', 'oier_binder', 'tree')
+
+    def __init__(self, shape, config, tree):
+        self.shape = shape
+        self.oier_conditions, self.oier_binder = compile_oier_conditions(config)
+        self.tree = self._compile(tree)
+
+    def _compile(self, node):
+        kind, payload = node
+        if kind == 'leaf':
+            return kind, record_step(payload)
+        return kind, [self._compile(child) for child in payload]
+
+    def _bind(self, node, compiled):
+        kind, payload = node
+        if kind == 'leaf':
+            return kind, BoundStep(compiled[1], payload)
+        return kind, [self._bind(child, compiled_child) for child, compiled_child in zip(payload, compiled[1])]
+
+    def bind(self, config, tree=None):
+        if tree is None:
+            tree = constraint_tree.build_tree(config)
+        return bind_values(self.oier_binder, config), self._bind(tree, self.tree)
+
+
+def _remember(cache, stats, key, build):
+    value = cache.get(key)
+    if value is None:
+        stats['misses'] += 1
+        if len(cache) >= MAX_PLANS:
+            cache.clear()
+        value = cache[key] = build()
+    else:
+        stats['hits'] += 1
+    return value
+
+
+def record_step(constraint):
+    """返回记录条件的编译结果 (按形状缓存)"""
+    return _remember(_STEPS, _STATS['steps'], constraint_shape(constraint), lambda: RecordStep(constraint))
+
+
+def plan_for(config, tree=None):
+    """返回 config 的计划 (按形状缓存)；tree 为已解析的 constraint_tree.build_tree(config)"""
+    if tree is None:
+        tree = constraint_tree.build_tree(config)
+    shape = (tuple(_value_shape(key, config.get(key)) for key in ('enroll_year_range', 'grade_range')),
+             _metrics_shape(config.get('metrics')), _tree_shape(tree))
+    return _remember(_PLANS, _STATS['plans'], shape, lambda: QueryPlan(shape, config, tree))
+
+
+def cache_info():
+    """两级缓存 (整个 config 的计划与单个记录条件的编译结果) 的命中/未命中次数与当前缓存的个数"""
+    return {name: {**stats, 'size': len(cache)} for (name, stats), cache in zip(_STATS.items(), (_PLANS, _STEPS))}
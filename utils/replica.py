@@ -0,0 +1,113 @@
+# replica.py
+"""
+内存副本模式：启动时用 sqlite3 的 backup API 把 oier_data.db 整个复制到一个共享缓存的内存数据库，
+补建索引并执行 ANALYZE，并把快照 (utils/snapshot.py) 整个读入内存，之后所有查询都由内存回答，不再读磁盘。
+
+后台线程定期检查磁盘上数据库的数据版本与代价模型的校准版本 (Meta 表，见 utils/db_meta.py)；任一变化时在后台加载新副本，
+加载完成后再切换，切换前已打开的连接仍使用旧副本直到关闭。
+快照与相似度索引按数据版本只在进程中保留一份 (见 snapshot.preload)，只有校准版本变化时不重复读入。
+"""
+import itertools
+import sqlite3
+import threading
+import time
+
+from create_db import create_indexes
+from utils import similarity, snapshot
+from utils.db_meta import get_calibration_version, get_data_version, read_meta, write_meta
+
+DEFAULT_CHECK_INTERVAL = 60
+
+_replica_ids = itertools.count()
+
+
+def load_replica(db_file):
+    """把数据库复制到新的内存数据库，返回 (URI, 保活连接, 数据版本, 耗时毫秒)"""
+    started = time.perf_counter()
+    uri = f"file:oierfinder_replica_{next(_replica_ids)}?mode=memory&cache=shared"
+    keeper = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    source = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+    try:
+        source.backup(keeper)
+        version = get_data_version(source.cursor())
+    finally:
+        source.close()
+
+    cursor = keeper.cursor()
+    # 旧版数据库没有 Meta 表时写入磁盘文件的版本，让各处缓存在副本上同样按数据版本命中
+    if 'data_version' not in read_meta(cursor):
+        write_meta(cursor, {'data_version': version})
+    create_indexes(cursor, verbose=False)
+    cursor.execute("ANALYZE")
+    keeper.commit()
+    # 快照 (列数组与倒排表) 与相似度索引同样整个读入内存
+    snapshot.preload(db_file, version)
+    similarity.preload(db_file, version)
+    return uri, keeper, version, (time.perf_counter() - started) * 1000
+
+
+class Replica:
+    """当前的内存副本；connect() 返回指向它的新连接"""
+
+    def __init__(self, db_file, check_interval=DEFAULT_CHECK_INTERVAL):
+        self.db_file = db_file
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.calibration_version = self.disk_version()[1]
+        self.uri, self._keeper, self.data_version, self.load_ms = load_replica(db_file)
+        self.reloads = 0
+
+    def connect(self):
+        with self._lock:
+            uri = self.uri
+        conn = sqlite3.connect(uri, uri=True)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def disk_version(self):
+        """磁盘上数据库当前的 (数据版本, 校准版本)"""
+        conn = sqlite3.connect(f"file:{self.db_file}?mode=ro", uri=True)
+        try:
+            return get_data_version(conn.cursor()), get_calibration_version(conn.cursor())
+        finally:
+            conn.close()
+
+    def reload_if_changed(self):
+        """磁盘上的数据版本变化时加载新副本并切换，返回是否切换"""
+        try:
+            version, calibration = self.disk_version()
+        except sqlite3.Error:
+            # 数据库正在被重新生成，下次再检查
+            return False
+        if version == self.data_version and calibration == self.calibration_version:
+            return False
+        uri, keeper, version, load_ms = load_replica(self.db_file)
+        with self._lock:
+            old_keeper = self._keeper
+            self.uri, self._keeper, self.data_version, self.load_ms = uri, keeper, version, load_ms
+            self.calibration_version = calibration
+            self.reloads += 1
+        # 仍在使用旧副本的连接会让它保持存活，直到这些连接关闭
+        old_keeper.close()
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.reload_if_changed()
+            except (sqlite3.Error, OSError) as e:
+                print(f"内存副本重新加载失败: {e}")
+
+    def start_watching(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name='replica-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._keeper.close()
@@ -0,0 +1,105 @@
+# school_catalog.py
+"""
+学校目录：把记录条件中的学校类条件解析为学校 id 集合。
+
+记录条件中可以使用的键 (同时给出时取交集)：
+    school: 第二中学 / [第二中学, 外国语]     学校名包含任一片段
+    school_id: 123 / [123, 456]              学校 id
+    city: 杭州 / [杭州, 宁波]                 学校所在城市 (完整匹配)
+    school_score_range: [min, max]           学校评分区间
+
+解析结果以 school_ids (学校 id 的有序列表，可能为空) 写回条件，查询时用 Record(school_id, ...) 索引
+直接取出这些学校的记录，不需要扫描 Record 表。目录每个数据版本只加载一次，有快照时直接读取快照中的学校目录。
+"""
+from utils import constraint_tree, snapshot
+from utils.db_meta import read_versions
+
+SCHOOL_KEYS = ('school', 'school_id', 'city', 'school_score_range')
+# 解析后的条件中保存学校 id 列表的键
+RESOLVED_KEY = 'school_ids'
+
+_CATALOGS = {}
+
+
+def _as_list(value, key, types):
+    """单个值或列表规范化为列表；null 与空列表表示不限制，返回 None"""
+    if value is None:
+        return None
+    values = value if isinstance(value, list) else [value]
+    values = [v for v in values if v is not None and v != '']
+    if not all(isinstance(v, types) and not isinstance(v, bool) for v in values):
+        raise ValueError(f"记录条件中的 {key} 类型不正确: {value!r}")
+    return values or None
+
+
+class SchoolCatalog:
+    """全部学校 [(id, name, province, city, score), ...]"""
+
+    def __init__(self, schools):
+        self.schools = [tuple(row) for row in schools]
+
+    @classmethod
+    def load(cls, cursor, versions=None):
+        snap = snapshot.for_cursor(cursor, versions)
+        if snap is not None:
+            return cls(snap.schools())
+        return cls(cursor.execute("SELECT id, name, province, city, score FROM School").fetchall())
+
+    def match(self, constraint):
+        """条件中学校类键对应的学校 id 有序列表；条件不限制学校时返回 None"""
+        names = _as_list(constraint.get('school'), 'school', str)
+        ids = _as_list(constraint.get('school_id'), 'school_id', int)
+        cities = _as_list(constraint.get('city'), 'city', str)
+        score_range = constraint.get('school_score_range') or [None, None]
+        if len(score_range) != 2 or any(v is not None and not isinstance(v, (int, float)) for v in score_range):
+            raise ValueError(f"记录条件中的 school_score_range 必须是 [min, max]: {score_range!r}")
+        low, high = score_range
+        if names is None and ids is None and cities is None and low is None and high is None:
+            return None
+
+        ids, cities = set(ids) if ids is not None else None, set(cities) if cities is not None else None
+        matched = []
+        for school_id, name, _, city, score in self.schools:
+            if ids is not None and school_id not in ids: continue
+            if cities is not None and city not in cities: continue
+            if names is not None and not any(part in name for part in names): continue
+            if low is not None and (score is None or score < low): continue
+            if high is not None and (score is None or score > high): continue
+            matched.append(school_id)
+        return sorted(matched)
+
+    def resolve(self, constraint):
+        """
+        返回去掉学校类键的新条件，学校限制 (如果有) 写入 school_ids；已解析过的条件原样返回。
+        """
+        if not any(key in constraint for key in SCHOOL_KEYS):
+            return constraint
+        school_ids = self.match(constraint)
+        resolved = {k: v for k, v in constraint.items() if k not in SCHOOL_KEYS}
+        if school_ids is not None:
+            if RESOLVED_KEY in resolved:
+                school_ids = sorted(set(school_ids) & set(resolved[RESOLVED_KEY]))
+            resolved[RESOLVED_KEY] = school_ids
+        return resolved
+
+    def __len__(self):
+        return len(self.schools)
+
+
+def for_cursor(cursor, versions=None):
+    """返回当前数据库版本的学校目录 (每个数据版本只加载一次)。versions 见 snapshot.for_cursor"""
+    versions = versions or read_versions(cursor)
+    catalog = _CATALOGS.get(versions.data)
+    if catalog is None:
+        _CATALOGS.clear()
+        catalog = _CATALOGS[versions.data] = SchoolCatalog.load(cursor, versions)
+    return catalog
+
+
+def resolve_config(cursor, config, versions=None):
+    """返回各记录条件 (含条件组中的) 的学校类键都已解析为 school_ids 的 config (没有此类键时原样返回)"""
+    if not config:
+        return config
+    if not any(any(key in c for key in SCHOOL_KEYS) for c, _ in constraint_tree.leaves(constraint_tree.build_tree(config))):
+        return config
+    return constraint_tree.map_leaves(config, for_cursor(cursor, versions).resolve)
@@ -0,0 +1,312 @@
+# similarity.py
+"""
+相似 OIer 检索：按获奖经历 (参加的比赛、比赛+奖项、学校、年份) 找出与某个 OIer 最相似的人。
+
+离线构建 (create_db.py 或 python -m utils.similarity --db oier_data.db)：
+    每个 OIer 的记录转换为一组奖项词 (token)，计算 NUM_PERM 个哈希函数下的 MinHash 签名；
+    签名分为 BANDS 段、每段 NUM_PERM / BANDS 个值，某一段取值完全相同的两人落入同一个桶 (LSH)。
+    结果写入数据库旁的 <db>.similar (与快照相同的分段文件格式，见 utils/snapshot.py)：
+        tokens / token_offsets     按 uid 排列的有序 token id (CSR)，用于精确的 Jaccard 重排
+        bucket_of                  每个 uid 在各段所在的桶号 (按段依次排列，每段 uid_size 个；只有一人的桶不保存)
+        bucket_offsets / bucket_uids  各桶的成员 (CSR)，按桶号直接取出同桶的人
+        labels                     token 的可读描述 (JSON)
+
+查询 similar(cursor, uid, k) 只读取映射区，不扫描 OIer 表：取出与 uid 至少在一段同桶的候选，
+按同桶的段数取前 MAX_CANDIDATES 人，再按 token 集合的精确 Jaccard 系数重排。
+构建需要 numpy (可选依赖)，查询不需要。
+"""
+import argparse
+import array
+import json
+import sqlite3
+import sys
+import time
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:  # numpy 是可选依赖
+    np = None
+
+from utils import snapshot
+from utils.db_meta import database_path, get_data_version, read_versions
+
+MAGIC = b'OISIMI\x00\x01'
+FORMAT_VERSION = 1
+INDEX_SUFFIX = '.similar'
+# 128 个哈希值分为 32 段、每段 4 个：Jaccard 为 0.5 的两人至少同桶一次的概率约 87%，0.6 时约 99%，0.3 时约 23%。
+# 每段 2 个时低相似度的召回更高，但常见比赛使桶变大，候选人数与查询耗时约为 4 倍 (见 bench/similar.py)
+NUM_PERM = 128
+BANDS = 32
+SEED = 20240601
+# bucket_of 中表示「该段中没有同桶的人」
+NO_BUCKET = 0xffffffff
+# 参与精确重排的候选人数上限 (按同桶段数从多到少)
+MAX_CANDIDATES = 2000
+DEFAULT_K = 10
+# MinHash 使用 (a * x + b) mod P 形式的哈希，P 为梅森素数 2^31 - 1，乘积不超过 uint64
+PRIME = (1 << 31) - 1
+
+# 与快照相同: 只保留当前数据版本的索引；索引缺失或版本不一致时记下文件签名，文件变化后重新打开
+_INDEXES = {}
+_MISSES = {}
+
+
+def available():
+    """能否构建索引 (需要 numpy)"""
+    return np is not None
+
+
+def index_path(db_file):
+    return db_file + INDEX_SUFFIX
+
+
+def award_tokens(cursor):
+    """
+    每条记录产生的 token：比赛、比赛+奖项、学校 (有学校时)、年份。
+    返回 (uids, token_ids, labels)，前两者一一对应 (同一人的重复 token 在构建时去重)。
+    """
+    contests = {row[0]: (row[1], row[2]) for row in cursor.execute("SELECT id, name, year FROM Contest")}
+    schools = dict(cursor.execute("SELECT id, name FROM School").fetchall())
+    vocab, labels, uids, token_ids = {}, [], array.array('q'), array.array('q')
+
+    def token(key, label):
+        token_id = vocab.get(key)
+        if token_id is None:
+            token_id = vocab[key] = len(labels)
+            labels.append(label)
+        return token_id
+
+    for uid, contest_id, level, school_id in cursor.execute(
+            "SELECT oier_uid, contest_id, level, school_id FROM Record"):
+        name, year = contests.get(contest_id, (str(contest_id), None))
+        tokens = [token(('c', contest_id), name), token(('cl', contest_id, level), f"{name} {level}")]
+        if school_id is not None:
+            tokens.append(token(('s', school_id), schools.get(school_id, str(school_id))))
+        if year is not None:
+            tokens.append(token(('y', year), f"{year} 年"))
+        uids.extend([uid] * len(tokens))
+        token_ids.extend(tokens)
+    return uids, token_ids, labels
+
+
+def _to_array(typecode, values):
+    data = array.array(typecode)
+    data.frombytes(np.ascontiguousarray(values, dtype=snapshot.DTYPES[typecode]).tobytes())
+    return data
+
+
+def build(cursor, path, data_version, num_perm=NUM_PERM, bands=BANDS, seed=SEED):
+    """从数据库构建相似度索引文件，返回文件大小"""
+    if np is None:
+        raise RuntimeError("构建相似度索引需要 numpy (pip install numpy)")
+    if num_perm % bands:
+        raise ValueError(f"num_perm ({num_perm}) 必须是 bands ({bands}) 的整数倍")
+    rows = num_perm // bands
+
+    raw_uids, raw_tokens, labels = award_tokens(cursor)
+    max_oier = cursor.execute("SELECT MAX(uid) FROM OIer").fetchone()[0] or 0
+    # (uid, token) 打包为一个 int64 后去重并排序，得到按 uid 排列的有序 token 列表
+    pairs = np.unique((np.frombuffer(raw_uids, dtype=np.int64) << 32) | np.frombuffer(raw_tokens, dtype=np.int64))
+    uid_of, token_of = pairs >> 32, (pairs & 0xffffffff).astype(np.uint64)
+    uid_size = max(max_oier, int(uid_of.max()) if len(pairs) else 0) + 1
+    counts = np.bincount(uid_of, minlength=uid_size)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    members = np.flatnonzero(counts)
+
+    # 签名: 第 i 个哈希函数下每人 token 哈希值的最小值 (按 uid 分段取最小)
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, PRIME, num_perm, dtype=np.uint64)
+    b = rng.integers(0, PRIME, num_perm, dtype=np.uint64)
+    starts = offsets[members]
+    signatures = np.empty((len(members), num_perm), dtype=np.uint32)
+    for i in range(num_perm):
+        signatures[:, i] = np.minimum.reduceat((a[i] * token_of + b[i]) % PRIME, starts) if len(members) else []
+
+    # 每段的 rows 个签名值用 FNV-1a 合成一个 64 位桶键 (uint64 乘法按 2^64 回绕)。
+    # 只有一人的桶不会带来候选，不保存；其余的桶在全部段中统一编号，成员按桶号连续存放 (CSR)
+    bucket_of = np.full((bands, uid_size), NO_BUCKET, dtype=np.uint32)
+    bucket_members, bucket_sizes = [], []
+    with np.errstate(over='ignore'):
+        for band in range(bands):
+            key = np.full(len(members), 0xcbf29ce484222325, dtype=np.uint64)
+            for column in range(band * rows, (band + 1) * rows):
+                key = (key ^ signatures[:, column]) * np.uint64(0x100000001b3)
+            _, inverse, counts = np.unique(key, return_inverse=True, return_counts=True)
+            shared = counts > 1
+            bucket_ids = np.cumsum(shared) - 1 + sum(len(sizes) for sizes in bucket_sizes)
+            in_shared = shared[inverse]
+            bucket_of[band, members[in_shared]] = bucket_ids[inverse[in_shared]]
+            order = np.argsort(inverse[in_shared], kind='stable')
+            bucket_members.append(members[in_shared][order])
+            bucket_sizes.append(counts[shared])
+    sizes = np.concatenate(bucket_sizes) if bucket_sizes else np.empty(0, dtype=np.int64)
+    bucket_offsets = np.concatenate([[0], np.cumsum(sizes)])
+
+    sections = {
+        'tokens': _to_array('I', token_of),
+        'token_offsets': _to_array('I', offsets),
+        'bucket_of': _to_array('I', bucket_of.ravel()),
+        'bucket_offsets': _to_array('I', bucket_offsets),
+        'bucket_uids': _to_array('I', np.concatenate(bucket_members) if bucket_members else []),
+        'labels': array.array('B', json.dumps(labels, ensure_ascii=False).encode('utf-8')),
+    }
+    return snapshot.write_sections(path, MAGIC, {
+        'format': FORMAT_VERSION, 'data_version': data_version, 'uid_size': uid_size, 'members': len(members),
+        'buckets': len(sizes), 'num_perm': num_perm, 'bands': bands, 'seed': seed,
+    }, sections)
+
+
+class SimilarityIndex:
+    """以 mmap 打开的相似度索引；各数据段都是零拷贝视图"""
+
+    def __init__(self, path, in_memory=False):
+        self.file = snapshot.SectionFile(path, MAGIC, FORMAT_VERSION, in_memory)
+        header = self.file.header
+        self.data_version = self.file.data_version
+        self.uid_size, self.members, self.bands = header['uid_size'], header['members'], header['bands']
+        self.tokens = self.file.view('tokens')
+        self.token_offsets = self.file.view('token_offsets')
+        self.bucket_of = self.file.view('bucket_of')
+        self.bucket_offsets = self.file.view('bucket_offsets')
+        self.bucket_uids = self.file.view('bucket_uids')
+        self._labels = None
+
+    def token_ids(self, uid):
+        """uid 的有序 token id；不存在或没有记录时为空"""
+        if not 0 <= uid < self.uid_size:
+            return ()
+        return self.tokens[self.token_offsets[uid]:self.token_offsets[uid + 1]]
+
+    def labels(self, token_ids):
+        if self._labels is None:
+            self._labels = json.loads(bytes(self.file.view('labels')).decode('utf-8'))
+        return [self._labels[token_id] for token_id in token_ids]
+
+    def candidates(self, uid):
+        """与 uid 至少在一段同桶的人及同桶的段数 (不含 uid 本人)"""
+        collisions = Counter()
+        if not 0 <= uid < self.uid_size:
+            return collisions
+        for band in range(self.bands):
+            bucket = self.bucket_of[band * self.uid_size + uid]
+            if bucket != NO_BUCKET:
+                collisions.update(self.bucket_uids[self.bucket_offsets[bucket]:self.bucket_offsets[bucket + 1]])
+        del collisions[uid]
+        return collisions
+
+    def similar(self, uid, k=DEFAULT_K, max_candidates=MAX_CANDIDATES):
+        """返回 [(uid, Jaccard 系数, 共同的 token id)]，按 Jaccard 从高到低、同值时 uid 小者在前"""
+        query = set(self.token_ids(uid))
+        if not query:
+            return []
+        scored = []
+        for candidate, _ in self.candidates(uid).most_common(max_candidates):
+            tokens = self.token_ids(candidate)
+            shared = query.intersection(tokens)
+            scored.append((-len(shared) / (len(query) + len(tokens) - len(shared)), candidate, shared))
+        scored.sort(key=lambda item: item[:2])
+        return [(candidate, -score, sorted(shared)) for score, candidate, shared in scored[:k]]
+
+
+def open_index(path, in_memory=False):
+    """打开索引；文件不存在、格式不符或字节序不是小端时返回 None"""
+    if sys.byteorder != 'little':
+        return None
+    try:
+        return SimilarityIndex(path, in_memory)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def for_cursor(cursor, versions=None):
+    """返回与当前数据库版本一致的索引；没有索引文件或版本不一致时返回 None。versions 见 snapshot.for_cursor"""
+    version = (versions or read_versions(cursor)).data
+    index = _INDEXES.get(version)
+    if index is not None:
+        return index
+    path = database_path(cursor)
+    if not path:
+        return None
+    path = index_path(path)
+    signature = (path, snapshot.file_signature(path))
+    if _MISSES.get(version) == signature:
+        return None
+    index = open_index(path)
+    if index is None or index.data_version != version:
+        _MISSES.clear()
+        _MISSES[version] = signature
+        return None
+    _remember(version, index)
+    return index
+
+
+def _remember(version, index):
+    _INDEXES.clear()
+    _MISSES.clear()
+    _INDEXES[version] = index
+
+
+def preload(db_file, version):
+    """把索引整个读入内存并登记到该数据版本下 (内存副本模式使用)；该版本的索引已在内存中时不重复读取。返回是否成功"""
+    loaded = _INDEXES.get(version)
+    if loaded is not None and loaded.file.in_memory:
+        return True
+    index = open_index(index_path(db_file), in_memory=True)
+    if index is None or index.data_version != version:
+        return False
+    _remember(version, index)
+    return True
+
+
+def similar(cursor, uid, k=DEFAULT_K):
+    """
+    与 uid 获奖经历最相似的 k 人：返回 [{'oier', 'jaccard', 'shared'}]，oier 为 OIer 表的行，shared 为共同 token 的描述。
+    没有可用的索引时抛出 ValueError。
+    """
+    index = for_cursor(cursor)
+    if index is None:
+        raise ValueError("相似度索引不存在或与数据库版本不一致，请运行 python -m utils.similarity 重新构建")
+    matches = index.similar(uid, k)
+    if not matches:
+        return []
+    rows = {row[0]: row for row in cursor.execute(
+        "SELECT * FROM OIer WHERE uid IN (SELECT value FROM json_each(?))",
+        [json.dumps([candidate for candidate, _, _ in matches])]).fetchall()}
+    return [{'oier': rows[candidate], 'jaccard': jaccard, 'shared': index.labels(shared)}
+            for candidate, jaccard, shared in matches if candidate in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="构建相似 OIer 检索的 MinHash/LSH 索引，或查询与某个 OIer 相似的人。")
+    parser.add_argument('--db', default='oier_data.db', help="SQLite 数据库文件路径 (默认为: oier_data.db)")
+    parser.add_argument('--uid', type=int, help="查询与该 uid 相似的 OIer (不给出时构建索引)")
+    parser.add_argument('-k', type=int, default=DEFAULT_K, help=f"查询返回的人数 (默认为: {DEFAULT_K})")
+    parser.add_argument('--num-perm', type=int, default=NUM_PERM, help=f"MinHash 签名长度 (默认为: {NUM_PERM})")
+    parser.add_argument('--bands', type=int, default=BANDS, help=f"LSH 分段数 (默认为: {BANDS})")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    if args.uid is None:
+        started = time.perf_counter()
+        size = build(cursor, index_path(args.db), get_data_version(cursor), args.num_perm, args.bands)
+        print(f"Wrote {size / 2**20:.1f} MB similarity index to '{index_path(args.db)}' "
+              f"in {time.perf_counter() - started:.1f} s.")
+    else:
+        started = time.perf_counter()
+        try:
+            results = similar(cursor, args.uid, args.k)
+        except ValueError as e:
+            print(f"错误: {e}")
+            return
+        print(f"与 uid {args.uid} 最相似的 {len(results)} 人 ({(time.perf_counter() - started) * 1000:.1f} ms):")
+        for result in results:
+            oier = result['oier']
+            print(f"{oier['uid']:<8} {oier['name']:<10} {result['jaccard']:.3f}  {', '.join(result['shared'])}")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+# snapshot.py
+"""
+不可变的二进制快照 (<db>.snapshot)，由 create_db.py 在数据库旁生成。
+
+快照包含定长的列数组 (Record 各列、按 uid 下标的 OIer 列)、按比赛/奖项/省份划分的 uid 倒排表，
+以及比赛与学校目录。查询进程用 mmap 打开快照，数组都是直接指向映射区的零拷贝视图：
+多个 gunicorn worker 通过 OS 页缓存共享同一份物理内存，打开快照只需一次 open()。
+
+文件格式 (小端):
+    MAGIC | 头部长度 (uint32) | 头部 JSON | 填充到 8 字节对齐 | 各数据段 (每段 8 字节对齐)
+头部记录格式版本、数据版本与各数据段的 (偏移, 类型码, 元素个数)；类型码与 array 模块一致。
+倒排表的目录也是定长数组，打开快照后不需要在进程内构建任何大的 Python 对象。
+"""
+import array
+import json
+import mmap
+import os
+import struct
+import sys
+
+from utils.db_meta import database_path, read_versions
+
+MAGIC = b'OISNAP\x00\x01'
+FORMAT_VERSION = 1
+SNAPSHOT_SUFFIX = '.snapshot'
+# 设置环境变量 OIERFINDER_SNAPSHOT=0 可以忽略快照 (例如排查问题或对比内存占用)
+SNAPSHOT_ENABLED = os.environ.get('OIERFINDER_SNAPSHOT', '1') != '0'
+# 类型码 -> numpy dtype
+DTYPES = {'i': '<i4', 'I': '<u4', 'Q': '<u8', 'h': '<i2', 'd': '<f8', 'B': 'u1'}
+
+# 只保留当前数据版本的快照，切换版本时释放旧的映射 (或内存副本)
+_SNAPSHOTS = {}
+# 快照缺失或与数据版本不一致时记下 {数据版本: (快照路径, 文件签名)}；之后文件生成或被替换时签名改变，下一次查询重新打开
+_MISSES = {}
+
+
+def snapshot_path(db_file):
+    return db_file + SNAPSHOT_SUFFIX
+
+
+def file_signature(path):
+    """文件的 (修改时间, 大小)，文件不存在时为 None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _array(typecode, values):
+    data = array.array(typecode, values)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data
+
+
+def _nan_if_none(value):
+    return float('nan') if value is None else value
+
+
+def posting_slot(kind, contest_id, province_code, level_code, n_provinces, n_levels):
+    """倒排表目录中的槽位下标: 按 比赛 (-> 省份) (-> 奖项) 展开"""
+    slot = contest_id
+    if 'p' in kind:
+        slot = slot * n_provinces + province_code
+    if 'l' in kind:
+        slot = slot * n_levels + level_code
+    return slot
+
+
+def build(cursor, path, data_version):
+    """从数据库生成快照文件 (先写临时文件再原子替换)，返回文件大小"""
+    sections = {}
+
+    contests = cursor.execute("SELECT id, name, type, year FROM Contest ORDER BY id").fetchall()
+    schools = cursor.execute("SELECT id, name, province, city, score FROM School ORDER BY id").fetchall()
+    contest_size = max((row[0] for row in contests), default=-1) + 1
+
+    # Record 各列，按 (contest_id, oier_uid) 排序，按比赛筛选时只需取连续区间
+    rows = cursor.execute(
+        "SELECT oier_uid, contest_id, school_id, score, rank, province, level FROM Record "
+        "ORDER BY contest_id, oier_uid").fetchall()
+    provinces, levels = {}, {}
+    sections['record_oier_uid'] = _array('i', (row[0] for row in rows))
+    sections['record_contest_id'] = _array('i', (row[1] for row in rows))
+    sections['record_school_id'] = _array('i', (-1 if row[2] is None else row[2] for row in rows))
+    sections['record_score'] = _array('d', (_nan_if_none(row[3]) for row in rows))
+    sections['record_rank'] = _array('d', (_nan_if_none(row[4]) for row in rows))
+    sections['record_province'] = _array('h', (provinces.setdefault(row[5], len(provinces)) for row in rows))
+    sections['record_level'] = _array('h', (levels.setdefault(row[6], len(levels)) for row in rows))
+    offsets = [0] * (contest_size + 1)
+    for row in rows:
+        offsets[row[1] + 1] += 1
+    for i in range(contest_size):
+        offsets[i + 1] += offsets[i]
+    sections['contest_offsets'] = _array('i', offsets)
+
+    # OIer 列，按 uid 下标 (不存在的 uid 对应 NaN / 0)
+    oiers = cursor.execute("SELECT uid, enroll_middle FROM OIer").fetchall()
+    uid_size = max(max((row[0] for row in oiers), default=0), max((row[0] for row in rows), default=0)) + 1
+    enroll, exists = [float('nan')] * uid_size, [0] * uid_size
+    for uid, enroll_middle in oiers:
+        enroll[uid], exists[uid] = _nan_if_none(enroll_middle), 1
+    sections['oier_enroll_middle'] = _array('d', enroll)
+    sections['oier_exists'] = _array('B', exists)
+
+    # 倒排表: 各键的 uid 有序排列，依次拼接为一个 uint32 数据段。
+    # 每种键 (c=比赛 / cl=比赛+奖项 / cp=比赛+省份 / cpl=比赛+省份+奖项) 有一张按槽位下标的稠密目录，
+    # 第 i 个槽位为 (起点, 个数)，查询时直接按下标取，不需要在每个进程中构建字典
+    n_provinces, n_levels = len(provinces), len(levels)
+    slot_counts = {'c': contest_size, 'cl': contest_size * n_levels,
+                   'cp': contest_size * n_provinces, 'cpl': contest_size * n_provinces * n_levels}
+    groups = {}
+    for uid, contest_id, _, _, _, province, level in sorted(rows, key=lambda row: row[0]):
+        for kind in slot_counts:
+            slot = posting_slot(kind, contest_id, provinces[province], levels[level], n_provinces, n_levels)
+            postings = groups.setdefault((kind, slot), [])
+            if not postings or postings[-1] != uid:
+                postings.append(uid)
+    posting_values = array.array('I')
+    for kind, size in slot_counts.items():
+        directory = [0] * (2 * size)
+        for slot in range(size):
+            postings = groups.get((kind, slot), ())
+            directory[2 * slot], directory[2 * slot + 1] = len(posting_values), len(postings)
+            posting_values.extend(postings)
+        sections[f'posting_dir_{kind}'] = _array('I', directory)
+    if sys.byteorder != 'little':
+        posting_values.byteswap()
+    sections['postings'] = posting_values
+
+    # 目录在用到时才解析；学校目录较大，单独存放
+    catalog = {'contests': [list(row) for row in contests], 'provinces': list(provinces), 'levels': list(levels)}
+    sections['catalog'] = array.array('B', json.dumps(catalog, ensure_ascii=False).encode('utf-8'))
+    sections['schools'] = array.array('B', json.dumps([list(row) for row in schools], ensure_ascii=False).encode('utf-8'))
+
+    return write_sections(path, MAGIC, {
+        'format': FORMAT_VERSION, 'data_version': data_version,
+        'record_count': len(rows), 'uid_size': uid_size, 'contest_size': contest_size,
+    }, sections)
+
+
+def write_sections(path, magic, header, sections):
+    """
+    按快照的文件格式写出 {段名: array} (先写临时文件再原子替换)，返回文件大小。
+    header 为写入头部的其他字段，各段的 (偏移, 类型码, 元素个数) 记在 header['sections'] 中。
+    """
+    layout, offset = {}, 0
+    for name, data in sections.items():
+        layout[name] = [offset, data.typecode, len(data)]
+        offset += -(-len(data) * data.itemsize // 8) * 8
+    header = json.dumps({**header, 'sections': layout}).encode('utf-8')
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(magic)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        f.write(b'\0' * (-f.tell() % 8))
+        data_start = f.tell()
+        for name, data in sections.items():
+            f.seek(data_start + layout[name][0])
+            data.tofile(f)
+        f.write(b'\0' * (-f.tell() % 8))
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+class SectionFile:
+    """以 mmap 打开的只读分段文件 (快照的文件格式)；magic 与 format_version 不符时抛出 ValueError"""
+
+    def __init__(self, path, magic, format_version, in_memory=False):
+        with open(path, 'rb') as f:
+            # in_memory 时整个文件读入进程内存 (内存副本模式)，否则只做映射
+            self._data = f.read() if in_memory else mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.in_memory = in_memory
+        self.buffer = memoryview(self._data)
+        if bytes(self.buffer[:len(magic)]) != magic:
+            raise ValueError(f"'{path}' 的文件类型不符")
+        (header_len,) = struct.unpack_from('<I', self.buffer, len(magic))
+        start = len(magic) + 4
+        self.header = json.loads(bytes(self.buffer[start:start + header_len]).decode('utf-8'))
+        if self.header['format'] != format_version:
+            raise ValueError(f"'{path}' 的格式版本 {self.header['format']} 不受支持")
+        self.data_start = start + header_len + (-(start + header_len) % 8)
+        self.data_version = self.header['data_version']
+
+    def view(self, name):
+        """数据段的零拷贝 memoryview (按类型码转换)"""
+        offset, typecode, count = self.header['sections'][name]
+        start = self.data_start + offset
+        size = array.array(typecode).itemsize
+        return self.buffer[start:start + count * size].cast(typecode)
+
+    def numpy(self, name):
+        """数据段的零拷贝只读 numpy 数组"""
+        import numpy as np
+        offset, typecode, count = self.header['sections'][name]
+        return np.frombuffer(self._data, dtype=DTYPES[typecode], count=count, offset=self.data_start + offset)
+
+
+class Snapshot(SectionFile):
+    """以 mmap 打开的只读快照"""
+
+    def __init__(self, path, in_memory=False):
+        super().__init__(path, MAGIC, FORMAT_VERSION, in_memory)
+        self._catalog = None
+
+    @property
+    def catalog(self):
+        """比赛目录与省份、奖项代码表"""
+        if self._catalog is None:
+            self._catalog = json.loads(bytes(self.view('catalog')).decode('utf-8'))
+            self._province_codes = {v: i for i, v in enumerate(self._catalog['provinces'])}
+            self._level_codes = {v: i for i, v in enumerate(self._catalog['levels'])}
+        return self._catalog
+
+    def schools(self):
+        """学校目录 [[id, name, province, city, score], ...]"""
+        return json.loads(bytes(self.view('schools')).decode('utf-8'))
+
+    def _posting_range(self, key):
+        """某个键在倒排表数据段中的 (起点, 长度)，键不存在时为 (0, 0)"""
+        kind, contest_id, province, level = key
+        catalog = self.catalog
+        n_provinces, n_levels = len(catalog['provinces']), len(catalog['levels'])
+        p, l = self._province_codes.get(province), self._level_codes.get(level)
+        if (province is not None and p is None) or (level is not None and l is None):
+            return 0, 0
+        slot = posting_slot(kind, contest_id, p, l, n_provinces, n_levels)
+        directory = self.view(f'posting_dir_{kind}')
+        if not 0 <= slot < len(directory) // 2:
+            return 0, 0
+        return directory[2 * slot], directory[2 * slot + 1]
+
+    def postings(self, key):
+        """某个键 (kind, contest_id, province, level) 的有序 uid 视图，键不存在时为空"""
+        start, count = self._posting_range(key)
+        return self.view('postings')[start:start + count] if count else ()
+
+    def posting_count(self, key):
+        """某个键的倒排表长度，只读目录，不访问倒排表本身"""
+        return self._posting_range(key)[1]
+
+
+def open_snapshot(path, in_memory=False):
+    """打开快照；文件不存在、格式不符或字节序不是小端时返回 None"""
+    if sys.byteorder != 'little':
+        return None
+    try:
+        return Snapshot(path, in_memory)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def for_cursor(cursor, versions=None):
+    """
+    返回与当前数据库版本一致的快照；没有快照文件或版本不一致时返回 None。
+    versions 为查询入口读取的 db_meta.Versions，不提供时读取 Meta 表。
+    """
+    if not SNAPSHOT_ENABLED:
+        return None
+    version = (versions or read_versions(cursor)).data
+    snapshot = _SNAPSHOTS.get(version)
+    if snapshot is not None:
+        return snapshot
+    path = database_path(cursor)
+    if not path:
+        return None
+    path = snapshot_path(path)
+    signature = (path, file_signature(path))
+    if _MISSES.get(version) == signature:
+        return None
+    snapshot = open_snapshot(path)
+    if snapshot is None or snapshot.data_version != version:
+        _MISSES.clear()
+        _MISSES[version] = signature
+        return None
+    _remember(version, snapshot)
+    return snapshot
+
+
+def _remember(version, snapshot):
+    _SNAPSHOTS.clear()
+    _MISSES.clear()
+    _SNAPSHOTS[version] = snapshot
+
+
+def preload(db_file, version):
+    """
+    把数据库对应的快照整个读入内存并登记到该数据版本下 (内存副本模式使用，
+    之后数据库连接即使指向内存数据库也能找到快照)。该版本的快照已在内存中时不重复读取。返回是否成功。
+    """
+    if not SNAPSHOT_ENABLED:
+        return False
+    loaded = _SNAPSHOTS.get(version)
+    if loaded is not None and loaded.in_memory:
+        return True
+    snapshot = open_snapshot(snapshot_path(db_file), in_memory=True)
+    if snapshot is None or snapshot.data_version != version:
+        return False
+    _remember(version, snapshot)
+    return True
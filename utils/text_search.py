@@ -0,0 +1,128 @@
+# text_search.py
+"""
+按姓名、拼音首字母与学校名查找 OIer。
+
+create_db.py 建有两张 FTS5 全文索引 (外部内容表，不重复存储数据)：
+    OIerSearch(name, initials)   unicode61 分词并建有 1~3 字前缀索引，姓名整体作为一个词，可按整名或前缀查找
+    SchoolSearch(name)           trigram 分词，可按学校名中的任意片段 (至少 3 个字) 查找
+
+config 中对应的键 (都是 OIer 级别，可以是单个字符串或字符串列表，列表内为 "或" 关系)：
+    name: 张三 / [张三, 李*]        整名匹配，末尾加 * 表示按前缀匹配
+    initials_prefix: zs            拼音首字母前缀
+    school: 第二中学               曾在名称包含该片段的学校获得记录
+
+这些条件通常只命中几个到几百人，查询引擎把它们作为最先执行的步骤，之后的记录条件按候选 uid 枚举。
+数据库中没有全文索引 (旧版数据库，或 SQLite 未编译 FTS5) 时退回普通的 LIKE 查询，结果相同。
+"""
+from utils.db_meta import read_versions
+
+SEARCH_KEYS = ('name', 'initials_prefix', 'school')
+SEARCH_TABLES = ('OIerSearch', 'SchoolSearch')
+# trigram 分词器只能回答至少 3 个字符的片段
+TRIGRAM_MIN_LENGTH = 3
+
+_TABLES = {}
+
+
+def search_tables(cursor, versions=None):
+    """当前数据库中已建好的全文索引表 (每个数据版本只查询一次)。versions 见 snapshot.for_cursor"""
+    version = (versions or read_versions(cursor)).data
+    if version not in _TABLES:
+        placeholders = ', '.join(['?'] * len(SEARCH_TABLES))
+        rows = cursor.execute(f"SELECT name FROM sqlite_master WHERE name IN ({placeholders})", SEARCH_TABLES).fetchall()
+        _TABLES[version] = {row[0] for row in rows}
+    return _TABLES[version]
+
+
+def as_terms(config, key):
+    """config[key] 规范化为去掉空白的非空字符串列表；不是字符串或字符串列表时抛出 ValueError"""
+    value = config.get(key)
+    if value is None:
+        return []
+    values = value if isinstance(value, list) else [value]
+    if not all(isinstance(v, str) for v in values):
+        raise ValueError(f"{key} 必须是字符串或字符串列表")
+    return [v.strip() for v in values if v and v.strip()]
+
+
+def has_search_conditions(config):
+    return any(as_terms(config, key) for key in SEARCH_KEYS)
+
+
+def _phrase(term):
+    """FTS5 短语 (双引号内的双引号需要成对转义)"""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _prefix_match(column, terms):
+    """column 等于 (exact) 或以 (prefix) 各项开头的条件，返回 (condition, values)"""
+    conditions, values = [], []
+    for term, is_prefix in terms:
+        if is_prefix:
+            conditions.append(f"substr({column}, 1, ?) = ?"); values.extend([len(term), term])
+        else:
+            conditions.append(f"{column} = ?"); values.append(term)
+    return " OR ".join(conditions), values
+
+
+def name_query(terms, use_fts):
+    """姓名条件；全文索引用于快速缩小范围，再在 OIer 表上做精确的整名/前缀比较"""
+    parsed = [(term[:-1].strip(), True) if term.endswith('*') else (term, False) for term in terms]
+    parsed = [(term, is_prefix) for term, is_prefix in parsed if term]
+    if not parsed:
+        return None
+    condition, values = _prefix_match("o.name", parsed)
+    if not use_fts:
+        return f"SELECT o.uid FROM OIer o WHERE {condition}", values
+    match = "name : (" + " OR ".join(_phrase(t) + (" *" if p else "") for t, p in parsed) + ")"
+    return (f"SELECT o.uid FROM OIerSearch JOIN OIer o ON o.uid = OIerSearch.rowid "
+            f"WHERE OIerSearch MATCH ? AND ({condition})", [match] + values)
+
+
+def initials_query(terms, use_fts):
+    """拼音首字母前缀条件"""
+    terms = [term.lower() for term in terms]
+    condition, values = _prefix_match("o.initials", [(term, True) for term in terms])
+    if not use_fts:
+        return f"SELECT o.uid FROM OIer o WHERE {condition}", values
+    match = "initials : (" + " OR ".join(_phrase(term) + " *" for term in terms) + ")"
+    return (f"SELECT o.uid FROM OIerSearch JOIN OIer o ON o.uid = OIerSearch.rowid "
+            f"WHERE OIerSearch MATCH ? AND ({condition})", [match] + values)
+
+
+def school_ids_query(terms, use_fts):
+    """名称包含任一片段的学校 id；足够长的片段由 trigram 索引回答，过短的片段在 School 表上匹配"""
+    parts, values = [], []
+    indexed = [term for term in terms if use_fts and len(term) >= TRIGRAM_MIN_LENGTH]
+    short = [term for term in terms if term not in indexed]
+    if indexed:
+        parts.append("SELECT rowid FROM SchoolSearch WHERE SchoolSearch MATCH ?")
+        values.append("name : (" + " OR ".join(_phrase(term) for term in indexed) + ")")
+    if short:
+        parts.append("SELECT id FROM School WHERE " + " OR ".join(["instr(name, ?) > 0"] * len(short)))
+        values.extend(short)
+    return " UNION ".join(parts), values
+
+
+def school_query(terms, use_fts):
+    """曾在匹配的学校获得记录的 OIer (由 Record(school_id, ...) 索引回答)"""
+    subquery, values = school_ids_query(terms, use_fts)
+    return f"SELECT DISTINCT r.oier_uid FROM Record r WHERE r.school_id IN ({subquery})", values
+
+
+def search_queries(cursor, config, versions=None):
+    """config 中姓名/首字母/学校条件对应的查询，返回 [(步骤名, 模式, query, values), ...]"""
+    builders = (('name', name_query, 'OIerSearch'), ('initials_prefix', initials_query, 'OIerSearch'),
+                ('school', school_query, 'SchoolSearch'))
+    queries, tables = [], None
+    for key, builder, table in builders:
+        terms = as_terms(config, key)
+        if not terms:
+            continue
+        # 没有此类条件的查询不需要知道全文索引表
+        if tables is None: tables = search_tables(cursor, versions)
+        use_fts = table in tables
+        built = builder(terms, use_fts)
+        if built is not None:
+            queries.append((f"search_{key}", "fts" if use_fts else "like", built[0], built[1]))
+    return queries